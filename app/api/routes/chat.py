@@ -1,45 +1,118 @@
-from fastapi import APIRouter, HTTPException
-from app.schemas.chat_schema import AskRequest
-import logging
-from typing import Dict, Any
-from app.chains.llm_chain import process_query
-from app.chains.llm_chain import reset_conversation_memory
-from app.schemas.memory_schema import ResetMemoryRequest
-
-
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
-
-router = APIRouter()
-
-QUERY_CHAR_LIMIT = 5000
-
-@router.post("/ask", response_model=Dict[str, Any], status_code=200)
-def ask(request: AskRequest) -> Dict[str, Any]:
-    if len(request.query) > QUERY_CHAR_LIMIT:
-        return {"error": "Query size exceeded", "allowed_limit": QUERY_CHAR_LIMIT}
-
-    try:
-        logger.info(f"Received ask request with query: {request.query} and thread_id: {request.thread_id}")
-        return process_query(request.query, thread_id=request.thread_id)
-    except Exception as e:
-        logger.error(f"Error in ask endpoint: {str(e)}", exc_info=True)
-        raise HTTPException(status_code=500, detail=str(e))
-
-
-@router.post("/reset_memory")
-def reset_memory_json(request_data: ResetMemoryRequest) -> Dict[str, str]:
-    thread_id = request_data.thread_id
-
-    try:
-        logger.info(f"Resetting memory for thread_id: {thread_id}")
-        result = reset_conversation_memory(thread_id)
-
-        if "error" in result:
-            raise HTTPException(status_code=500, detail=result["error"])
-
-        return result
-
-    except Exception as e:
-        logger.error(f"Error in reset_memory_json endpoint: {str(e)}", exc_info=True)
-        raise HTTPException(status_code=500, detail="Internal server error")
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+import json
+from app.config import settings
+from app.schemas.chat_schema import AskRequest
+from app.utils import metrics
+import logging
+from typing import Dict, Any, List, Optional
+from app.chains.llm_chain import aprocess_query, astream_answer
+from app.chains.llm_chain import reset_conversation_memory, reset_conversation_memories
+from app.chains.llm_chain import list_conversation_threads, conversation_thread_stats
+from app.schemas.memory_schema import ResetMemoryRequest, BulkResetMemoryRequest, ThreadStats
+
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+QUERY_CHAR_LIMIT = 5000
+
+
+def retrieval_weights(request: AskRequest) -> Optional[Dict[str, float]]:
+    weights = {"dense": request.dense_weight, "lexical": request.lexical_weight}
+    return {k: v for k, v in weights.items() if v is not None} or None
+
+
+@router.post("/ask", response_model=Dict[str, Any], status_code=200)
+async def ask(request: AskRequest) -> Dict[str, Any]:
+    if len(request.query) > QUERY_CHAR_LIMIT:
+        return {"error": "Query size exceeded", "allowed_limit": QUERY_CHAR_LIMIT}
+
+    try:
+        logger.info(f"Received ask request ({len(request.query)} chars) for thread_id: {request.thread_id}")
+        return await aprocess_query(request.query, thread_id=request.thread_id, weights=retrieval_weights(request))
+    except Exception as e:
+        logger.error(f"Error in ask endpoint: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def sse_event(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@router.post("/ask/stream")
+async def ask_stream(request: AskRequest):
+    if len(request.query) > QUERY_CHAR_LIMIT:
+        return {"error": "Query size exceeded", "allowed_limit": QUERY_CHAR_LIMIT}
+
+    logger.info(f"Received streaming ask request ({len(request.query)} chars) for thread_id: {request.thread_id}")
+
+    async def events():
+        # The Server-Timing header is sent before the answer streams, so with
+        # DEBUG_TIMING the full breakdown arrives as a final "timing" event.
+        with metrics.request_timings() as timings:
+            try:
+                async for event, value in astream_answer(request.query, thread_id=request.thread_id, weights=retrieval_weights(request)):
+                    if event == "action":
+                        yield sse_event("action", {"action": value})
+                    elif event == "content":
+                        yield sse_event("content", {"delta": value})
+                    else:
+                        yield sse_event(event, value)
+            except Exception as e:
+                logger.error(f"Error in ask_stream endpoint: {str(e)}", exc_info=True)
+                yield sse_event("error", {"error": str(e)})
+        if settings.DEBUG_TIMING:
+            yield sse_event("timing", {stage: round(seconds * 1000, 1) for stage, seconds in timings.items()})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.post("/reset_memory")
+def reset_memory_json(request_data: ResetMemoryRequest) -> Dict[str, str]:
+    thread_id = request_data.thread_id
+
+    try:
+        logger.info(f"Resetting memory for thread_id: {thread_id}")
+        result = reset_conversation_memory(thread_id)
+
+        if "error" in result:
+            raise HTTPException(status_code=500, detail=result["error"])
+
+        return result
+
+    except Exception as e:
+        logger.error(f"Error in reset_memory_json endpoint: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+
+@router.post("/reset_memory/bulk")
+def reset_memory_bulk(request_data: BulkResetMemoryRequest) -> Dict[str, Any]:
+    logger.info(f"Bulk resetting memory for {len(request_data.thread_ids)} threads")
+    result = reset_conversation_memories(request_data.thread_ids)
+    if "error" in result:
+        raise HTTPException(status_code=500, detail=result["error"])
+    return result
+
+
+@router.get("/threads", response_model=List[ThreadStats])
+def list_threads(limit: int = Query(100, ge=1, le=1000), offset: int = Query(0, ge=0)):
+    try:
+        return list_conversation_threads(limit=limit, offset=offset)
+    except Exception as e:
+        logger.error(f"Error in list_threads endpoint: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+
+@router.get("/threads/{thread_id}", response_model=ThreadStats)
+def thread_stats(thread_id: str):
+    stats = conversation_thread_stats(thread_id)
+    if stats is None:
+        raise HTTPException(status_code=404, detail="Thread not found")
+    return stats
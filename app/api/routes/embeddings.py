@@ -1,9 +1,20 @@
 from fastapi import APIRouter, File, UploadFile, HTTPException
-from app.qdrant.pdf_clean import process_pdf_semantically
-from app.qdrant.insert_vector import insert_chunks_to_qdrant
-from typing import Dict, Any
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+import json
+import os
+import shutil
+import tempfile
+from app.config import settings
+from app.jobs.ingestion import job_manager
+from app.qdrant.ocr_engine import PdfSource
+from app.schemas.job_schema import IngestionJobStatus
+from app.schemas.search_schema import BatchSearchRequest
+from typing import Dict, Any, Iterator, List, Optional
 import logging
-from app.qdrant.vector_search import search_documents
+from app.qdrant.vector_search import iter_search_documents_batch, search_documents
+from app.qdrant.model import query_embedding_cache
+from app.cache.answer_cache import answer_cache
 from loguru import logger
 
 logging.basicConfig(level=logging.INFO)
@@ -11,29 +22,119 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-@router.post("/insert-vector", response_model=Dict[str, Any], status_code=200)
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+# Starlette keeps multipart files up to this size in memory before spooling to disk.
+IN_MEMORY_UPLOAD_BYTES = 1024 * 1024
+
+
+async def spool_upload(file: UploadFile) -> PdfSource:
+    """Hand an upload over in a form the ingestion job can still read after the request.
+
+    Starlette's spooled file is closed when the response is sent, and once it
+    has rolled over to disk it is an anonymous temp file that goes with it. So
+    small uploads are passed on as the bytes already in memory, and larger
+    ones are copied once, in a single worker thread, to a named temp file.
+    """
+    if file.size is not None and file.size <= IN_MEMORY_UPLOAD_BYTES:
+        return await file.read()
+    fd, path = tempfile.mkstemp(prefix="upload-", suffix=".pdf", dir=settings.UPLOAD_DIR or None)
+    try:
+        with os.fdopen(fd, "wb") as out:
+            await file.seek(0)
+            await run_in_threadpool(shutil.copyfileobj, file.file, out, UPLOAD_CHUNK_SIZE)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path
+
+
+@router.post("/insert-vector", response_model=Dict[str, Any], status_code=202)
 async def upload_pdf(file: UploadFile = File(...)):
     try:
-        contents = await file.read()
+        pdf_source = await spool_upload(file)
 
-        chunks = process_pdf_semantically(contents)
-        insert_chunks_to_qdrant(chunks)
+        job = job_manager.submit(pdf_source, file.filename, delete_after=True)
 
-        return {"message": f"Inserted {len(chunks)} chunks from PDF into Qdrant."}
+        return {"job_id": job.job_id, "status": job.status}
     
     except Exception as e:
         logger.error(f"Error in insert_vector: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Vector insertion failed: {str(e)}")
+
+
+@router.get("/jobs", response_model=List[IngestionJobStatus], status_code=200)
+def list_jobs() -> List[Dict[str, Any]]:
+    return [job.to_dict() for job in job_manager.list_jobs()]
+
+
+@router.get("/jobs/{job_id}", response_model=IngestionJobStatus, status_code=200)
+def get_job(job_id: str) -> Dict[str, Any]:
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job.to_dict()
+
+
+@router.post("/jobs/{job_id}/cancel", response_model=IngestionJobStatus, status_code=200)
+def cancel_job(job_id: str) -> Dict[str, Any]:
+    job = job_manager.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job.to_dict()
     
 
 @router.post("/search_vector", response_model=Dict[str, Any], status_code=200)
-def search_vector(request: str) -> Dict[str, Any]:
+def search_vector(
+    request: str,
+    dense_weight: Optional[float] = None,
+    lexical_weight: Optional[float] = None,
+    content_type: Optional[str] = None,
+    section: Optional[str] = None,
+    page: Optional[int] = None,
+) -> Dict[str, Any]:
     try:
-        logger.info(f"Received search request with query: {request}")
-        results = search_documents(request)
+        logger.info(f"Received search request ({len(request)} chars)")
+        weights = {k: v for k, v in {"dense": dense_weight, "lexical": lexical_weight}.items() if v is not None}
+        query_filter = {k: v for k, v in {"content_type": content_type, "section": section, "page": page}.items() if v is not None}
+        results = search_documents(request, weights=weights or None, query_filter=query_filter or None)
         logger.info(f"Found {len(results)} results")
         return {"results": results}
 
     except Exception as e:
         logger.error(f"Error in search_vector: {str(e)}", exc_info=True)
-        raise HTTPException(status_code=500, detail=f"Vector search failed: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Vector search failed: {str(e)}")
+
+
+def ndjson_lines(results: Iterator[dict]) -> Iterator[str]:
+    for result in results:
+        yield json.dumps(result, ensure_ascii=False) + "\n"
+
+
+@router.post("/search_vector/batch", response_model=Dict[str, Any], status_code=200)
+def search_vector_batch(request: BatchSearchRequest):
+    """Search many queries; with ``stream`` the results arrive as NDJSON, one line per query."""
+    logger.info(f"Received batch search request with {len(request.queries)} queries")
+    weights = {k: v for k, v in {"dense": request.dense_weight, "lexical": request.lexical_weight}.items() if v is not None}
+    query_filter = {k: v for k, v in {"content_type": request.content_type, "section": request.section, "page": request.page}.items() if v is not None}
+    results = iter_search_documents_batch(
+        request.queries,
+        settings.SEARCH_BATCH_SIZE,
+        limit=request.limit,
+        weights=weights or None,
+        query_filter=query_filter or None,
+    )
+    if request.stream:
+        return StreamingResponse(ndjson_lines(results), media_type="application/x-ndjson")
+    try:
+        return {"results": list(results)}
+    except Exception as e:
+        logger.error(f"Error in search_vector_batch: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Vector search failed: {str(e)}")
+
+
+@router.get("/cache-stats", response_model=Dict[str, Any], status_code=200)
+def cache_stats() -> Dict[str, Any]:
+    return {
+        "query_embeddings": query_embedding_cache.stats(),
+        "answers": answer_cache.stats(),
+    }
@@ -1,9 +1,11 @@
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import Dict, Any
 import logging
-from app.chains.matrix import get_cosine_similarity
-from app.schemas.cosine_schema import CosineRequest
+from app.api.routes.embeddings import ndjson_lines
+from app.chains.matrix import get_cosine_similarity, iter_cosine_similarities
+from app.schemas.cosine_schema import CosineRequest, BatchCosineRequest
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -12,7 +14,7 @@ logger = logging.getLogger(__name__)
 @router.post("/cosine-similarity", response_model=Dict[str, Any], status_code=200)
 def cosine_similarity(request: CosineRequest) -> Dict[str, Any]:
     try:
-        logger.info(f"Received cosine similarity request: {request.query}")
+        logger.info(f"Received cosine similarity request ({len(request.query)} chars)")
         result = get_cosine_similarity(request.query)
 
         if "error" in result:
@@ -23,5 +25,16 @@ def cosine_similarity(request: CosineRequest) -> Dict[str, Any]:
         logger.error(f"Error in cosine_similarity endpoint: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="Internal server error.")
 
-    
 
+@router.post("/cosine-similarity/batch", response_model=Dict[str, Any], status_code=200)
+def cosine_similarity_batch(request: BatchCosineRequest):
+    """Cosine similarity for many queries, in order; ``stream`` returns NDJSON lines."""
+    logger.info(f"Received batch cosine similarity request with {len(request.queries)} queries")
+    results = iter_cosine_similarities(request.queries)
+    if request.stream:
+        return StreamingResponse(ndjson_lines(results), media_type="application/x-ndjson")
+    try:
+        return {"results": list(results)}
+    except Exception as e:
+        logger.error(f"Error in cosine_similarity_batch endpoint: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Internal server error.")
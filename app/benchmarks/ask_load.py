@@ -0,0 +1,112 @@
+"""Load test of the /agent/ask pipeline against local stand-ins.
+
+The enrichment/response chains, the embedding call and the vector search are
+replaced by stand-ins that only wait, so the run measures how many questions
+the sync (threadpool) and async request paths can keep in flight. The graph
+checkpoints into a throwaway in-memory store and the answer cache is off for
+the run; both are put back afterwards.
+
+    python -m app.benchmarks.ask_load --requests 400 --concurrency 200
+"""
+import argparse
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Iterator
+
+from langchain_core.messages import AIMessage
+
+from app.chains import llm_chain
+from app.chains.conversation_store import MemoryConversationStore
+
+STARLETTE_THREADPOOL_SIZE = 40
+STAND_IN_NAMES = ("memory", "app", "query_enrichment_chain", "response_chain", "vector_search_qdrant", "avector_search_qdrant")
+
+
+class FakeChain:
+    def __init__(self, latency: float, content: str):
+        self.latency = latency
+        self.content = content
+
+    def invoke(self, inputs):
+        time.sleep(self.latency)
+        return AIMessage(content=self.content)
+
+    async def ainvoke(self, inputs):
+        await asyncio.sleep(self.latency)
+        return AIMessage(content=self.content)
+
+
+@contextmanager
+def stand_ins(llm_latency: float, search_latency: float) -> Iterator[None]:
+    def search(query, weights=None, query_filter=None):
+        time.sleep(search_latency)
+        return {"query": query, "results": []}
+
+    async def asearch(query, weights=None, query_filter=None):
+        await asyncio.sleep(search_latency)
+        return {"query": query, "results": []}
+
+    saved = {name: getattr(llm_chain, name) for name in STAND_IN_NAMES}
+    answer_cache_enabled = llm_chain.settings.ANSWER_CACHE_ENABLED
+    llm_chain.settings.ANSWER_CACHE_ENABLED = False
+    # Keep the load test's threads out of the configured conversation store.
+    llm_chain.memory = MemoryConversationStore()
+    llm_chain.app = llm_chain.workflow.compile(checkpointer=llm_chain.memory)
+    llm_chain.query_enrichment_chain = FakeChain(llm_latency, json.dumps({"action": "response", "content": "q"}))
+    llm_chain.response_chain = FakeChain(llm_latency, json.dumps({"action": "short", "content": "a"}))
+    llm_chain.vector_search_qdrant = search
+    llm_chain.avector_search_qdrant = asearch
+    try:
+        yield
+    finally:
+        llm_chain.settings.ANSWER_CACHE_ENABLED = answer_cache_enabled
+        for name, value in saved.items():
+            setattr(llm_chain, name, value)
+
+
+def run_sync(requests: int) -> float:
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=STARLETTE_THREADPOOL_SIZE) as pool:
+        list(pool.map(lambda i: llm_chain.process_query("q", thread_id=f"sync-{i}"), range(requests)))
+    return time.perf_counter() - start
+
+
+async def run_async(requests: int, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int):
+        async with semaphore:
+            return await llm_chain.aprocess_query("q", thread_id=f"async-{i}")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--llm-latency", type=float, default=0.5)
+    parser.add_argument("--search-latency", type=float, default=0.1)
+    args = parser.parse_args()
+
+    with stand_ins(args.llm_latency, args.search_latency):
+        sync_seconds = run_sync(args.requests)
+        async_seconds = asyncio.run(run_async(args.requests, args.concurrency))
+
+    print(json.dumps({
+        "requests": args.requests,
+        "sync_threadpool_size": STARLETTE_THREADPOOL_SIZE,
+        "async_concurrency": args.concurrency,
+        "sync_rps": round(args.requests / sync_seconds, 1),
+        "async_rps": round(args.requests / async_seconds, 1),
+        "speedup": round(sync_seconds / async_seconds, 2),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Prompt-token cost of the response prompt context, raw vs compact.
+
+Runs a fixed query set through ``search_documents`` (or loads previously
+saved results with ``--results``) and counts the tokens of the full
+response prompt when ``vector_result`` is ``str()`` of the search result
+versus the compact context from ``app.utils.context_builder``.
+
+    python -m app.benchmarks.context_tokens --save .cache/context_results.json
+    python -m app.benchmarks.context_tokens --results .cache/context_results.json
+"""
+import argparse
+import json
+
+from app.config import settings
+from app.prompts.response_prompt import resp_prompt
+from app.utils.context_builder import build_context, raw_context
+from app.utils.tokens import get_token_counter
+
+FIXED_QUERIES = [
+    "অনুপমের বয়স কত?",
+    "কাকে অনুপমের ভাগ্য দেবতা বলা হয়েছে?",
+    "বিয়ের সময় কল্যাণীর প্রকৃত বয়স কত ছিল?",
+    "অপরিচিতা গল্পে মামার চরিত্র কেমন?",
+    "শম্ভুনাথ সেন বিয়ে ভেঙে দিলেন কেন?",
+    "কল্যাণী কেন বিয়ে করতে রাজি হয়নি?",
+    "অনুপম কেন নিজেকে অপদার্থ মনে করে?",
+    "অপরিচিতা গল্পের লেখক কে?",
+    "Who is Anupam's guardian?",
+    "What was Kalyani's father's profession?",
+]
+
+
+def prompt_tokens(counter, query: str, context: str) -> int:
+    return counter.count(resp_prompt.format(question=query, chat_history="", vector_result=context))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--results", help="JSON list of saved search results to measure instead of searching")
+    parser.add_argument("--save", help="write the search results used to this JSON file")
+    parser.add_argument("--limit", type=int, default=5)
+    parser.add_argument("--budget", type=int, default=settings.CONTEXT_TOKEN_BUDGET)
+    args = parser.parse_args()
+
+    if args.results:
+        with open(args.results, encoding="utf-8") as f:
+            search_results = json.load(f)
+    else:
+        from app.qdrant.vector_search import search_documents
+        search_results = [search_documents(query, limit=args.limit) for query in FIXED_QUERIES]
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(search_results, f, ensure_ascii=False, indent=2)
+
+    counter = get_token_counter(settings.MODEL_ID)
+    rows = []
+    for result in search_results:
+        query = result.get("query", "")
+        raw = raw_context(result)
+        compact = build_context(result, counter, args.budget)
+        rows.append({
+            "query": query,
+            "hits": len(result.get("results", [])),
+            "raw_context_tokens": counter.count(raw),
+            "compact_context_tokens": counter.count(compact),
+            "raw_prompt_tokens": prompt_tokens(counter, query, raw),
+            "compact_prompt_tokens": prompt_tokens(counter, query, compact),
+        })
+
+    totals = {
+        key: sum(row[key] for row in rows)
+        for key in ("raw_context_tokens", "compact_context_tokens", "raw_prompt_tokens", "compact_prompt_tokens")
+    }
+    print(json.dumps({
+        "queries": len(rows),
+        "context_token_budget": args.budget,
+        "exact_tokenizer": counter.encoding is not None,
+        **totals,
+        "context_reduction": round(1 - totals["compact_context_tokens"] / totals["raw_context_tokens"], 3)
+        if totals["raw_context_tokens"] else None,
+        "prompt_reduction": round(1 - totals["compact_prompt_tokens"] / totals["raw_prompt_tokens"], 3)
+        if totals["raw_prompt_tokens"] else None,
+        "per_query": rows,
+    }, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Latency, vector memory and recall@k of each collection profile.
+
+Every profile whose collection exists is searched with the same query
+embeddings. Recall@k is the overlap with an exact (brute-force) search of
+the full-size ``default`` collection; payload bytes compare full hits with
+the fields the response prompt actually uses.
+
+    python -m app.qdrant.collection_profiles --migrate scalar --from default
+    python -m app.benchmarks.profiles --k 5
+"""
+import argparse
+import json
+import statistics
+import time
+from typing import Any, Dict, List
+
+from app.benchmarks.context_tokens import FIXED_QUERIES
+from app.benchmarks.retrieval import percentile, sample_golden
+from app.qdrant.bm25_index import bm25_index
+from app.qdrant.collection_profiles import COLLECTION_PROFILES, collection_name, estimated_memory_mb
+from app.qdrant.model import embed_query
+from app.qdrant.qdrant_connect import async_client, client
+from app.qdrant.vector_store import QdrantVectorStore
+from app.utils.context_builder import CONTEXT_FIELDS
+
+
+def exact_top_ids(vectors: List[List[float]], k: int) -> List[List[str]]:
+    from qdrant_client.models import SearchParams
+
+    return [
+        [str(hit.id) for hit in client.search(
+            collection_name=collection_name("default"),
+            query_vector=vector,
+            limit=k,
+            search_params=SearchParams(exact=True),
+            with_payload=False,
+        )]
+        for vector in vectors
+    ]
+
+
+def payload_bytes(store: QdrantVectorStore, vectors: List[List[float]], k: int) -> Dict[str, int]:
+    def size(fields):
+        return sum(len(json.dumps([payload for _, _, payload in store.search(vector, k, fields)], ensure_ascii=False).encode("utf-8")) for vector in vectors)
+
+    return {"full": size(None) // len(vectors), "projected": size(CONTEXT_FIELDS) // len(vectors)}
+
+
+def evaluate(name: str, vectors: List[List[float]], exact: List[List[str]], k: int) -> Dict[str, Any]:
+    profile = COLLECTION_PROFILES[name]
+    store = QdrantVectorStore(client, async_client, collection_name(name), profile)
+    points = client.get_collection(store.collection_name).points_count or 0
+    store.search(vectors[0], k, CONTEXT_FIELDS)
+
+    latencies, found = [], 0
+    for vector, expected in zip(vectors, exact):
+        start = time.perf_counter()
+        hits = store.search(vector, k, CONTEXT_FIELDS)
+        latencies.append((time.perf_counter() - start) * 1000)
+        found += len({point_id for point_id, _, _ in hits} & set(expected))
+    return {
+        "collection": store.collection_name,
+        "points": points,
+        **estimated_memory_mb(profile, points),
+        f"recall@{k}": round(found / sum(len(ids) for ids in exact), 3) if any(exact) else None,
+        "p50_ms": round(statistics.median(latencies), 1),
+        "p95_ms": round(percentile(latencies, 0.95), 1),
+        "payload_bytes_per_query": payload_bytes(store, vectors, k),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--samples", type=int, default=100, help="extra queries quoted from indexed chunks")
+    parser.add_argument("--seed", type=int, default=13)
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    queries = list(FIXED_QUERIES)
+    if len(bm25_index):
+        queries += [item["query"] for item in sample_golden(args.samples, args.seed)]
+    vectors = [embed_query(query) for query in queries]
+    exact = exact_top_ids(vectors, args.k)
+
+    existing = {collection.name for collection in client.get_collections().collections}
+    report = {
+        name: evaluate(name, vectors, exact, args.k)
+        for name in COLLECTION_PROFILES
+        if collection_name(name) in existing
+    }
+    print(json.dumps({"queries": len(queries), "profiles": report}, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+"""Retrieval quality (hit rate, recall, MRR, nDCG at k) and search latency, checked against a baseline.
+
+The golden set is JSON lines of ``{"question": ..., "page": 12}`` or
+``{"question": ..., "question_number": 5}`` (``content_type``, ``filename``
+and ``source`` may narrow it further); a hit is relevant when its payload
+has every given value. ``--snapshot`` searches a local vector store directory (see
+``python -m app.qdrant.vector_store --snapshot``) instead of the configured
+store, with a BM25 index built from the same chunks. ``--fake-embedder``
+re-embeds the chunks and questions with a deterministic hashing embedder, so
+the run needs no API key and gives the same numbers on every machine.
+
+``hit_rate@k`` is the share of questions with any relevant chunk in the top
+k; ``recall@k`` averages the share of each question's relevant chunks found.
+Results are written to ``--output``; with ``--baseline`` any metric that got
+worse by more than the tolerance is listed and the run exits with status 1.
+A latency only counts as worse when it grew by both ``--latency-tolerance``
+and ``--latency-floor-ms``, so sub-millisecond runs do not fail on jitter.
+
+    python -m app.benchmarks.quality --golden golden.jsonl --snapshot .cache/vectors \\
+        --fake-embedder --baseline quality-baseline.json --output quality.json
+"""
+import argparse
+import hashlib
+import json
+import math
+import statistics
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.benchmarks.retrieval import load_golden, percentile
+from app.cache.embedding_cache import EmbeddingCache
+from app.chains.matrix import DENSE_ONLY
+from app.config import settings
+from app.qdrant import model, vector_search
+from app.qdrant.bm25_index import BM25Index, search_text
+from app.qdrant.vector_store import LocalVectorStore, VectorStore, vector_store
+from app.utils.bangla import normalize_bangla, words
+
+RELEVANCE_KEYS = ("page", "question_number", "content_type", "filename", "source")
+MODES = {
+    "dense": DENSE_ONLY,
+    "hybrid": None,
+}
+QUALITY_METRICS = ("hit_rate", "recall", "mrr", "ndcg")
+LATENCY_METRICS = ("p50_ms", "p95_ms", "p99_ms")
+FAKE_EMBEDDING_MODEL = "fake-hashing"
+
+
+class HashingEmbeddings:
+    """Deterministic stand-in for ``OpenAIEmbeddings``: signed hashes of word trigrams."""
+
+    def __init__(self, dimensions: int):
+        self.dimensions = dimensions
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for word in words(normalize_bangla(text)):
+            padded = f"<{word}>"
+            for start in range(max(len(padded) - 2, 1)):
+                digest = hashlib.blake2b(padded[start:start + 3].encode("utf-8"), digest_size=8).digest()
+                bucket = int.from_bytes(digest, "little")
+                vector[bucket % self.dimensions] += 1.0 if bucket >> 63 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+
+def use_fake_embedder() -> None:
+    """Route query embedding through ``HashingEmbeddings`` with a private, in-memory cache."""
+    model.embedding_model = HashingEmbeddings(model.EMBEDDING_DIMENSIONS)
+    model.query_embedding_cache = EmbeddingCache(FAKE_EMBEDDING_MODEL, model.EMBEDDING_DIMENSIONS)
+
+
+def reembed(source: VectorStore, directory: str, batch_size: int = 256) -> LocalVectorStore:
+    """Copy ``source`` into a local store with vectors from the current embedding model."""
+    target = LocalVectorStore(directory)
+    target.ensure_collection(model.EMBEDDING_DIMENSIONS)
+    batch = []
+    for point_id, payload, _ in source.iter_points():
+        batch.append((point_id, payload))
+        if len(batch) >= batch_size:
+            vectors = model.embedding_model.embed_documents([search_text(payload) for _, payload in batch])
+            target.upsert([(pid, vector, payload) for (pid, payload), vector in zip(batch, vectors)])
+            batch = []
+    if batch:
+        vectors = model.embedding_model.embed_documents([search_text(payload) for _, payload in batch])
+        target.upsert([(pid, vector, payload) for (pid, payload), vector in zip(batch, vectors)])
+    return target
+
+
+def expected_values(item: Dict[str, Any]) -> Dict[str, Any]:
+    return {key: item[key] for key in RELEVANCE_KEYS if item.get(key) is not None}
+
+
+def is_relevant(payload: Dict[str, Any], expected: Dict[str, Any]) -> bool:
+    return all(payload.get(key) == value for key, value in expected.items())
+
+
+def relevant_counts(store: VectorStore, golden: List[Dict[str, Any]]) -> Tuple[List[int], int]:
+    """How many stored chunks each golden item accepts (the ideal ranking for nDCG), and the total."""
+    expected = [expected_values(item) for item in golden]
+    counts = [0] * len(golden)
+    points = 0
+    for _, payload, _ in store.iter_points():
+        points += 1
+        for index, values in enumerate(expected):
+            if is_relevant(payload, values):
+                counts[index] += 1
+    return counts, points
+
+
+def evaluate(golden: List[Dict[str, Any]], counts: List[int], k: int, weights) -> Dict[str, Any]:
+    hit_rate = recall = reciprocal_rank = ndcg = 0.0
+    latencies = []
+    for item, relevant in zip(golden, counts):
+        expected = expected_values(item)
+        start = time.perf_counter()
+        result = vector_search.search_documents(item["question"], limit=k, weights=weights, fields=list(RELEVANCE_KEYS))
+        latencies.append((time.perf_counter() - start) * 1000)
+        ranks = [rank for rank, hit in enumerate(result.get("results", []), start=1) if is_relevant(hit, expected)]
+        if ranks:
+            hit_rate += 1
+            recall += len(ranks) / relevant
+            reciprocal_rank += 1 / ranks[0]
+            ideal = sum(1 / math.log2(rank + 1) for rank in range(1, min(relevant, k) + 1))
+            ndcg += sum(1 / math.log2(rank + 1) for rank in ranks) / ideal
+    return {
+        f"hit_rate@{k}": round(hit_rate / len(golden), 4),
+        f"recall@{k}": round(recall / len(golden), 4),
+        f"mrr@{k}": round(reciprocal_rank / len(golden), 4),
+        f"ndcg@{k}": round(ndcg / len(golden), 4),
+        "p50_ms": round(statistics.median(latencies), 2),
+        "p95_ms": round(percentile(latencies, 0.95), 2),
+        "p99_ms": round(percentile(latencies, 0.99), 2),
+    }
+
+
+def compare(
+    report: Dict[str, Any],
+    baseline: Dict[str, Any],
+    tolerance: float,
+    latency_tolerance: float,
+    latency_floor_ms: float = 0.0,
+) -> List[str]:
+    """Human-readable regressions of ``report`` against ``baseline``."""
+    if baseline.get("k") != report["k"] or baseline.get("embedder") != report["embedder"]:
+        return [f"baseline was run with k={baseline.get('k')}, embedder={baseline.get('embedder')}"]
+    regressions = []
+    for mode, metrics in report["modes"].items():
+        previous = baseline.get("modes", {}).get(mode)
+        if previous is None:
+            continue
+        for name, value in metrics.items():
+            old = previous.get(name)
+            if old is None:
+                continue
+            if name.split("@")[0] in QUALITY_METRICS and value < old - tolerance:
+                regressions.append(f"{mode} {name}: {old} -> {value}")
+            elif name in LATENCY_METRICS and value > old * (1 + latency_tolerance) and value - old > latency_floor_ms:
+                regressions.append(f"{mode} {name}: {old} -> {value}")
+    return regressions
+
+
+def run(golden: List[Dict[str, Any]], k: int, modes: List[str], snapshot: Optional[str], fake_embedder: bool, workdir: str) -> Dict[str, Any]:
+    store = LocalVectorStore(snapshot) if snapshot else vector_store
+    if fake_embedder:
+        use_fake_embedder()
+        store = reembed(store, f"{workdir}/vectors")
+    vector_search.vector_store = store
+    if snapshot or fake_embedder:
+        bm25 = BM25Index(f"{workdir}/bm25")
+        bm25.update({point_id: payload for point_id, payload, _ in store.iter_points()})
+        vector_search.bm25_index = bm25
+
+    counts, points = relevant_counts(store, golden)
+    model.embed_queries([item["question"] for item in golden])
+    vector_search.search_documents(golden[0]["question"], limit=k)
+    return {
+        "queries": len(golden),
+        "answerable": sum(1 for count in counts if count),
+        "points": points,
+        "k": k,
+        "embedder": FAKE_EMBEDDING_MODEL if fake_embedder else settings.EMBEDDING_MODEL,
+        "modes": {mode: evaluate(golden, counts, k, MODES[mode]) for mode in modes},
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--golden", required=True, help="JSON lines of question with page and/or question_number")
+    parser.add_argument("--snapshot", help="local vector store directory to search instead of the configured store")
+    parser.add_argument("--fake-embedder", action="store_true", help="deterministic hashing embedder, no API calls")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--modes", nargs="+", choices=list(MODES), default=list(MODES))
+    parser.add_argument("--output", help="write the results here as JSON")
+    parser.add_argument("--baseline", help="fail when a metric regresses against this results file")
+    parser.add_argument("--tolerance", type=float, default=0.01, help="allowed absolute drop of hit rate, recall, MRR and nDCG")
+    parser.add_argument("--latency-tolerance", type=float, default=0.5, help="allowed relative latency increase")
+    parser.add_argument("--latency-floor-ms", type=float, default=5.0, help="allowed absolute latency increase")
+    args = parser.parse_args()
+
+    golden = load_golden(args.golden)
+    if not golden:
+        parser.error(f"{args.golden} has no questions.")
+    with tempfile.TemporaryDirectory(prefix="quality-") as workdir:
+        report = run(golden, args.k, args.modes, args.snapshot, args.fake_embedder, workdir)
+
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), args.tolerance, args.latency_tolerance, args.latency_floor_ms)
+        if regressions:
+            print("Regressions against baseline:\n  " + "\n  ".join(regressions), file=sys.stderr)
+            sys.exit(1)
+        print("No regressions against baseline.", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Recall@k and latency of dense-only vs hybrid (dense + BM25) retrieval.
+
+Queries come from ``--golden`` (JSON lines of ``{"query", "relevant_ids"}``)
+or are sampled from the BM25 document table: a run of words quoted from a
+random chunk, with that chunk as the only relevant result. Query embeddings
+are warmed first so both modes are timed on search alone.
+
+    python -m app.benchmarks.retrieval --samples 200 --k 5
+"""
+import argparse
+import json
+import random
+import statistics
+import time
+from typing import Any, Dict, List
+
+from app.qdrant.bm25_index import bm25_index, search_text
+from app.qdrant.model import embed_query
+from app.qdrant.vector_search import search_documents
+from app.qdrant.vector_store import vector_store
+
+QUOTE_WORDS = 6
+MODES = {
+    "dense": {"dense": 1.0, "lexical": 0.0},
+    "hybrid": None,
+}
+
+
+def load_golden(path: str) -> List[Dict[str, Any]]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def sample_golden(samples: int, seed: int) -> List[Dict[str, Any]]:
+    rows = bm25_index.conn.execute("SELECT point_id FROM documents").fetchall()
+    point_ids = random.Random(seed).sample([row[0] for row in rows], min(samples, len(rows)))
+    payloads = vector_store.retrieve(point_ids)
+    rng = random.Random(seed)
+    golden = []
+    for point_id, payload in payloads.items():
+        words = search_text(payload).split()
+        if len(words) < QUOTE_WORDS:
+            continue
+        start = rng.randrange(len(words) - QUOTE_WORDS + 1)
+        golden.append({"query": " ".join(words[start:start + QUOTE_WORDS]), "relevant_ids": [point_id]})
+    return golden
+
+
+def relevant_hashes(golden: List[Dict[str, Any]]) -> Dict[str, str]:
+    ids = sorted({pid for item in golden for pid in item["relevant_ids"]})
+    return {point_id: payload.get("content_hash") for point_id, payload in vector_store.retrieve(ids, fields=["content_hash"]).items()}
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+def evaluate(golden: List[Dict[str, Any]], hashes: Dict[str, str], k: int, weights) -> Dict[str, Any]:
+    hits, latencies = 0, []
+    for item in golden:
+        start = time.perf_counter()
+        result = search_documents(item["query"], limit=k, weights=weights, fields=["content_hash"])
+        latencies.append((time.perf_counter() - start) * 1000)
+        wanted = {hashes.get(pid) for pid in item["relevant_ids"]} - {None}
+        if wanted & {hit.get("content_hash") for hit in result.get("results", [])}:
+            hits += 1
+    return {
+        f"recall@{k}": round(hits / len(golden), 3) if golden else None,
+        "p50_ms": round(statistics.median(latencies), 1) if latencies else None,
+        "p95_ms": round(percentile(latencies, 0.95), 1) if latencies else None,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--golden", help="JSON lines file with query and relevant_ids")
+    parser.add_argument("--samples", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=13)
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    golden = load_golden(args.golden) if args.golden else sample_golden(args.samples, args.seed)
+    hashes = relevant_hashes(golden)
+    for item in golden:
+        embed_query(item["query"])
+
+    print(json.dumps({
+        "queries": len(golden),
+        "bm25_chunks": len(bm25_index),
+        **{mode: evaluate(golden, hashes, args.k, weights) for mode, weights in MODES.items()},
+    }, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""Checks of ExtractionScheduler against a fake chat model with injected latency and failures.
+
+The fake ``ainvoke`` sleeps for a random delay and raises 429/5xx/400 errors
+on chosen attempts, so no API key is needed. Each check asserts one property:
+results keep prompt order, in-flight calls never exceed ``max_in_flight``,
+retryable failures are retried and then give ``None``, rejected attempts do
+not drain the token budget, reported usage below the estimate is given back,
+calls are paced to ``tokens_per_minute``, and concurrent runs share one
+budget and one event loop.
+Exits with status 1 when a check fails.
+
+    python -m app.benchmarks.scheduler_faults
+"""
+import argparse
+import asyncio
+import logging
+import random
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from app.qdrant.llm_scheduler import COMPLETION_TOKEN_ALLOWANCE, ExtractionScheduler, estimate_tokens
+
+
+class FakeAPIError(Exception):
+    def __init__(self, status_code: int):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+class FakeChatModel:
+    """Echoes the prompt after a random delay; ``fail(index, attempt)`` returns a status code to raise.
+
+    With ``usage`` each answer reports that many total tokens the way
+    langchain_community's ChatOpenAI does, in ``response_metadata``.
+    """
+
+    def __init__(
+        self,
+        seed: int,
+        max_delay: float = 0.02,
+        fail: Optional[Callable[[int, int], Optional[int]]] = None,
+        usage: Optional[int] = None,
+    ):
+        self.rng = random.Random(seed)
+        self.max_delay = max_delay
+        self.fail = fail
+        self.usage = usage
+        self.attempts: Dict[int, int] = defaultdict(int)
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.loops = set()
+
+    async def ainvoke(self, messages: List[Any]) -> AIMessage:
+        index = int(messages[-1].content.split()[0])
+        attempt = self.attempts[index]
+        self.attempts[index] += 1
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        self.loops.add(id(asyncio.get_running_loop()))
+        try:
+            await asyncio.sleep(self.rng.random() * self.max_delay)
+            status = self.fail(index, attempt) if self.fail else None
+            if status is not None:
+                raise FakeAPIError(status)
+            metadata = {"token_usage": {"total_tokens": self.usage}} if self.usage is not None else {}
+            return AIMessage(content=f"answer {index}", response_metadata=metadata)
+        finally:
+            self.in_flight -= 1
+
+
+def prompts(count: int) -> List[List[Any]]:
+    return [[HumanMessage(content=f"{i} page text")] for i in range(count)]
+
+
+def scheduler(llm: FakeChatModel, **kwargs) -> ExtractionScheduler:
+    return ExtractionScheduler(llm, base_delay=0.001, max_delay=0.005, **kwargs)
+
+
+def check_order(seed: int) -> None:
+    llm = FakeChatModel(seed, max_delay=0.05)
+    results = scheduler(llm, max_in_flight=8).run(prompts(40))
+    assert results == [f"answer {i}" for i in range(40)], results
+
+
+def check_in_flight(seed: int) -> None:
+    llm = FakeChatModel(seed)
+    scheduler(llm, max_in_flight=3).run(prompts(30))
+    assert llm.peak_in_flight == 3, f"peak in flight {llm.peak_in_flight}, limit 3"
+
+
+def check_retries(seed: int) -> None:
+    def fail(index: int, attempt: int) -> Optional[int]:
+        if index == 1:
+            return 429
+        if index == 2 and attempt < 2:
+            return 503
+        if index == 3:
+            return 400
+        return None
+
+    llm = FakeChatModel(seed, fail=fail)
+    results = scheduler(llm, max_retries=3).run(prompts(5))
+    assert results == ["answer 0", None, "answer 2", None, "answer 4"], results
+    assert llm.attempts[1] == 4, f"429 prompt attempted {llm.attempts[1]} times, expected 1 + 3 retries"
+    assert llm.attempts[2] == 3, f"503 prompt attempted {llm.attempts[2]} times, expected 3"
+    assert llm.attempts[3] == 1, f"400 prompt attempted {llm.attempts[3]} times, expected no retry"
+
+
+def check_refund(seed: int) -> None:
+    # Every prompt is rejected twice; without refunds the retries would cost
+    # three minutes' budget and the run would wait about two minutes.
+    count = 20
+    budget = count * estimate_tokens(prompts(1)[0])
+    llm = FakeChatModel(seed, max_delay=0.0, fail=lambda index, attempt: 429 if attempt < 2 else None)
+    start = time.perf_counter()
+    results = scheduler(llm, tokens_per_minute=budget, max_retries=3).run(prompts(count))
+    elapsed = time.perf_counter() - start
+    assert all(results), results
+    assert elapsed < 1.0, f"429 retries took {elapsed:.2f}s; rejected attempts are draining the budget"
+
+
+def check_usage(seed: int) -> None:
+    # Answers that cost far less than estimated hand the difference back.
+    count = 10
+    per_call = estimate_tokens(prompts(1)[0])
+    shared = scheduler(FakeChatModel(seed, max_delay=0.0, usage=10), tokens_per_minute=count * per_call)
+    shared.run(prompts(count))
+    spent = shared.budget.capacity - shared.budget.tokens
+    assert spent < per_call, f"{count} calls reporting 10 tokens each still hold {spent:.0f} tokens of the budget"
+
+
+def check_pacing(seed: int) -> None:
+    # A full bucket covers the first minute's worth; each call past it waits for refill.
+    per_call = estimate_tokens(prompts(1)[0])
+    tokens_per_minute = 60 * COMPLETION_TOKEN_ALLOWANCE
+    free_calls = tokens_per_minute // per_call
+    extra_calls = 2
+    expected = extra_calls * per_call * 60 / tokens_per_minute - (tokens_per_minute % per_call) * 60 / tokens_per_minute
+    llm = FakeChatModel(seed, max_delay=0.0)
+    start = time.perf_counter()
+    scheduler(llm, max_in_flight=64, tokens_per_minute=tokens_per_minute).run(prompts(free_calls + extra_calls))
+    elapsed = time.perf_counter() - start
+    assert expected * 0.9 <= elapsed <= expected + 1.0, f"paced run took {elapsed:.2f}s, expected about {expected:.2f}s"
+
+    start = time.perf_counter()
+    scheduler(FakeChatModel(seed, max_delay=0.0), tokens_per_minute=0).run(prompts(free_calls + extra_calls))
+    elapsed = time.perf_counter() - start
+    assert elapsed < 0.5, f"tokens_per_minute=0 should be unlimited, took {elapsed:.2f}s"
+
+
+def check_shared(seed: int) -> None:
+    # Two jobs at once draw on one bucket: together they overrun it, each alone would not.
+    per_call = estimate_tokens(prompts(1)[0])
+    tokens_per_minute = 60 * COMPLETION_TOKEN_ALLOWANCE
+    per_run = tokens_per_minute // per_call // 2 + 1
+    expected = (2 * per_run * per_call - tokens_per_minute) * 60 / tokens_per_minute
+    llm = FakeChatModel(seed, max_delay=0.0)
+    shared = scheduler(llm, max_in_flight=64, tokens_per_minute=tokens_per_minute)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        list(pool.map(lambda _: shared.run(prompts(per_run)), range(2)))
+    elapsed = time.perf_counter() - start
+    assert elapsed >= expected * 0.9, f"two concurrent runs took {elapsed:.2f}s, expected about {expected:.2f}s on a shared budget"
+    shared.run(prompts(1))
+    assert len(llm.loops) == 1, f"calls ran on {len(llm.loops)} event loops"
+
+
+CHECKS = {
+    "order": check_order,
+    "in_flight": check_in_flight,
+    "retries": check_retries,
+    "refund": check_refund,
+    "usage": check_usage,
+    "pacing": check_pacing,
+    "shared": check_shared,
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seed", type=int, default=13)
+    parser.add_argument("--only", nargs="+", choices=list(CHECKS), default=list(CHECKS))
+    args = parser.parse_args()
+    # Injected failures would otherwise log a warning or traceback per attempt.
+    logging.getLogger("app.qdrant.llm_scheduler").setLevel(logging.CRITICAL)
+
+    failed = 0
+    for name in args.only:
+        try:
+            CHECKS[name](args.seed)
+            print(f"ok    {name}")
+        except AssertionError as e:
+            failed += 1
+            print(f"FAIL  {name}: {e}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
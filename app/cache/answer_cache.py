@@ -0,0 +1,141 @@
+import logging
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from app.config import settings
+from app.qdrant.model import EMBEDDING_DIMENSIONS
+from app.utils.generation import bump_generation, read_generation
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class AnswerCache:
+    """Semantic cache of final answers keyed by the enriched-query embedding.
+
+    Vectors live in a preallocated float32 matrix so a lookup is a single
+    matrix-vector product. Entries expire after ``ttl_seconds``; when full the
+    least recently used slot is reused. Bumping the counter in
+    ``generation_path`` (done on every re-ingest) invalidates the cache in
+    every worker on the host.
+    """
+
+    def __init__(
+        self,
+        dimensions: int,
+        threshold: float = 0.95,
+        ttl_seconds: float = 86400,
+        max_entries: int = 2000,
+        generation_path: Optional[str] = None,
+    ):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.generation_path = generation_path
+        self.vectors = np.zeros((max_entries, dimensions), dtype=np.float32)
+        self.answers: list = [None] * max_entries
+        self.languages: list = [None] * max_entries
+        self.created_at = np.zeros(max_entries, dtype=np.float64)
+        self.last_used = np.zeros(max_entries, dtype=np.float64)
+        self.occupied = np.zeros(max_entries, dtype=bool)
+        self.generation = self._read_generation()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _read_generation(self) -> Optional[int]:
+        if not self.generation_path:
+            return None
+        return read_generation(self.generation_path)
+
+    def _clear_locked(self) -> None:
+        self.occupied[:] = False
+        self.answers = [None] * self.max_entries
+        self.languages = [None] * self.max_entries
+
+    def _sync_generation_locked(self) -> None:
+        generation = self._read_generation()
+        if generation != self.generation:
+            self.generation = generation
+            self._clear_locked()
+            logger.info("Answer cache cleared after collection re-ingest.")
+
+    def _live_mask(self, now: float) -> np.ndarray:
+        return self.occupied & (now - self.created_at < self.ttl_seconds)
+
+    def lookup(self, vector: Any, language: str) -> Optional[str]:
+        query = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm == 0:
+            return None
+        query = query / norm
+        now = time.time()
+
+        with self.lock:
+            self._sync_generation_locked()
+            live = self._live_mask(now)
+            self.occupied = live
+            candidates = np.flatnonzero(live)
+            candidates = [i for i in candidates if self.languages[i] == language]
+            if candidates:
+                scores = self.vectors[candidates] @ query
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold:
+                    slot = candidates[best]
+                    self.last_used[slot] = now
+                    self.hits += 1
+                    logger.info(f"Answer cache hit (cosine {scores[best]:.3f}).")
+                    return self.answers[slot]
+            self.misses += 1
+            return None
+
+    def store(self, vector: Any, language: str, answer: str) -> None:
+        query = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm == 0:
+            return
+        now = time.time()
+
+        with self.lock:
+            self._sync_generation_locked()
+            self.occupied = self._live_mask(now)
+            free = np.flatnonzero(~self.occupied)
+            slot = int(free[0]) if len(free) else int(np.argmin(self.last_used))
+            self.vectors[slot] = query / norm
+            self.answers[slot] = answer
+            self.languages[slot] = language
+            self.created_at[slot] = now
+            self.last_used[slot] = now
+            self.occupied[slot] = True
+
+    def invalidate(self) -> None:
+        """Drop all answers here and signal other workers via ``generation_path``."""
+        with self.lock:
+            self._clear_locked()
+            if self.generation_path:
+                try:
+                    self.generation = bump_generation(self.generation_path)
+                except OSError as e:
+                    logger.warning(f"Could not update answer cache generation: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": int(self._live_mask(time.time()).sum()),
+            }
+
+
+answer_cache = AnswerCache(
+    dimensions=EMBEDDING_DIMENSIONS,
+    threshold=settings.ANSWER_CACHE_THRESHOLD,
+    ttl_seconds=settings.ANSWER_CACHE_TTL_SECONDS,
+    max_entries=settings.ANSWER_CACHE_MAX_ENTRIES,
+    generation_path=settings.ANSWER_CACHE_GENERATION_PATH or None,
+)
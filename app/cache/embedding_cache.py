@@ -0,0 +1,135 @@
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Pruning trims the persistent tier to this share of its cap, so it runs
+# once per ~10% of max_persistent_entries inserts rather than on every miss.
+PRUNE_TO_RATIO = 0.9
+
+
+def normalize_query(text: str) -> str:
+    text = unicodedata.normalize("NFKC", text or "")
+    return re.sub(r"\s+", " ", text).strip().casefold()
+
+
+class EmbeddingCache:
+    """Two-tier cache of query embeddings stored as float32 arrays.
+
+    The in-process tier is an LRU bounded by ``max_entries``; the optional
+    SQLite tier at ``path`` survives restarts and is shared by workers on the
+    same host. Keys cover the model, the dimensions and the normalized text.
+    The persistent tier is pruned to its newest entries once it grows past
+    ``max_persistent_entries``.
+    """
+
+    def __init__(self, model: str, dimensions: int, max_entries: int = 10000, path: Optional[str] = None, max_persistent_entries: int = 100000):
+        self.model = model
+        self.dimensions = dimensions
+        self.max_entries = max_entries
+        self.max_persistent_entries = max_persistent_entries
+        self.entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+        self.conn: Optional[sqlite3.Connection] = None
+        self.persistent_entries = 0
+        if path:
+            if os.path.dirname(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+            self.conn = sqlite3.connect(path, check_same_thread=False)
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS embedding_cache ("
+                "key TEXT PRIMARY KEY, vector BLOB NOT NULL, created_at REAL NOT NULL)"
+            )
+            self.conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_embedding_cache_created_at ON embedding_cache (created_at)"
+            )
+            self.conn.commit()
+            self.persistent_entries = self.conn.execute("SELECT COUNT(*) FROM embedding_cache").fetchone()[0]
+
+    def make_key(self, text: str) -> str:
+        raw = f"{self.model}|{self.dimensions}|{normalize_query(text)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _remember(self, key: str, vector: np.ndarray) -> None:
+        self.entries[key] = vector
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def get(self, text: str) -> Optional[np.ndarray]:
+        key = self.make_key(text)
+        with self.lock:
+            vector = self.entries.get(key)
+            if vector is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return vector
+
+            if self.conn is not None:
+                row = self.conn.execute(
+                    "SELECT vector FROM embedding_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    vector = np.frombuffer(row[0], dtype=np.float32)
+                    self._remember(key, vector)
+                    self.hits += 1
+                    self.persistent_hits += 1
+                    return vector
+
+            self.misses += 1
+            return None
+
+    def set(self, text: str, vector: Any) -> np.ndarray:
+        key = self.make_key(text)
+        array = np.asarray(vector, dtype=np.float32)
+        with self.lock:
+            self._remember(key, array)
+            if self.conn is not None:
+                try:
+                    self.conn.execute(
+                        "INSERT OR REPLACE INTO embedding_cache (key, vector, created_at) VALUES (?, ?, ?)",
+                        (key, array.tobytes(), time.time()),
+                    )
+                    self.persistent_entries += 1
+                    if self.persistent_entries > self.max_persistent_entries:
+                        self._prune()
+                    self.conn.commit()
+                except sqlite3.Error as e:
+                    logger.warning(f"Could not persist query embedding: {e}")
+        return array
+
+    def _prune(self) -> None:
+        """Keep the newest entries of the persistent tier; the count is re-read since other workers write too."""
+        keep = int(self.max_persistent_entries * PRUNE_TO_RATIO)
+        self.conn.execute(
+            "DELETE FROM embedding_cache WHERE created_at < ("
+            "SELECT created_at FROM embedding_cache ORDER BY created_at DESC LIMIT 1 OFFSET ?)",
+            (keep,),
+        )
+        self.persistent_entries = self.conn.execute("SELECT COUNT(*) FROM embedding_cache").fetchone()[0]
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "persistent_hits": self.persistent_hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self.entries),
+                "memory_bytes": len(self.entries) * self.dimensions * np.dtype(np.float32).itemsize,
+            }
@@ -0,0 +1,91 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Optional
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Pruning trims the cache to this share of its cap, so it runs once per ~10%
+# of max_entries inserts rather than on every insert.
+PRUNE_TO_RATIO = 0.9
+# A hit only rewrites last_access when the stored one is older than this, so
+# re-reading a book's pages does not commit a write per page.
+TOUCH_INTERVAL_SECONDS = 3600
+
+
+class ExtractionCache:
+    """Persistent LRU cache of parsed LLM page-extraction results.
+
+    Entries are addressed by a hash of everything that determines the model
+    output (model id, temperature, system message and prompt), so an unchanged
+    page maps to the same entry across ingestion runs. Recency is tracked to
+    within ``TOUCH_INTERVAL_SECONDS`` and the oldest entries are pruned in
+    batches once the cache grows past ``max_entries``.
+    """
+
+    def __init__(self, path: str, max_entries: int = 5000):
+        self.path = path
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS extraction_cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, last_access REAL NOT NULL)"
+        )
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_extraction_cache_last_access ON extraction_cache (last_access)"
+        )
+        self.conn.commit()
+        self.entries = self.conn.execute("SELECT COUNT(*) FROM extraction_cache").fetchone()[0]
+
+    @staticmethod
+    def make_key(model_id: str, temperature: float, system_message: str, prompt: str) -> str:
+        raw = json.dumps([model_id, temperature, system_message, prompt], ensure_ascii=False)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT value, last_access FROM extraction_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            now = time.time()
+            if now - row[1] > TOUCH_INTERVAL_SECONDS:
+                self.conn.execute(
+                    "UPDATE extraction_cache SET last_access = ? WHERE key = ?", (now, key)
+                )
+                self.conn.commit()
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Any) -> None:
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO extraction_cache (key, value, last_access) VALUES (?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), time.time()),
+            )
+            self.entries += 1
+            if self.entries > self.max_entries:
+                self._prune()
+            self.conn.commit()
+
+    def _prune(self) -> None:
+        """Keep the most recently used entries; the count is re-read since other workers write too."""
+        keep = int(self.max_entries * PRUNE_TO_RATIO)
+        self.conn.execute(
+            "DELETE FROM extraction_cache WHERE last_access < ("
+            "SELECT last_access FROM extraction_cache ORDER BY last_access DESC LIMIT 1 OFFSET ?)",
+            (keep,),
+        )
+        self.entries = self.conn.execute("SELECT COUNT(*) FROM extraction_cache").fetchone()[0]
+
+    def __len__(self) -> int:
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM extraction_cache").fetchone()[0]
@@ -0,0 +1,449 @@
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+from langgraph.checkpoint.memory import MemorySaver
+
+from app.config import settings
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MESSAGES_CHANNEL = "messages"
+
+
+def message_count(checkpoint: Checkpoint) -> int:
+    messages = (checkpoint.get("channel_values") or {}).get(MESSAGES_CHANNEL)
+    return len(messages) if isinstance(messages, list) else 0
+
+
+class SqliteConversationStore(BaseCheckpointSaver):
+    """Bounded LangGraph checkpointer backed by a single SQLite file.
+
+    Only the latest checkpoint of each thread is kept, with the ``messages``
+    channel trimmed to ``max_messages``. Threads idle for longer than
+    ``ttl_seconds`` expire, and once the stored checkpoints exceed
+    ``max_total_bytes`` the least recently used threads are evicted. The file
+    is opened in WAL mode so every worker on the host can serve any thread.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        ttl_seconds: float = 7 * 86400,
+        max_messages: int = 40,
+        max_total_bytes: int = 512 * 1024 * 1024,
+        cleanup_interval: float = 60.0,
+    ):
+        super().__init__()
+        self.ttl_seconds = ttl_seconds
+        self.max_messages = max_messages
+        self.max_total_bytes = max_total_bytes
+        self.cleanup_interval = cleanup_interval
+        self.last_cleanup = 0.0
+        self.lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS checkpoints ("
+            "thread_id TEXT NOT NULL, checkpoint_ns TEXT NOT NULL, checkpoint_id TEXT NOT NULL, "
+            "parent_checkpoint_id TEXT, checkpoint_type TEXT NOT NULL, checkpoint BLOB NOT NULL, "
+            "metadata_type TEXT NOT NULL, metadata BLOB NOT NULL, message_count INTEGER NOT NULL, "
+            "size_bytes INTEGER NOT NULL, updated_at REAL NOT NULL, "
+            "PRIMARY KEY (thread_id, checkpoint_ns))"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS checkpoints_updated_at ON checkpoints (updated_at)")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS writes ("
+            "thread_id TEXT NOT NULL, checkpoint_ns TEXT NOT NULL, checkpoint_id TEXT NOT NULL, "
+            "task_id TEXT NOT NULL, idx INTEGER NOT NULL, channel TEXT NOT NULL, "
+            "value_type TEXT NOT NULL, value BLOB NOT NULL, task_path TEXT NOT NULL, "
+            "PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx))"
+        )
+        self.conn.commit()
+
+    def _trim_messages(self, checkpoint: Checkpoint) -> Checkpoint:
+        values = dict(checkpoint.get("channel_values") or {})
+        messages = values.get(MESSAGES_CHANNEL)
+        if isinstance(messages, list) and self.max_messages and len(messages) > self.max_messages:
+            values[MESSAGES_CHANNEL] = messages[-self.max_messages:]
+            checkpoint = {**checkpoint, "channel_values": values}
+        return checkpoint
+
+    def _expired(self, updated_at: float, now: float) -> bool:
+        return bool(self.ttl_seconds) and now - updated_at > self.ttl_seconds
+
+    def _delete_locked(self, thread_id: str) -> None:
+        self.conn.execute("DELETE FROM checkpoints WHERE thread_id = ?", (thread_id,))
+        self.conn.execute("DELETE FROM writes WHERE thread_id = ?", (thread_id,))
+
+    def _cleanup_locked(self, now: float) -> None:
+        if now - self.last_cleanup < self.cleanup_interval:
+            return
+        self.last_cleanup = now
+        expired = 0
+        if self.ttl_seconds:
+            expired = self.conn.execute(
+                "DELETE FROM checkpoints WHERE updated_at < ?", (now - self.ttl_seconds,)
+            ).rowcount
+        evicted = 0
+        if self.max_total_bytes:
+            evicted = self.conn.execute(
+                "DELETE FROM checkpoints WHERE rowid IN ("
+                "SELECT rowid FROM (SELECT rowid, SUM(size_bytes) OVER "
+                "(ORDER BY updated_at DESC ROWS UNBOUNDED PRECEDING) AS running FROM checkpoints) "
+                "WHERE running > ?)",
+                (self.max_total_bytes,),
+            ).rowcount
+        if expired or evicted:
+            self.conn.execute(
+                "DELETE FROM writes WHERE NOT EXISTS (SELECT 1 FROM checkpoints c WHERE "
+                "c.thread_id = writes.thread_id AND c.checkpoint_ns = writes.checkpoint_ns "
+                "AND c.checkpoint_id = writes.checkpoint_id)"
+            )
+            logger.info(f"Conversation store cleanup: {expired} expired, {evicted} evicted threads.")
+
+    def _to_tuple(self, row: Sequence[Any]) -> CheckpointTuple:
+        thread_id, checkpoint_ns, checkpoint_id, parent_id, c_type, c_blob, m_type, m_blob = row[:8]
+        writes = self.conn.execute(
+            "SELECT task_id, channel, value_type, value FROM writes "
+            "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? ORDER BY task_id, idx",
+            (thread_id, checkpoint_ns, checkpoint_id),
+        ).fetchall()
+        return CheckpointTuple(
+            config={"configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint_id,
+            }},
+            checkpoint=self.serde.loads_typed((c_type, c_blob)),
+            metadata=self.serde.loads_typed((m_type, m_blob)),
+            parent_config={"configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": parent_id,
+            }} if parent_id else None,
+            pending_writes=[
+                (task_id, channel, self.serde.loads_typed((v_type, v_blob)))
+                for task_id, channel, v_type, v_blob in writes
+            ],
+        )
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = get_checkpoint_id(config)
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, checkpoint_type, "
+                "checkpoint, metadata_type, metadata, updated_at FROM checkpoints "
+                "WHERE thread_id = ? AND checkpoint_ns = ?",
+                (thread_id, checkpoint_ns),
+            ).fetchone()
+            if row is None or (checkpoint_id and row[2] != checkpoint_id):
+                return None
+            if self._expired(row[8], now):
+                self._delete_locked(thread_id)
+                self.conn.commit()
+                return None
+            return self._to_tuple(row)
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        query = (
+            "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, checkpoint_type, "
+            "checkpoint, metadata_type, metadata FROM checkpoints WHERE updated_at >= ?"
+        )
+        params: List[Any] = [time.time() - self.ttl_seconds if self.ttl_seconds else 0]
+        if config:
+            query += " AND thread_id = ?"
+            params.append(config["configurable"]["thread_id"])
+            if config["configurable"].get("checkpoint_ns") is not None:
+                query += " AND checkpoint_ns = ?"
+                params.append(config["configurable"]["checkpoint_ns"])
+            if get_checkpoint_id(config):
+                query += " AND checkpoint_id = ?"
+                params.append(get_checkpoint_id(config))
+        if before and get_checkpoint_id(before):
+            query += " AND checkpoint_id < ?"
+            params.append(get_checkpoint_id(before))
+        query += " ORDER BY updated_at DESC"
+
+        with self.lock:
+            rows = self.conn.execute(query, params).fetchall()
+            tuples = [self._to_tuple(row) for row in rows]
+        for item in tuples:
+            if filter and not all(item.metadata.get(k) == v for k, v in filter.items()):
+                continue
+            if limit is not None:
+                if limit <= 0:
+                    break
+                limit -= 1
+            yield item
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint = self._trim_messages(checkpoint)
+        c_type, c_blob = self.serde.dumps_typed(checkpoint)
+        m_type, m_blob = self.serde.dumps_typed(get_checkpoint_metadata(config, metadata))
+        now = time.time()
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO checkpoints (thread_id, checkpoint_ns, checkpoint_id, "
+                "parent_checkpoint_id, checkpoint_type, checkpoint, metadata_type, metadata, "
+                "message_count, size_bytes, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    thread_id, checkpoint_ns, checkpoint["id"], get_checkpoint_id(config),
+                    c_type, c_blob, m_type, m_blob, message_count(checkpoint), len(c_blob) + len(m_blob), now,
+                ),
+            )
+            self.conn.execute(
+                "DELETE FROM writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id != ?",
+                (thread_id, checkpoint_ns, checkpoint["id"]),
+            )
+            self._cleanup_locked(now)
+            self.conn.commit()
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        rows = []
+        for idx, (channel, value) in enumerate(writes):
+            v_type, v_blob = self.serde.dumps_typed(value)
+            rows.append((
+                thread_id, checkpoint_ns, checkpoint_id, task_id,
+                WRITES_IDX_MAP.get(channel, idx), channel, v_type, v_blob, task_path,
+            ))
+        # Special writes (errors, interrupts) may be replaced; regular ones are written once.
+        verb = "INSERT OR REPLACE" if all(channel in WRITES_IDX_MAP for channel, _ in writes) else "INSERT OR IGNORE"
+        with self.lock:
+            self.conn.executemany(
+                f"{verb} INTO writes (thread_id, checkpoint_ns, checkpoint_id, task_id, idx, "
+                "channel, value_type, value, task_path) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self.conn.commit()
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self.lock:
+            self._delete_locked(thread_id)
+            self.conn.commit()
+
+    def delete_threads(self, thread_ids: Sequence[str]) -> int:
+        """Delete several threads in one transaction; returns how many existed."""
+        with self.lock:
+            deleted = 0
+            for thread_id in thread_ids:
+                deleted += self.conn.execute(
+                    "DELETE FROM checkpoints WHERE thread_id = ?", (thread_id,)
+                ).rowcount > 0
+                self.conn.execute("DELETE FROM writes WHERE thread_id = ?", (thread_id,))
+            self.conn.commit()
+            return deleted
+
+    def thread_stats(self, thread_id: str) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT thread_id, SUM(message_count), SUM(size_bytes), MAX(updated_at) "
+                "FROM checkpoints WHERE thread_id = ? GROUP BY thread_id",
+                (thread_id,),
+            ).fetchone()
+        if row is None or self._expired(row[3], time.time()):
+            return None
+        return {"thread_id": row[0], "message_count": row[1], "size_bytes": row[2], "updated_at": row[3]}
+
+    def list_threads(self, limit: int = 100, offset: int = 0) -> List[Dict[str, Any]]:
+        """Live threads, most recently used first."""
+        since = time.time() - self.ttl_seconds if self.ttl_seconds else 0
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT thread_id, SUM(message_count), SUM(size_bytes), MAX(updated_at) AS last "
+                "FROM checkpoints WHERE updated_at >= ? GROUP BY thread_id "
+                "ORDER BY last DESC LIMIT ? OFFSET ?",
+                (since, limit, offset),
+            ).fetchall()
+        return [
+            {"thread_id": r[0], "message_count": r[1], "size_bytes": r[2], "updated_at": r[3]}
+            for r in rows
+        ]
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        items = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for item in items:
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+
+class MemoryConversationStore(MemorySaver):
+    """In-process checkpointer with a per-thread index of its keys.
+
+    ``MemorySaver`` finds a thread's blobs and writes by scanning every key;
+    here each thread remembers its own keys so deleting it and reading its
+    stats are direct lookups. Nothing is bounded, so keep it for development.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.thread_blobs: Dict[str, set] = defaultdict(set)
+        self.thread_writes: Dict[str, set] = defaultdict(set)
+        self.thread_info: Dict[str, Dict[str, Any]] = {}
+        self.index_lock = threading.Lock()
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        result = super().put(config, checkpoint, metadata, new_versions)
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        keys = [(thread_id, checkpoint_ns, channel, version) for channel, version in new_versions.items()]
+        size = len(self.storage[thread_id][checkpoint_ns][checkpoint["id"]][0][1])
+        size += sum(len(self.blobs[key][1]) for key in keys)
+        with self.index_lock:
+            self.thread_blobs[thread_id].update(keys)
+            # get_tuple reads ``writes`` through a defaultdict, creating an empty
+            # entry per checkpoint even when nothing was written; index it too.
+            self.thread_writes[thread_id].add((thread_id, checkpoint_ns, checkpoint["id"]))
+            info = self.thread_info.setdefault(thread_id, {"size_bytes": 0})
+            info["size_bytes"] += size
+            info["message_count"] = message_count(checkpoint)
+            info["updated_at"] = time.time()
+        return result
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        super().put_writes(config, writes, task_id, task_path)
+        thread_id = config["configurable"]["thread_id"]
+        with self.index_lock:
+            self.thread_writes[thread_id].add(
+                (thread_id, config["configurable"]["checkpoint_ns"], config["configurable"]["checkpoint_id"])
+            )
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self.index_lock:
+            self.storage.pop(thread_id, None)
+            for key in self.thread_blobs.pop(thread_id, ()):
+                self.blobs.pop(key, None)
+            for key in self.thread_writes.pop(thread_id, ()):
+                self.writes.pop(key, None)
+            self.thread_info.pop(thread_id, None)
+
+    def delete_threads(self, thread_ids: Sequence[str]) -> int:
+        deleted = 0
+        for thread_id in thread_ids:
+            deleted += thread_id in self.thread_info
+            self.delete_thread(thread_id)
+        return deleted
+
+    def thread_stats(self, thread_id: str) -> Optional[Dict[str, Any]]:
+        with self.index_lock:
+            info = self.thread_info.get(thread_id)
+            return {"thread_id": thread_id, **info} if info else None
+
+    def list_threads(self, limit: int = 100, offset: int = 0) -> List[Dict[str, Any]]:
+        with self.index_lock:
+            items = sorted(self.thread_info.items(), key=lambda item: item[1]["updated_at"], reverse=True)
+        return [{"thread_id": thread_id, **info} for thread_id, info in items[offset:offset + limit]]
+
+
+def build_checkpointer() -> BaseCheckpointSaver:
+    """Checkpointer selected by ``CHECKPOINT_BACKEND`` ("sqlite" or "memory")."""
+    backend = settings.CHECKPOINT_BACKEND.lower()
+    if backend == "memory":
+        logger.warning("Using the in-memory checkpointer: conversations are unbounded and per-process.")
+        return MemoryConversationStore()
+    if backend != "sqlite":
+        raise ValueError(f"Unknown CHECKPOINT_BACKEND: {settings.CHECKPOINT_BACKEND}")
+    return SqliteConversationStore(
+        path=settings.CHECKPOINT_DB_PATH,
+        ttl_seconds=settings.CONVERSATION_TTL_SECONDS,
+        max_messages=settings.CONVERSATION_MAX_MESSAGES,
+        max_total_bytes=settings.CONVERSATION_MAX_TOTAL_MB * 1024 * 1024,
+    )
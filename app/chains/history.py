@@ -0,0 +1,138 @@
+import hashlib
+import logging
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from langchain_core.messages import BaseMessage
+
+from app.utils.tokens import get_token_counter
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SUMMARY_HEADER = "Summary of earlier conversation:"
+
+
+def message_fingerprint(message: BaseMessage) -> str:
+    # Messages written by llm_chain carry a unique id; older ones fall back to their content.
+    if message.id:
+        return message.id
+    return hashlib.sha256(f"{message.type}|{message.content}".encode("utf-8")).hexdigest()[:16]
+
+
+class HistoryManager:
+    """Builds the ``chat_history`` prompt text within a token budget.
+
+    The last ``recent_turns`` turns are kept verbatim; older turns are folded
+    into a running summary carried in the graph state as ``summary`` plus
+    ``summary_tail`` (id of the last summarized message). The summary
+    is only recomputed once ``summary_batch_turns`` turns have fallen out of
+    the verbatim window, so most turns cost no extra LLM call.
+    """
+
+    def __init__(
+        self,
+        summarizer: Any,
+        model: str,
+        token_budget: int = 1500,
+        recent_turns: int = 3,
+        summary_max_tokens: int = 300,
+        summary_batch_turns: int = 2,
+    ):
+        self.summarizer = summarizer
+        self.counter = get_token_counter(model)
+        self.token_budget = token_budget
+        self.recent_turns = recent_turns
+        self.summary_max_tokens = summary_max_tokens
+        self.summary_batch_turns = summary_batch_turns
+
+    def count_tokens(self, text: str) -> int:
+        return self.counter.count(text)
+
+    def _unsummarized_start(self, history: Sequence[BaseMessage], summary_tail: Optional[str]) -> int:
+        if not summary_tail:
+            return 0
+        for i in range(len(history) - 1, -1, -1):
+            if message_fingerprint(history[i]) == summary_tail:
+                return i + 1
+        # The summarized messages were trimmed from the store: all that is left is new.
+        return 0
+
+    def plan(
+        self, history: Sequence[BaseMessage], summary: str, summary_tail: Optional[str]
+    ) -> Tuple[List[BaseMessage], List[BaseMessage]]:
+        """Split ``history`` into (messages to fold into the summary, verbatim messages)."""
+        start = self._unsummarized_start(history, summary_tail)
+        pending = list(history[start:])
+        verbatim_budget = self.token_budget - self._summary_tokens(summary)
+
+        window = 2 * self.recent_turns
+        batch = 2 * self.summary_batch_turns
+        overflow = max(len(pending) - window, 0)
+        fold_count = overflow if overflow >= batch else 0
+        if not fold_count and self._tokens(pending) > verbatim_budget:
+            fold_count = overflow
+
+        # Never keep more verbatim text than the budget allows, but always keep the last turn.
+        while len(pending) - fold_count > 2 and self._tokens(pending[fold_count:]) > verbatim_budget:
+            fold_count += 2
+        return pending[:fold_count], pending[fold_count:]
+
+    def _summary_tokens(self, summary: str) -> int:
+        return self.count_tokens(f"{SUMMARY_HEADER}\n{summary}\n\n") if summary else 0
+
+    def _tokens(self, messages: Sequence[BaseMessage]) -> int:
+        return sum(self.count_tokens(message.content) for message in messages)
+
+    def _summary_inputs(self, summary: str, fold: Sequence[BaseMessage]) -> Dict[str, Any]:
+        return {
+            "summary": summary or "",
+            "new_lines": "\n".join(f"{message.type}: {message.content}" for message in fold),
+            "max_words": max(self.summary_max_tokens // 2, 20),
+        }
+
+    def render(self, summary: str, recent: Sequence[BaseMessage]) -> str:
+        verbatim_budget = self.token_budget - self._summary_tokens(summary)
+        lines = [message.content for message in recent]
+        text = "\n".join(lines)
+        if self.count_tokens(text) > verbatim_budget:
+            text = self.counter.truncate(text, max(verbatim_budget, 0))
+        if summary:
+            return f"{SUMMARY_HEADER}\n{summary}\n\n{text}"
+        return text
+
+    def _finish(
+        self, summary: str, fold: Sequence[BaseMessage], new_summary: Optional[str]
+    ) -> Tuple[str, Dict[str, str]]:
+        if not fold or new_summary is None:
+            return summary, {}
+        summary = self.counter.truncate(new_summary.strip(), self.summary_max_tokens)
+        return summary, {"summary": summary, "summary_tail": message_fingerprint(fold[-1])}
+
+    def build(
+        self, history: Sequence[BaseMessage], summary: str = "", summary_tail: Optional[str] = None
+    ) -> Tuple[str, Dict[str, str]]:
+        """Return the chat_history text and the state update for the summary channels."""
+        summary = summary or ""
+        fold, recent = self.plan(history, summary, summary_tail)
+        new_summary = None
+        if fold:
+            try:
+                new_summary = self.summarizer.invoke(self._summary_inputs(summary, fold)).content
+            except Exception as e:
+                logger.warning(f"History summary failed, keeping the previous one: {e}")
+        summary, update = self._finish(summary, fold, new_summary)
+        return self.render(summary, recent), update
+
+    async def abuild(
+        self, history: Sequence[BaseMessage], summary: str = "", summary_tail: Optional[str] = None
+    ) -> Tuple[str, Dict[str, str]]:
+        summary = summary or ""
+        fold, recent = self.plan(history, summary, summary_tail)
+        new_summary = None
+        if fold:
+            try:
+                new_summary = (await self.summarizer.ainvoke(self._summary_inputs(summary, fold))).content
+            except Exception as e:
+                logger.warning(f"History summary failed, keeping the previous one: {e}")
+        summary, update = self._finish(summary, fold, new_summary)
+        return self.render(summary, recent), update
@@ -1,126 +1,446 @@
-import logging
-import operator
-import os
-from typing import TypedDict, List, Annotated, Dict, Any
-
-from langchain_core.messages import HumanMessage, AIMessage, BaseMessage
-from langchain_openai import ChatOpenAI
-from langgraph.graph import StateGraph, END
-from langgraph.checkpoint.memory import MemorySaver
-from langchain_core.exceptions import LangChainException
-
-from app.config import settings
-from app.prompts.query_enrichment_prompt import query_prompt
-from app.prompts.response_prompt import resp_prompt
-from app.qdrant.vector_search import search_documents
-from app.utils.response_perser import parse_ai_message
-
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
-
-THREAD_ID = "student-thread-1"
-os.environ["OPENAI_API_KEY"] = settings.OPENAI_API_KEY
-llm = ChatOpenAI(model_name=settings.MODEL_ID, temperature=0.3)
-
-
-class AgentState(TypedDict):
-    messages: Annotated[List[BaseMessage], operator.add]
-
-
-query_enrichment_chain = query_prompt | llm
-response_chain = resp_prompt | llm
-
-
-def vector_search_qdrant(query):
-    return search_documents(query)
-
-
-def enrich_and_search(state: AgentState) -> AgentState:
-    user_msg = state["messages"][-1]
-    chat_history = "\n".join([msg.content for msg in state["messages"][:-1]])
-
-    try:
-        enriched = query_enrichment_chain.invoke({
-            "question": user_msg.content,
-            "chat_history": chat_history
-        })
-        enriched_query = enriched.content
-    except (LangChainException, Exception) as e:
-        error_message = f"[Error in enrichment step] {str(e)}"
-        logger.exception(error_message)
-        return {
-            "messages": state["messages"] + [AIMessage(content=error_message)]
-        }
-
-    try:
-        vector_result = vector_search_qdrant(enriched_query)
-    except Exception as e:
-        error_message = f"[Error in vector search] {str(e)}"
-        logger.exception(error_message)
-        return {
-            "messages": state["messages"] + [AIMessage(content=error_message)]
-        }
-
-    try:
-        response = response_chain.invoke({
-            "question": user_msg.content,
-            "chat_history": chat_history,
-            "vector_result": vector_result
-        })
-        return {
-            "messages": state["messages"] + [AIMessage(content=response.content)]
-        }
-    except (LangChainException, Exception) as e:
-        error_message = f"[Error in response generation] {str(e)}"
-        logger.exception(error_message)
-        return {
-            "messages": state["messages"] + [AIMessage(content=error_message)]
-        }
-
-
-workflow = StateGraph(AgentState)
-workflow.add_node("qa_step", enrich_and_search)
-workflow.set_entry_point("qa_step")
-workflow.add_edge("qa_step", END)
-
-memory = MemorySaver()
-app = workflow.compile(checkpointer=memory)
-
-
-def process_query(user_query: str, thread_id: str) -> Dict[str, Any]:
-    try:
-        result = app.invoke(
-            {"messages": [HumanMessage(content=user_query)]},
-            config={"configurable": {"thread_id": thread_id}}
-        )
-        raw_response = result["messages"][-1]
-        parsed = parse_ai_message(raw_response)
-        return parsed
-    except Exception as e:
-        logger.exception(f"Error during query processing: {str(e)}")
-        return {"error": f"Failed to process query: {str(e)}"}
-
-
-def reset_conversation_memory(thread_id: str) -> Dict[str, str]:
-    try:
-        if hasattr(memory, 'storage'):
-            storage = memory.storage
-            keys_to_remove = [key for key in list(storage.keys()) if thread_id in str(key)]
-            for key in keys_to_remove:
-                storage.pop(key, None)
-            logger.info(f"Memory reset successfully for thread: {thread_id} - Removed {len(keys_to_remove)} entries")
-
-        elif hasattr(memory, 'store'):
-            store = memory.store
-            keys_to_remove = [key for key in list(store.keys()) if thread_id in str(key)]
-            for key in keys_to_remove:
-                store.pop(key, None)
-            logger.info(f"Memory reset successfully for thread: {thread_id} - Removed {len(keys_to_remove)} entries")
-
-        else:
-            logger.warning(f"No recognizable memory store found for thread: {thread_id}")
-        
-        return {"message": f"Memory reset for thread: {thread_id}"}
-    except Exception as e:
-        logger.error(f"Error resetting memory for thread {thread_id}: {str(e)}")
-        return {"error": f"Failed to reset memory: {str(e)}"}
+import json
+import logging
+import operator
+import os
+import uuid
+from typing import TypedDict, List, Annotated, Dict, Any, AsyncIterator, Optional, Tuple
+
+from langchain_core.messages import HumanMessage, AIMessage, BaseMessage
+from langchain_openai import ChatOpenAI
+from langgraph.graph import StateGraph, END
+from langchain_core.exceptions import LangChainException
+from langchain_core.runnables import RunnableConfig, RunnableLambda
+
+from app.config import settings
+from app.prompts.query_enrichment_prompt import query_prompt
+from app.prompts.response_prompt import resp_prompt
+from app.qdrant.vector_search import search_documents, asearch_documents
+from app.qdrant.model import embed_query, aembed_query
+from app.qdrant.mcq_index import mcq_index
+from app.cache.answer_cache import answer_cache
+from app.cache.embedding_cache import normalize_query
+from app.chains.conversation_store import build_checkpointer
+from app.chains.history import HistoryManager
+from app.prompts.history_summary_prompt import summary_prompt
+from app.utils.bangla import needs_context, question_language
+from app.utils.intent import route_filter
+from app.utils.response_perser import parse_ai_message, strip_json_fence
+from app.utils.stream_parser import IncrementalAnswerParser
+from app.utils.context_builder import CONTEXT_FIELDS, build_context
+from app.utils.tokens import get_token_counter
+from app.utils.metrics import TokenUsageCallback, count_cache_lookups, timed
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+THREAD_ID = "student-thread-1"
+SEARCH_LIMIT = 5
+os.environ["OPENAI_API_KEY"] = settings.OPENAI_API_KEY
+# stream_usage makes streamed answers report their token usage as well.
+llm = ChatOpenAI(model_name=settings.MODEL_ID, temperature=0.3, stream_usage=True, callbacks=[TokenUsageCallback("chat")])
+
+
+class AgentState(TypedDict):
+    messages: Annotated[List[BaseMessage], operator.add]
+    summary: str
+    summary_tail: str
+
+
+query_enrichment_chain = query_prompt | llm
+response_chain = resp_prompt | llm
+history_manager = HistoryManager(
+    summarizer=summary_prompt | llm,
+    model=settings.MODEL_ID,
+    token_budget=settings.HISTORY_TOKEN_BUDGET,
+    recent_turns=settings.HISTORY_RECENT_TURNS,
+    summary_max_tokens=settings.HISTORY_SUMMARY_MAX_TOKENS,
+    summary_batch_turns=settings.HISTORY_SUMMARY_BATCH_TURNS,
+)
+
+
+def vector_search_qdrant(query, weights: Optional[Dict[str, float]] = None, query_filter: Optional[Dict[str, Any]] = None):
+    limit = settings.ROUTED_SEARCH_LIMIT if query_filter else SEARCH_LIMIT
+    return search_documents(query, limit=limit, weights=weights, fields=CONTEXT_FIELDS, query_filter=query_filter)
+
+
+async def avector_search_qdrant(query, weights: Optional[Dict[str, float]] = None, query_filter: Optional[Dict[str, Any]] = None):
+    limit = settings.ROUTED_SEARCH_LIMIT if query_filter else SEARCH_LIMIT
+    return await asearch_documents(query, limit=limit, weights=weights, fields=CONTEXT_FIELDS, query_filter=query_filter)
+
+
+def question_filter(question: str) -> Optional[Dict[str, Any]]:
+    if not settings.INTENT_ROUTING_ENABLED:
+        return None
+    query_filter = route_filter(question)
+    if query_filter:
+        logger.info(f"Routing search to {query_filter}.")
+    return query_filter
+
+
+def routed_search(search_query: str, question: str, weights: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
+    # A routed search that finds nothing (mislabelled chunks, a wrong guess)
+    # falls back to searching the whole collection.
+    query_filter = question_filter(question)
+    if query_filter:
+        vector_result = vector_search_qdrant(search_query, weights, query_filter)
+        if vector_result.get("results"):
+            return vector_result
+    return vector_search_qdrant(search_query, weights)
+
+
+async def arouted_search(search_query: str, question: str, weights: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
+    query_filter = question_filter(question)
+    if query_filter:
+        vector_result = await avector_search_qdrant(search_query, weights, query_filter)
+        if vector_result.get("results"):
+            return vector_result
+    return await avector_search_qdrant(search_query, weights)
+
+
+def prompt_context(vector_result: Dict[str, Any]) -> str:
+    return build_context(vector_result, get_token_counter(settings.MODEL_ID), settings.CONTEXT_TOKEN_BUDGET)
+
+
+def enriched_query_text(enriched_content: str, fallback: str) -> str:
+    try:
+        parsed = json.loads(strip_json_fence(enriched_content))
+        if isinstance(parsed, dict) and parsed.get("content"):
+            return str(parsed["content"])
+    except (json.JSONDecodeError, TypeError):
+        pass
+    return fallback
+
+
+def is_cacheable_answer(content: str) -> bool:
+    try:
+        parsed = json.loads(strip_json_fence(content))
+    except (json.JSONDecodeError, TypeError):
+        return False
+    return isinstance(parsed, dict) and "action" in parsed and "content" in parsed
+
+
+def _reply(state: AgentState, content: str) -> AgentState:
+    # The messages channel is additive, so only the new message is returned.
+    return {
+        "messages": [AIMessage(content=content, id=str(uuid.uuid4()))]
+    }
+
+
+def needs_enrichment(question: str, chat_history: str) -> bool:
+    # With no history the enrichment prompt returns the question unchanged,
+    # and without anaphora or ellipsis there is nothing for it to resolve.
+    if not chat_history:
+        return False
+    return not settings.ENRICHMENT_SKIP_ENABLED or needs_context(question)
+
+
+def answer_cache_query(question: str, chat_history: str, search_query: str):
+    # Cached answers are only safe when the question stands on its own:
+    # either there is no history, or enrichment did not need it.
+    if not settings.ANSWER_CACHE_ENABLED:
+        return None
+    if not chat_history or normalize_query(search_query) == normalize_query(question):
+        return search_query
+    return None
+
+
+def enrich_and_search(state: AgentState, chat_history: str, weights: Optional[Dict[str, float]] = None) -> AgentState:
+    user_msg = state["messages"][-1]
+
+    search_query = user_msg.content
+    if needs_enrichment(user_msg.content, chat_history):
+        try:
+            with timed("ask.enrichment"):
+                enriched = query_enrichment_chain.invoke({
+                    "question": user_msg.content,
+                    "chat_history": chat_history
+                })
+            search_query = enriched_query_text(enriched.content, user_msg.content)
+        except (LangChainException, Exception) as e:
+            error_message = f"[Error in enrichment step] {str(e)}"
+            logger.exception(error_message)
+            return _reply(state, error_message)
+
+    cache_vector = None
+    language = question_language(user_msg.content)
+    cache_query = answer_cache_query(user_msg.content, chat_history, search_query)
+    if cache_query is not None:
+        try:
+            with timed("ask.answer_cache"):
+                cache_vector = embed_query(cache_query)
+                cached_answer = answer_cache.lookup(cache_vector, language)
+            count_cache_lookups("answers", hits=int(cached_answer is not None), misses=int(cached_answer is None))
+            if cached_answer is not None:
+                return _reply(state, cached_answer)
+        except Exception as e:
+            logger.warning(f"Answer cache lookup failed: {e}")
+            cache_vector = None
+
+    try:
+        with timed("ask.search"):
+            vector_result = routed_search(search_query, user_msg.content, weights)
+    except Exception as e:
+        error_message = f"[Error in vector search] {str(e)}"
+        logger.exception(error_message)
+        return _reply(state, error_message)
+
+    try:
+        with timed("ask.context"):
+            context = prompt_context(vector_result)
+        with timed("ask.generation"):
+            response = response_chain.invoke({
+                "question": user_msg.content,
+                "chat_history": chat_history,
+                "vector_result": context
+            })
+        if cache_vector is not None and is_cacheable_answer(response.content):
+            answer_cache.store(cache_vector, language, response.content)
+        return _reply(state, response.content)
+    except (LangChainException, Exception) as e:
+        error_message = f"[Error in response generation] {str(e)}"
+        logger.exception(error_message)
+        return _reply(state, error_message)
+
+
+async def aprepare_response(question: str, chat_history: str, weights: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
+    """Run everything before answer generation for the async paths.
+
+    Returns ``{"answer": ...}`` when the turn is already settled (an error or
+    an answer-cache hit), otherwise the ``inputs`` for ``response_chain`` plus
+    what is needed to cache the final answer.
+    """
+    search_query = question
+    if needs_enrichment(question, chat_history):
+        try:
+            with timed("ask.enrichment"):
+                enriched = await query_enrichment_chain.ainvoke({
+                    "question": question,
+                    "chat_history": chat_history
+                })
+            search_query = enriched_query_text(enriched.content, question)
+        except (LangChainException, Exception) as e:
+            error_message = f"[Error in enrichment step] {str(e)}"
+            logger.exception(error_message)
+            return {"answer": error_message}
+
+    cache_vector = None
+    language = question_language(question)
+    cache_query = answer_cache_query(question, chat_history, search_query)
+    if cache_query is not None:
+        try:
+            with timed("ask.answer_cache"):
+                cache_vector = await aembed_query(cache_query)
+                cached_answer = answer_cache.lookup(cache_vector, language)
+            count_cache_lookups("answers", hits=int(cached_answer is not None), misses=int(cached_answer is None))
+            if cached_answer is not None:
+                return {"answer": cached_answer}
+        except Exception as e:
+            logger.warning(f"Answer cache lookup failed: {e}")
+            cache_vector = None
+
+    try:
+        with timed("ask.search"):
+            vector_result = await arouted_search(search_query, question, weights)
+    except Exception as e:
+        error_message = f"[Error in vector search] {str(e)}"
+        logger.exception(error_message)
+        return {"answer": error_message}
+
+    with timed("ask.context"):
+        context = prompt_context(vector_result)
+    return {
+        "inputs": {
+            "question": question,
+            "chat_history": chat_history,
+            "vector_result": context
+        },
+        "cache_vector": cache_vector,
+        "language": language,
+    }
+
+
+def remember_answer(prepared: Dict[str, Any], content: str) -> None:
+    if prepared.get("cache_vector") is not None and is_cacheable_answer(content):
+        answer_cache.store(prepared["cache_vector"], prepared["language"], content)
+
+
+async def aenrich_and_search(state: AgentState, chat_history: str, weights: Optional[Dict[str, float]] = None) -> AgentState:
+    user_msg = state["messages"][-1]
+
+    prepared = await aprepare_response(user_msg.content, chat_history, weights)
+    if "answer" in prepared:
+        return _reply(state, prepared["answer"])
+
+    try:
+        with timed("ask.generation"):
+            response = await response_chain.ainvoke(prepared["inputs"])
+        remember_answer(prepared, response.content)
+        return _reply(state, response.content)
+    except (LangChainException, Exception) as e:
+        error_message = f"[Error in response generation] {str(e)}"
+        logger.exception(error_message)
+        return _reply(state, error_message)
+
+
+def mcq_fast_answer(question: str) -> Optional[str]:
+    """Answer a pasted textbook MCQ straight from the MCQ index, if it is known."""
+    if not settings.MCQ_INDEX_ENABLED:
+        return None
+    try:
+        match = mcq_index.match(question)
+    except Exception as e:
+        logger.warning(f"MCQ index lookup failed: {e}")
+        return None
+    count_cache_lookups("mcq_index", hits=int(match is not None), misses=int(match is None))
+    if match is None:
+        return None
+    logger.info(f"MCQ index {match['match']} match (score {match['score']:.2f}).")
+    return json.dumps({"action": "mcq", "content": match["answer"]}, ensure_ascii=False)
+
+
+def qa_step(state: AgentState, config: RunnableConfig) -> AgentState:
+    mcq_answer = mcq_fast_answer(state["messages"][-1].content)
+    if mcq_answer is not None:
+        return _reply(state, mcq_answer)
+    with timed("ask.history"):
+        chat_history, summary_update = history_manager.build(
+            state["messages"][:-1], state.get("summary", ""), state.get("summary_tail")
+        )
+    weights = config["configurable"].get("retrieval_weights")
+    return {**enrich_and_search(state, chat_history, weights), **summary_update}
+
+
+async def aqa_step(state: AgentState, config: RunnableConfig) -> AgentState:
+    mcq_answer = mcq_fast_answer(state["messages"][-1].content)
+    if mcq_answer is not None:
+        return _reply(state, mcq_answer)
+    with timed("ask.history"):
+        chat_history, summary_update = await history_manager.abuild(
+            state["messages"][:-1], state.get("summary", ""), state.get("summary_tail")
+        )
+    weights = config["configurable"].get("retrieval_weights")
+    return {**await aenrich_and_search(state, chat_history, weights), **summary_update}
+
+
+workflow = StateGraph(AgentState)
+workflow.add_node("qa_step", RunnableLambda(qa_step, afunc=aqa_step))
+workflow.set_entry_point("qa_step")
+workflow.add_edge("qa_step", END)
+
+memory = build_checkpointer()
+app = workflow.compile(checkpointer=memory)
+
+
+def process_query(user_query: str, thread_id: str, weights: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
+    try:
+        result = app.invoke(
+            {"messages": [HumanMessage(content=user_query, id=str(uuid.uuid4()))]},
+            config={"configurable": {"thread_id": thread_id, "retrieval_weights": weights}}
+        )
+        raw_response = result["messages"][-1]
+        with timed("ask.parse"):
+            parsed = parse_ai_message(raw_response)
+        return parsed
+    except Exception as e:
+        logger.exception(f"Error during query processing: {str(e)}")
+        return {"error": f"Failed to process query: {str(e)}"}
+
+
+async def aprocess_query(user_query: str, thread_id: str, weights: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
+    try:
+        result = await app.ainvoke(
+            {"messages": [HumanMessage(content=user_query, id=str(uuid.uuid4()))]},
+            config={"configurable": {"thread_id": thread_id, "retrieval_weights": weights}}
+        )
+        raw_response = result["messages"][-1]
+        with timed("ask.parse"):
+            parsed = parse_ai_message(raw_response)
+        return parsed
+    except Exception as e:
+        logger.exception(f"Error during query processing: {str(e)}")
+        return {"error": f"Failed to process query: {str(e)}"}
+
+
+async def astream_answer(user_query: str, thread_id: str, weights: Optional[Dict[str, float]] = None) -> AsyncIterator[Tuple[str, Any]]:
+    """Answer like aprocess_query, yielding events while the answer streams.
+
+    Yields ``("action", str)`` and ``("content", delta)`` as soon as the
+    incremental parser can extract them, then ``("done", parsed_answer)``.
+    The turn is written to conversation memory only after the whole answer
+    has arrived, so an aborted stream leaves the thread untouched.
+    """
+    config = {"configurable": {"thread_id": thread_id}}
+    mcq_answer = mcq_fast_answer(user_query)
+    if mcq_answer is not None:
+        prepared, summary_update = {"answer": mcq_answer}, {}
+    else:
+        snapshot = await app.aget_state(config)
+        values = snapshot.values or {}
+        with timed("ask.history"):
+            chat_history, summary_update = await history_manager.abuild(
+                values.get("messages", []), values.get("summary", ""), values.get("summary_tail")
+            )
+        prepared = await aprepare_response(user_query, chat_history, weights)
+
+    parser = IncrementalAnswerParser()
+    if "answer" in prepared:
+        content = prepared["answer"]
+        for event in parser.feed(content):
+            yield event
+    else:
+        parts = []
+        try:
+            with timed("ask.generation"):
+                async for chunk in response_chain.astream(prepared["inputs"]):
+                    if not chunk.content:
+                        continue
+                    parts.append(chunk.content)
+                    for event in parser.feed(chunk.content):
+                        yield event
+            content = "".join(parts)
+            remember_answer(prepared, content)
+        except (LangChainException, Exception) as e:
+            content = f"[Error in response generation] {str(e)}"
+            logger.exception(content)
+
+    await app.aupdate_state(
+        config,
+        {
+            "messages": [
+                HumanMessage(content=user_query, id=str(uuid.uuid4())),
+                AIMessage(content=content, id=str(uuid.uuid4())),
+            ],
+            **summary_update,
+        },
+        as_node="qa_step",
+    )
+    yield "done", parse_ai_message(AIMessage(content=content))
+
+
+def reset_conversation_memory(thread_id: str) -> Dict[str, str]:
+    try:
+        memory.delete_thread(thread_id)
+        logger.info(f"Memory reset successfully for thread: {thread_id}")
+        return {"message": f"Memory reset for thread: {thread_id}"}
+    except Exception as e:
+        logger.error(f"Error resetting memory for thread {thread_id}: {str(e)}")
+        return {"error": f"Failed to reset memory: {str(e)}"}
+
+
+def reset_conversation_memories(thread_ids: List[str]) -> Dict[str, Any]:
+    try:
+        unique_ids = list(dict.fromkeys(thread_ids))
+        deleted = memory.delete_threads(unique_ids)
+        logger.info(f"Bulk memory reset: {deleted} of {len(unique_ids)} threads had stored history")
+        return {"message": f"Memory reset for {len(unique_ids)} threads", "reset": len(unique_ids), "existing": deleted}
+    except Exception as e:
+        logger.error(f"Error in bulk memory reset: {str(e)}")
+        return {"error": f"Failed to reset memory: {str(e)}"}
+
+
+def list_conversation_threads(limit: int = 100, offset: int = 0) -> List[Dict[str, Any]]:
+    return memory.list_threads(limit=limit, offset=offset)
+
+
+def conversation_thread_stats(thread_id: str) -> Optional[Dict[str, Any]]:
+    return memory.thread_stats(thread_id)
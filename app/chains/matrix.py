@@ -1,8 +1,24 @@
-from app.qdrant.vector_search import search_documents
+from typing import Iterator, List
+
+from app.config import settings
+from app.qdrant.vector_search import iter_search_documents_batch, search_documents
+
+# Cosine similarity only has meaning for dense scores.
+DENSE_ONLY = {"dense": 1.0, "lexical": 0.0}
 
 def get_cosine_similarity(query: str) -> dict:
     if not query or not query.strip():
         return {"error": "Query is empty."}
 
-    result = search_documents(query)
+    result = search_documents(query, weights=DENSE_ONLY)
     return result
+
+def iter_cosine_similarities(queries: List[str]) -> Iterator[dict]:
+    """``get_cosine_similarity`` for each query, in order, searched in batches."""
+    searchable = [query for query in queries if query and query.strip()]
+    results = iter_search_documents_batch(searchable, settings.SEARCH_BATCH_SIZE, weights=DENSE_ONLY)
+    for query in queries:
+        if not query or not query.strip():
+            yield {"query": query, "error": "Query is empty."}
+        else:
+            yield next(results)
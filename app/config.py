@@ -6,8 +6,63 @@ class Settings(BaseSettings):
     QDRANT_API_KEY: str 
     EMBEDDING_MODEL: str
 
+    OCR_WORKERS: int = 0
+    OCR_DPI: int = 300
+    OCR_CACHE_DIR: str = ".cache/ocr"
+    PDF_TEXT_MODE: str = "hybrid"
+    LLM_MAX_IN_FLIGHT: int = 8
+    LLM_TOKENS_PER_MINUTE: int = 200000
+    LLM_MAX_RETRIES: int = 5
+    LLM_CACHE_PATH: str = ".cache/llm_extraction.sqlite"
+    LLM_CACHE_MAX_ENTRIES: int = 5000
+    LLM_CACHE_BYPASS: bool = False
+    EMBED_BATCH_SIZE: int = 64
+    UPSERT_BATCH_SIZE: int = 128
+    PIPELINE_QUEUE_SIZE: int = 4
+    PIPELINE_MAX_RETRIES: int = 3
+    INGEST_MODE: str = "incremental"
+    INGEST_JOB_WORKERS: int = 1
+    UPLOAD_DIR: str = ""
+    EMBEDDING_CACHE_SIZE: int = 10000
+    EMBEDDING_CACHE_PATH: str = ".cache/query_embeddings.sqlite"
+    ANSWER_CACHE_ENABLED: bool = True
+    ANSWER_CACHE_THRESHOLD: float = 0.95
+    ANSWER_CACHE_TTL_SECONDS: int = 86400
+    ANSWER_CACHE_MAX_ENTRIES: int = 2000
+    ANSWER_CACHE_GENERATION_PATH: str = ".cache/collection_generation"
+    CHECKPOINT_BACKEND: str = "sqlite"
+    CHECKPOINT_DB_PATH: str = ".cache/conversations.sqlite"
+    CONVERSATION_TTL_SECONDS: int = 604800
+    CONVERSATION_MAX_MESSAGES: int = 40
+    CONVERSATION_MAX_TOTAL_MB: int = 512
+    HISTORY_TOKEN_BUDGET: int = 1500
+    HISTORY_RECENT_TURNS: int = 3
+    HISTORY_SUMMARY_MAX_TOKENS: int = 300
+    HISTORY_SUMMARY_BATCH_TURNS: int = 2
+    CONTEXT_TOKEN_BUDGET: int = 1200
+    ENRICHMENT_SKIP_ENABLED: bool = True
+    MCQ_INDEX_ENABLED: bool = True
+    MCQ_INDEX_PATH: str = ".cache/mcq_index.json"
+    MCQ_FUZZY_THRESHOLD: float = 0.85
+    HYBRID_SEARCH_ENABLED: bool = True
+    HYBRID_DENSE_WEIGHT: float = 1.0
+    HYBRID_LEXICAL_WEIGHT: float = 1.0
+    HYBRID_CANDIDATES: int = 20
+    RRF_K: int = 60
+    BM25_INDEX_DIR: str = ".cache/bm25"
+    BM25_K1: float = 1.5
+    BM25_B: float = 0.75
+    INDEX_SYNC_PATH: str = ".cache/index_sync.json"
+    VECTOR_STORE_BACKEND: str = "qdrant"
+    COLLECTION_PROFILE: str = "default"
+    INTENT_ROUTING_ENABLED: bool = True
+    ROUTED_SEARCH_LIMIT: int = 3
+    SEARCH_BATCH_SIZE: int = 256
+    DEBUG_TIMING: bool = False
+    LOCAL_VECTOR_DIR: str = ".cache/vectors"
+    LOCAL_VECTOR_DTYPE: str = "float32"
+
     class Config:
         env_file = ".env"
 
 settings = Settings()
-
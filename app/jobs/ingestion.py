@@ -0,0 +1,182 @@
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from app.config import settings
+from app.qdrant.insert_vector import insert_chunks_to_qdrant
+from app.qdrant.ocr_engine import PdfSource, pdf_fingerprint
+from app.qdrant.pdf_clean import process_pdf_semantically
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+FINISHED_STATUSES = {"completed", "failed", "cancelled"}
+
+
+class JobCancelled(BaseException):
+    """Raised from progress callbacks to stop a job.
+
+    A BaseException, like asyncio.CancelledError, so the ``except Exception``
+    handlers in text extraction and ingestion let it through to ``_run``.
+    """
+
+
+def _remove_file(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logger.warning(f"Could not remove temporary upload {path}: {e}")
+
+
+class IngestionJob:
+    def __init__(self, filename: Optional[str]):
+        self.job_id = uuid.uuid4().hex
+        self.filename = filename
+        self.status = "queued"
+        self.stage = "queued"
+        self.pages_done = 0
+        self.pages_total = 0
+        self.prompts_done = 0
+        self.prompts_total = 0
+        self.chunks_total = 0
+        self.chunks_embedded = 0
+        self.errors: List[str] = []
+        self.message: Optional[str] = None
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+        self.cancel_event = threading.Event()
+        self.future: Optional[Future] = None
+        self.lock = threading.Lock()
+
+    def update(self, **fields: Any) -> None:
+        with self.lock:
+            for name, value in fields.items():
+                setattr(self, name, value)
+            self.updated_at = time.time()
+
+    def check_cancelled(self) -> None:
+        if self.cancel_event.is_set():
+            raise JobCancelled(f"Job {self.job_id} was cancelled")
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "job_id": self.job_id,
+                "filename": self.filename,
+                "status": self.status,
+                "stage": self.stage,
+                "pages_done": self.pages_done,
+                "pages_total": self.pages_total,
+                "prompts_done": self.prompts_done,
+                "prompts_total": self.prompts_total,
+                "chunks_total": self.chunks_total,
+                "chunks_embedded": self.chunks_embedded,
+                "errors": list(self.errors),
+                "message": self.message,
+                "created_at": self.created_at,
+                "updated_at": self.updated_at,
+            }
+
+
+class IngestionJobManager:
+    """Runs PDF ingestion off the request path and tracks its progress.
+
+    Jobs live in this process only, so status must be polled on the worker
+    that accepted the upload.
+    """
+
+    def __init__(self, max_workers: int = 1, max_finished_jobs: int = 100):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingestion")
+        self.max_finished_jobs = max_finished_jobs
+        self.jobs: Dict[str, IngestionJob] = {}
+        self.lock = threading.Lock()
+
+    def submit(self, pdf_source: PdfSource, filename: Optional[str], delete_after: bool = False) -> IngestionJob:
+        """Queue ``pdf_source`` for ingestion; a path is removed afterwards if ``delete_after``."""
+        job = IngestionJob(filename)
+        with self.lock:
+            self.jobs[job.job_id] = job
+            self._prune()
+        job.future = self.executor.submit(self._run, job, pdf_source, delete_after)
+        if delete_after and isinstance(pdf_source, str):
+            job.future.add_done_callback(lambda f: f.cancelled() and _remove_file(pdf_source))
+        logger.info(f"Queued ingestion job {job.job_id} for '{filename}'")
+        return job
+
+    def get(self, job_id: str) -> Optional[IngestionJob]:
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def list_jobs(self) -> List[IngestionJob]:
+        with self.lock:
+            return list(self.jobs.values())
+
+    def cancel(self, job_id: str) -> Optional[IngestionJob]:
+        job = self.get(job_id)
+        if job is None:
+            return None
+        if job.status in FINISHED_STATUSES:
+            return job
+        job.cancel_event.set()
+        if job.future is not None and job.future.cancel():
+            job.update(status="cancelled", stage="cancelled")
+        logger.info(f"Cancellation requested for ingestion job {job_id}")
+        return job
+
+    def _prune(self) -> None:
+        finished = [j for j in self.jobs.values() if j.status in FINISHED_STATUSES]
+        excess = len(finished) - self.max_finished_jobs
+        if excess > 0:
+            for job in sorted(finished, key=lambda j: j.updated_at)[:excess]:
+                self.jobs.pop(job.job_id, None)
+
+    def _run(self, job: IngestionJob, pdf_source: PdfSource, delete_after: bool) -> None:
+        def on_pdf_progress(stage: str, done: int, total: int) -> None:
+            job.check_cancelled()
+            if stage == "pages":
+                job.update(stage="extracting_text", pages_done=done, pages_total=total)
+            else:
+                job.update(stage="llm_extraction", prompts_done=done, prompts_total=total)
+
+        def on_insert_progress(done: int, total: int) -> None:
+            job.check_cancelled()
+            job.update(chunks_embedded=done)
+
+        try:
+            job.update(status="running", stage="extracting_text")
+            source = pdf_fingerprint(pdf_source)
+            chunks = process_pdf_semantically(pdf_source, progress=on_pdf_progress)
+            job.check_cancelled()
+
+            job.update(stage="embedding", chunks_total=len(chunks))
+            insert_chunks_to_qdrant(chunks, progress=on_insert_progress, source=source, filename=job.filename)
+            job.check_cancelled()
+
+            job.update(
+                status="completed",
+                stage="completed",
+                message=f"Inserted {len(chunks)} chunks from PDF into Qdrant.",
+            )
+            logger.info(f"Ingestion job {job.job_id} completed with {len(chunks)} chunks")
+        except JobCancelled:
+            job.update(status="cancelled", stage="cancelled")
+            logger.info(f"Ingestion job {job.job_id} cancelled")
+        except Exception as e:
+            if job.cancel_event.is_set():
+                job.update(status="cancelled", stage="cancelled")
+                logger.info(f"Ingestion job {job.job_id} cancelled")
+                return
+            logger.error(f"Ingestion job {job.job_id} failed: {e}", exc_info=True)
+            job.update(status="failed", stage="failed", errors=job.errors + [str(e)])
+        finally:
+            if delete_after and isinstance(pdf_source, str):
+                _remove_file(pdf_source)
+
+
+job_manager = IngestionJobManager(max_workers=settings.INGEST_JOB_WORKERS)
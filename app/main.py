@@ -1,35 +1,60 @@
-from fastapi import FastAPI
-from sqlalchemy import text
-from fastapi.middleware.cors import CORSMiddleware
-from app.api.routes.chat import router as chat_router
-from app.api.routes.embeddings import router as embedding_router
-from app.api.routes.matrix_evaluation import router as matrix_router
-
-app = FastAPI()
-
-origins = ["*"]
-
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=origins,
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-app.include_router(chat_router, prefix="/agent", tags=["chat"])
-app.include_router(embedding_router, prefix="/embeddings", tags=["embedding"])
-app.include_router(matrix_router, prefix="/matrix-evaluation", tags=["similarity"])
-
-@app.get("/")
-def read_root():
-    return {"message": "Welcome to HSC BOOK AI"}
-
-@app.get("/_status")
-def read_status():
-    return {"status": "ok"}
-
-
-
-
-
+import time
+from fastapi import FastAPI, Request
+from fastapi.responses import Response
+from sqlalchemy import text
+from fastapi.middleware.cors import CORSMiddleware
+from app.config import settings
+from app.utils import metrics
+from app.api.routes.chat import router as chat_router
+from app.api.routes.embeddings import router as embedding_router
+from app.api.routes.matrix_evaluation import router as matrix_router
+
+app = FastAPI()
+
+origins = ["*"]
+
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=origins,
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+@app.middleware("http")
+async def debug_timing(request: Request, call_next):
+    """With DEBUG_TIMING on, report the request's per-stage timings in a Server-Timing header.
+
+    The header goes out before a streaming body runs, so it only covers the
+    stages done by then; /agent/ask/stream sends its full breakdown as a
+    final ``timing`` event instead.
+    """
+    if not settings.DEBUG_TIMING:
+        return await call_next(request)
+    with metrics.request_timings() as timings:
+        start = time.perf_counter()
+        response = await call_next(request)
+        timings["total"] = time.perf_counter() - start
+    response.headers["Server-Timing"] = metrics.server_timing_header(timings)
+    return response
+
+app.include_router(chat_router, prefix="/agent", tags=["chat"])
+app.include_router(embedding_router, prefix="/embeddings", tags=["embedding"])
+app.include_router(matrix_router, prefix="/matrix-evaluation", tags=["similarity"])
+
+@app.get("/")
+def read_root():
+    return {"message": "Welcome to HSC BOOK AI"}
+
+@app.get("/_status")
+def read_status():
+    return {"status": "ok"}
+
+@app.get("/metrics")
+def read_metrics():
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
+
+
+
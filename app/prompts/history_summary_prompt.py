@@ -0,0 +1,17 @@
+from langchain.prompts import PromptTemplate
+
+summary_prompt = PromptTemplate( input_variable=["summary", "new_lines"], template="""
+    You keep a running summary of a tutoring conversation about an HSC Bangla textbook.
+
+    Current Summary:
+    "{summary}"
+
+    New Conversation Lines:
+    "{new_lines}"
+
+    Update the summary with the new lines. Keep the names, characters, chapters, questions and facts the
+    student asked about, so later questions with pronouns can still be resolved. Write in the language of the
+    conversation, in at most {max_words} words, and respond ONLY with the summary text.
+
+    """
+)
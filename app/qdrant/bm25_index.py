@@ -0,0 +1,258 @@
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from app.config import settings
+from app.qdrant.vector_store import matches_filter
+from app.utils.bangla import tokenize
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MANIFEST = "manifest.json"
+# Payload fields kept per chunk so lexical search honours the same filters.
+FILTER_FIELDS = ("content_type", "section", "page")
+
+
+def search_text(payload: Dict[str, Any]) -> str:
+    """Everything a student might quote from a chunk, for lexical matching."""
+    parts = [
+        payload.get("question_text"),
+        payload.get("stem_text"),
+        payload.get("full_text"),
+        payload.get("text"),
+        payload.get("section"),
+        payload.get("correct_answer_text"),
+    ]
+    for key in ("options", "sub_questions"):
+        if isinstance(payload.get(key), dict):
+            parts.extend(payload[key].values())
+    return " ".join(str(part) for part in parts if part)
+
+
+class BM25Index:
+    """Okapi BM25 over chunk texts, stored as memory-mapped CSR arrays.
+
+    Tokenized chunks live in a SQLite table under ``directory`` so ingestion
+    can update single sources; each update rebuilds the postings into a new
+    generation directory and swaps ``manifest.json`` to point at it. Readers
+    memory-map the arrays and pick up a new generation when the manifest
+    changes, so every worker shares one copy in the page cache.
+    """
+
+    def __init__(self, directory: str, k1: float = 1.5, b: float = 0.75):
+        self.directory = directory
+        self.k1 = k1
+        self.b = b
+        self.lock = threading.Lock()
+        self.generation: Optional[str] = None
+        self.rows_version: Optional[int] = None
+        self.vocab: Dict[str, int] = {}
+        self.point_ids: List[str] = []
+        self.offsets = self.postings_docs = self.postings_tf = self.doc_len = None
+        self.idf = None
+        self.doc_fields: List[Dict[str, Any]] = []
+        self.filter_masks: Dict[str, np.ndarray] = {}
+        self.avg_doc_len = 0.0
+        os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(os.path.join(directory, "documents.sqlite"), check_same_thread=False, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS documents (point_id TEXT PRIMARY KEY, source TEXT, tokens TEXT NOT NULL, fields TEXT)"
+        )
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(documents)")}
+        if "fields" not in columns:
+            # Chunks indexed before filtering was added only match unfiltered searches until re-ingested.
+            self.conn.execute("ALTER TABLE documents ADD COLUMN fields TEXT")
+        # Bumped with every row edit; each generation records the version it was built from.
+        self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        self.conn.commit()
+        self._reload_if_changed()
+
+    def _manifest_path(self) -> str:
+        return os.path.join(self.directory, MANIFEST)
+
+    def _rows_version(self) -> int:
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'rows_version'").fetchone()
+        return row[0] if row else 0
+
+    def _reload_if_changed(self) -> None:
+        # Each build names a new generation; compare that rather than the
+        # manifest's mtime, which can miss two swaps within one timestamp tick.
+        try:
+            with open(self._manifest_path(), encoding="utf-8") as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not read BM25 manifest: {e}")
+            return
+        if manifest.get("generation") == self.generation:
+            return
+        with self.lock:
+            try:
+                path = os.path.join(self.directory, manifest["generation"])
+                with open(os.path.join(path, "vocab.json"), encoding="utf-8") as f:
+                    self.vocab = json.load(f)
+                with open(os.path.join(path, "point_ids.json"), encoding="utf-8") as f:
+                    self.point_ids = json.load(f)
+                fields_path = os.path.join(path, "fields.json")
+                if os.path.exists(fields_path):
+                    with open(fields_path, encoding="utf-8") as f:
+                        self.doc_fields = json.load(f)
+                else:
+                    self.doc_fields = [{} for _ in self.point_ids]
+                self.filter_masks = {}
+                self.offsets = np.load(os.path.join(path, "offsets.npy"), mmap_mode="r")
+                self.postings_docs = np.load(os.path.join(path, "postings_docs.npy"), mmap_mode="r")
+                self.postings_tf = np.load(os.path.join(path, "postings_tf.npy"), mmap_mode="r")
+                self.doc_len = np.load(os.path.join(path, "doc_len.npy"), mmap_mode="r")
+                self.idf = np.load(os.path.join(path, "idf.npy"), mmap_mode="r")
+                self.avg_doc_len = float(manifest["avg_doc_len"])
+                self.generation = manifest["generation"]
+                self.rows_version = manifest.get("rows_version")
+                logger.info(f"Loaded BM25 index generation {self.generation} ({len(self.point_ids)} chunks).")
+            except (OSError, KeyError, ValueError) as e:
+                logger.warning(f"Could not load BM25 index: {e}")
+
+    def update(self, points: Dict[str, Dict[str, Any]], removed: Iterable[str] = ()) -> None:
+        """Add or replace ``points`` (id -> payload), drop ``removed`` ids and rebuild unless the
+        current generation was already built from exactly these rows."""
+        rows = [
+            (
+                point_id,
+                payload.get("source"),
+                " ".join(tokenize(search_text(payload))),
+                json.dumps({key: payload.get(key) for key in FILTER_FIELDS}, ensure_ascii=False),
+            )
+            for point_id, payload in points.items()
+        ]
+        with self.lock:
+            before = self.conn.total_changes
+            self.conn.executemany("DELETE FROM documents WHERE point_id = ?", [(pid,) for pid in removed])
+            # Identical rows are left alone, so total_changes only counts real edits.
+            self.conn.executemany(
+                "INSERT INTO documents (point_id, source, tokens, fields) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(point_id) DO UPDATE SET source = excluded.source, tokens = excluded.tokens, fields = excluded.fields "
+                "WHERE documents.source IS NOT excluded.source OR documents.tokens IS NOT excluded.tokens "
+                "OR documents.fields IS NOT excluded.fields",
+                rows,
+            )
+            if self.conn.total_changes != before:
+                self.conn.execute(
+                    "INSERT INTO meta (key, value) VALUES ('rows_version', 1) "
+                    "ON CONFLICT(key) DO UPDATE SET value = value + 1"
+                )
+            self.conn.commit()
+            rows_version = self._rows_version()
+        # A rebuild that failed after the rows were committed leaves the version
+        # ahead of the generation, so the next update retries it.
+        self._reload_if_changed()
+        if self.generation is not None and self.rows_version == rows_version:
+            return
+        self.rebuild()
+
+    def rebuild(self) -> None:
+        with self.lock:
+            documents = self.conn.execute("SELECT point_id, tokens, fields FROM documents ORDER BY point_id").fetchall()
+            rows_version = self._rows_version()
+
+        vocab: Dict[str, int] = {}
+        term_docs: List[List[Tuple[int, int]]] = []
+        doc_len = np.zeros(len(documents), dtype=np.float32)
+        for doc_index, (_, tokens, _) in enumerate(documents):
+            counts = Counter(tokens.split())
+            doc_len[doc_index] = sum(counts.values())
+            for term, tf in counts.items():
+                term_id = vocab.setdefault(term, len(vocab))
+                if term_id == len(term_docs):
+                    term_docs.append([])
+                term_docs[term_id].append((doc_index, tf))
+
+        offsets = np.zeros(len(vocab) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(postings) for postings in term_docs])
+        postings_docs = np.fromiter((d for postings in term_docs for d, _ in postings), dtype=np.int32, count=int(offsets[-1]))
+        postings_tf = np.fromiter((tf for postings in term_docs for _, tf in postings), dtype=np.float32, count=int(offsets[-1]))
+        df = np.diff(offsets).astype(np.float64)
+        n_docs = len(documents)
+        idf = np.log(1 + (n_docs - df + 0.5) / (df + 0.5)).astype(np.float32)
+
+        generation = f"gen-{time.time_ns()}-{uuid.uuid4().hex[:8]}"
+        path = os.path.join(self.directory, generation)
+        os.makedirs(path)
+        with open(os.path.join(path, "vocab.json"), "w", encoding="utf-8") as f:
+            json.dump(vocab, f, ensure_ascii=False)
+        with open(os.path.join(path, "point_ids.json"), "w", encoding="utf-8") as f:
+            json.dump([point_id for point_id, _, _ in documents], f)
+        with open(os.path.join(path, "fields.json"), "w", encoding="utf-8") as f:
+            json.dump([json.loads(fields) if fields else {} for _, _, fields in documents], f, ensure_ascii=False)
+        np.save(os.path.join(path, "offsets.npy"), offsets)
+        np.save(os.path.join(path, "postings_docs.npy"), postings_docs)
+        np.save(os.path.join(path, "postings_tf.npy"), postings_tf)
+        np.save(os.path.join(path, "doc_len.npy"), doc_len)
+        np.save(os.path.join(path, "idf.npy"), idf)
+
+        manifest_tmp = self._manifest_path() + ".tmp"
+        with open(manifest_tmp, "w", encoding="utf-8") as f:
+            json.dump({
+                "generation": generation,
+                "rows_version": rows_version,
+                "avg_doc_len": float(doc_len.mean()) if n_docs else 0.0,
+            }, f)
+        os.replace(manifest_tmp, self._manifest_path())
+        logger.info(f"Built BM25 index generation {generation}: {n_docs} chunks, {len(vocab)} terms.")
+        self._reload_if_changed()
+        self._remove_old_generations(keep=generation)
+
+    def _remove_old_generations(self, keep: str) -> None:
+        # Workers that still map an old generation keep their open files on POSIX.
+        for name in os.listdir(self.directory):
+            if name.startswith("gen-") and name != keep:
+                shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
+
+    def _filter_mask(self, query_filter: Dict[str, Any]) -> np.ndarray:
+        key = json.dumps(query_filter, sort_keys=True, ensure_ascii=False, default=list)
+        mask = self.filter_masks.get(key)
+        if mask is None:
+            mask = np.fromiter((matches_filter(fields, query_filter) for fields in self.doc_fields), dtype=bool, count=len(self.doc_fields))
+            self.filter_masks[key] = mask
+        return mask
+
+    def search(self, query: str, limit: int = 20, query_filter: Optional[Dict[str, Any]] = None) -> List[Tuple[str, float]]:
+        """Top ``limit`` (point_id, bm25_score) pairs for ``query`` among chunks matching ``query_filter``."""
+        self._reload_if_changed()
+        with self.lock:
+            if not self.point_ids:
+                return []
+            term_ids = {self.vocab[t] for t in tokenize(query) if t in self.vocab}
+            if not term_ids:
+                return []
+            scores = np.zeros(len(self.point_ids), dtype=np.float32)
+            norm = self.k1 * (1 - self.b + self.b * np.asarray(self.doc_len) / max(self.avg_doc_len, 1e-9))
+            for term_id in term_ids:
+                start, end = int(self.offsets[term_id]), int(self.offsets[term_id + 1])
+                docs = np.asarray(self.postings_docs[start:end])
+                tf = np.asarray(self.postings_tf[start:end])
+                scores[docs] += self.idf[term_id] * tf * (self.k1 + 1) / (tf + norm[docs])
+            if query_filter:
+                scores[~self._filter_mask(query_filter)] = 0
+            candidates = np.flatnonzero(scores)
+            if len(candidates) > limit:
+                candidates = candidates[np.argpartition(-scores[candidates], limit - 1)[:limit]]
+            candidates = candidates[np.argsort(-scores[candidates])]
+            return [(self.point_ids[i], float(scores[i])) for i in candidates]
+
+    def __len__(self) -> int:
+        return len(self.point_ids)
+
+
+bm25_index = BM25Index(settings.BM25_INDEX_DIR, k1=settings.BM25_K1, b=settings.BM25_B)
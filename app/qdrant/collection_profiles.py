@@ -0,0 +1,131 @@
+"""Collection layouts: vector size, quantization and HNSW parameters.
+
+``COLLECTION_PROFILE`` selects the profile the app reads and writes. Each
+profile lives in its own collection, so a new layout is built next to the
+old one and switched to by changing the setting:
+
+    python -m app.qdrant.collection_profiles --migrate scalar --from default
+"""
+import argparse
+import logging
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.config import settings
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+BASE_COLLECTION_NAME = "hsc_book"
+
+# text-embedding-3 vectors keep most of their quality when truncated and
+# re-normalized, so reduced profiles reuse the stored 1536-d embeddings.
+COLLECTION_PROFILES: Dict[str, Dict[str, Any]] = {
+    # The original layout: full float32 vectors, Qdrant's default HNSW.
+    "default": {"dimensions": 1536, "quantization": None},
+    # int8 vectors in RAM (4x smaller), originals on disk for rescoring.
+    "scalar": {
+        "dimensions": 1536, "quantization": "scalar", "hnsw_m": 16, "hnsw_ef_construct": 128,
+        "hnsw_ef": 64, "oversampling": 2.0,
+    },
+    "scalar-768": {
+        "dimensions": 768, "quantization": "scalar", "hnsw_m": 16, "hnsw_ef_construct": 128,
+        "hnsw_ef": 64, "oversampling": 2.0,
+    },
+    # 1 bit per dimension (32x smaller); needs more oversampling to recover recall.
+    "binary": {
+        "dimensions": 1536, "quantization": "binary", "hnsw_m": 16, "hnsw_ef_construct": 128,
+        "hnsw_ef": 128, "oversampling": 3.0,
+    },
+}
+
+BYTES_PER_DIMENSION = {None: 4.0, "scalar": 1.0, "binary": 1 / 8}
+
+
+def get_profile(name: str) -> Dict[str, Any]:
+    if name not in COLLECTION_PROFILES:
+        raise ValueError(f"Unknown COLLECTION_PROFILE: {name} (choose from {', '.join(COLLECTION_PROFILES)})")
+    return COLLECTION_PROFILES[name]
+
+
+def collection_name(profile_name: str) -> str:
+    if profile_name == "default":
+        return BASE_COLLECTION_NAME
+    return f"{BASE_COLLECTION_NAME}_{profile_name.replace('-', '_')}"
+
+
+def reduce_dimensions(vector: List[float], dimensions: Optional[int]) -> List[float]:
+    """Truncate ``vector`` to ``dimensions`` and re-normalize it."""
+    if not dimensions or len(vector) <= dimensions:
+        return vector
+    reduced = np.asarray(vector[:dimensions], dtype=np.float32)
+    norm = np.linalg.norm(reduced)
+    return (reduced / norm if norm else reduced).tolist()
+
+
+def create_collection_kwargs(profile: Dict[str, Any]) -> Dict[str, Any]:
+    """``create_collection`` arguments for ``profile``."""
+    from qdrant_client.models import (
+        BinaryQuantization, BinaryQuantizationConfig, Distance, HnswConfigDiff,
+        ScalarQuantization, ScalarQuantizationConfig, ScalarType, VectorParams,
+    )
+
+    quantization = profile.get("quantization")
+    kwargs: Dict[str, Any] = {
+        "vectors_config": VectorParams(
+            size=profile["dimensions"], distance=Distance.COSINE, on_disk=True if quantization else None
+        ),
+    }
+    if "hnsw_m" in profile:
+        kwargs["hnsw_config"] = HnswConfigDiff(m=profile["hnsw_m"], ef_construct=profile["hnsw_ef_construct"])
+    if quantization == "scalar":
+        kwargs["quantization_config"] = ScalarQuantization(
+            scalar=ScalarQuantizationConfig(type=ScalarType.INT8, quantile=0.99, always_ram=True)
+        )
+    elif quantization == "binary":
+        kwargs["quantization_config"] = BinaryQuantization(binary=BinaryQuantizationConfig(always_ram=True))
+    elif quantization is not None:
+        raise ValueError(f"Unknown quantization: {quantization}")
+    return kwargs
+
+
+def search_params(profile: Dict[str, Any]):
+    """Per-query HNSW and rescoring parameters, or None for server defaults."""
+    from qdrant_client.models import QuantizationSearchParams, SearchParams
+
+    if "hnsw_ef" not in profile and not profile.get("quantization"):
+        return None
+    quantization = None
+    if profile.get("quantization"):
+        quantization = QuantizationSearchParams(rescore=True, oversampling=profile.get("oversampling"))
+    return SearchParams(hnsw_ef=profile.get("hnsw_ef"), quantization=quantization)
+
+
+def estimated_memory_mb(profile: Dict[str, Any], points: int) -> Dict[str, float]:
+    """Rough vector memory: what stays in RAM and what is kept on disk for rescoring."""
+    full = points * profile["dimensions"] * 4 / 2 ** 20
+    if not profile.get("quantization"):
+        return {"vector_ram_mb": round(full, 2), "vector_disk_mb": 0.0}
+    quantized = points * profile["dimensions"] * BYTES_PER_DIMENSION[profile["quantization"]] / 2 ** 20
+    return {"vector_ram_mb": round(quantized, 2), "vector_disk_mb": round(full, 2)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--migrate", metavar="PROFILE", choices=list(COLLECTION_PROFILES), help="build this profile's collection")
+    parser.add_argument("--from", dest="source", default=settings.COLLECTION_PROFILE, choices=list(COLLECTION_PROFILES))
+    args = parser.parse_args()
+    if args.migrate:
+        if get_profile(args.migrate)["dimensions"] > get_profile(args.source)["dimensions"]:
+            parser.error(f"'{args.source}' vectors are too short for '{args.migrate}'; re-ingest instead.")
+        from app.qdrant.qdrant_connect import async_client, client
+        from app.qdrant.vector_store import QdrantVectorStore, snapshot
+
+        source = QdrantVectorStore(client, async_client, collection_name(args.source), get_profile(args.source))
+        target = QdrantVectorStore(client, async_client, collection_name(args.migrate), get_profile(args.migrate))
+        copied = snapshot(source, target)
+        print(f"Copied {copied} points into '{target.collection_name}'. Set COLLECTION_PROFILE={args.migrate} to use it.")
+    else:
+        for name, profile in COLLECTION_PROFILES.items():
+            print(f"{name}: {collection_name(name)} {profile}")
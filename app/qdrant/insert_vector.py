@@ -1,74 +1,358 @@
 from langchain_community.vectorstores import Qdrant
-from app.qdrant.model import embedding_model
-from qdrant_client.models import PointStruct, Distance, VectorParams
+from app.qdrant.model import embedding_model, EMBEDDING_DIMENSIONS
 import uuid
-from app.qdrant.qdrant_connect import client
+import hashlib
+import json
+import os
+import re
+import unicodedata
+import queue
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from app.config import settings
+from app.qdrant.vector_store import COLLECTION_NAME, Point, vector_store
+from app.cache.answer_cache import answer_cache
+from app.qdrant.mcq_index import mcq_index
+from app.qdrant.bm25_index import bm25_index
+from app.utils.metrics import timed
 import logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
-COLLECTION_NAME = "hsc_book"
+POINT_ID_NAMESPACE = uuid.UUID("6f1c2a3e-8b4d-5e7f-9a0b-1c2d3e4f5a6b")
+
+_DONE = object()
+_index_sync_lock = threading.Lock()
 
 def create_collection_if_not_exists():
     try:
-        client.get_collection(COLLECTION_NAME)
+        vector_store.ensure_collection(EMBEDDING_DIMENSIONS)
     except Exception as e:
-        logger.info(f"Collection {COLLECTION_NAME} does not exist. Creating new collection.")
+        logger.error(f"Error creating collection: {e}", exc_info=True)
+        raise
+
+def text_for_embedding(chunk: Dict[str, Any]) -> str:
+    if chunk['content_type'] == 'mcq':
+        return chunk.get('question_text', '')
+    elif chunk['content_type'] == 'creative_question':
+        return chunk.get('full_text', '')
+    else:
+        return chunk.get('text', '')
+
+def with_retries(fn: Callable[[], Any], what: str, retries: int, base_delay: float = 1.0) -> Any:
+    for attempt in range(retries + 1):
         try:
-            client.recreate_collection(
-                collection_name=COLLECTION_NAME,
-                vectors_config=VectorParams(size=1536, distance=Distance.COSINE)
-            )
-            logger.info(f"Collection {COLLECTION_NAME} created.")
-        except Exception as ce:
-            logger.error(f"Error creating collection: {ce}", exc_info=True)
-            raise
+            return fn()
+        except Exception as e:
+            if attempt >= retries:
+                raise
+            delay = base_delay * 2 ** attempt
+            logger.warning(f"{what} failed ({e}); retry {attempt + 1}/{retries} in {delay:.1f}s")
+            time.sleep(delay)
+
+def _batched(items: List[Any], size: int) -> Iterator[List[Any]]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+def _put(q: queue.Queue, item: Any, stop: threading.Event) -> bool:
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+def _get(q: queue.Queue, stop: threading.Event) -> Any:
+    while not stop.is_set():
+        try:
+            return q.get(timeout=0.1)
+        except queue.Empty:
+            continue
+    return _DONE
+
+def normalize_text(text: str) -> str:
+    text = unicodedata.normalize("NFKC", text or "")
+    return re.sub(r"\s+", " ", text).strip()
+
+def chunk_point_id(chunk: Dict[str, Any], source: Optional[str] = None) -> str:
+    # Scoped by source (the PDF's content id): the same chunk in two PDFs is
+    # two points, so one upload never takes over or deletes a point another
+    # book still has, while the same PDF under any file name maps to the same points.
+    identity = [
+        chunk.get('content_type'),
+        chunk.get('page'),
+        chunk.get('question_number'),
+        normalize_text(text_for_embedding(chunk)),
+    ]
+    if source:
+        identity.append(source)
+    identity = json.dumps(identity, ensure_ascii=False)
+    return str(uuid.uuid5(POINT_ID_NAMESPACE, hashlib.sha256(identity.encode("utf-8")).hexdigest()))
+
+def chunk_content_hash(chunk: Dict[str, Any]) -> str:
+    canonical = json.dumps(chunk, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+def prepare_points(
+    chunks: List[Dict[str, Any]],
+    source: Optional[str] = None,
+    filename: Optional[str] = None,
+) -> Dict[str, Dict[str, Any]]:
+    """Map content-derived point ids to payloads, last chunk winning on collisions."""
+    points: Dict[str, Dict[str, Any]] = {}
+    for chunk in chunks:
+        payload = chunk.copy()
+        payload['content_hash'] = chunk_content_hash(chunk)
+        if source:
+            payload['source'] = source
+        if filename:
+            payload['filename'] = filename
+        points[chunk_point_id(chunk, source)] = payload
+    return points
+
+def payload_version(payload: Dict[str, Any]) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+    return payload.get('content_hash'), payload.get('source'), payload.get('filename')
+
+def fetch_existing_versions(point_ids: List[str]) -> Dict[str, Tuple[Optional[str], Optional[str], Optional[str]]]:
+    """Return (content_hash, source, filename) for each of ``point_ids`` already stored."""
+    existing: Dict[str, Tuple[Optional[str], Optional[str], Optional[str]]] = {}
+    for batch in _batched(point_ids, settings.UPSERT_BATCH_SIZE):
+        for point_id, payload in vector_store.retrieve(batch, fields=['content_hash', 'source', 'filename']).items():
+            existing[point_id] = payload_version(payload)
+    return existing
+
+def fetch_source_point_ids(source: str) -> List[str]:
+    return vector_store.ids_where('source', source)
+
+def points_digest(points: Dict[str, Dict[str, Any]]) -> str:
+    h = hashlib.sha256()
+    for point_id in sorted(points):
+        h.update(json.dumps([point_id, *payload_version(points[point_id])], ensure_ascii=False).encode("utf-8"))
+    return h.hexdigest()
+
+def read_index_sync() -> Dict[str, str]:
+    """Source -> digest of the point set the local MCQ and BM25 indexes last took in full."""
+    if not settings.INDEX_SYNC_PATH:
+        return {}
+    try:
+        with open(settings.INDEX_SYNC_PATH, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        logger.warning(f"Could not read index sync markers: {e}")
+        return {}
+
+def record_index_sync(source: str, digest: str) -> None:
+    if not settings.INDEX_SYNC_PATH:
+        return
+    with _index_sync_lock:
+        markers = read_index_sync()
+        markers[source] = digest
+        directory = os.path.dirname(settings.INDEX_SYNC_PATH) or "."
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(markers, f)
+            os.replace(tmp_path, settings.INDEX_SYNC_PATH)
+        except OSError as e:
+            logger.warning(f"Could not record index sync marker for '{source}': {e}")
+
+def _run_pipeline(points: List[Tuple[str, Dict[str, Any]]], progress: Optional[Callable[[int, int], None]] = None) -> int:
+    total = len(points)
+    stop = threading.Event()
+    errors: List[BaseException] = []
+    text_queue: queue.Queue = queue.Queue(maxsize=settings.PIPELINE_QUEUE_SIZE)
+    point_queue: queue.Queue = queue.Queue(maxsize=settings.PIPELINE_QUEUE_SIZE)
+
+    def chunk_stage():
+        try:
+            for batch in _batched(points, settings.EMBED_BATCH_SIZE):
+                texts = [text_for_embedding(payload) for _, payload in batch]
+                if not _put(text_queue, (batch, texts), stop):
+                    return
+        except BaseException as e:
+            errors.append(e)
+            stop.set()
+        finally:
+            _put(text_queue, _DONE, stop)
+
+    def embed_stage():
+        pending: List[Point] = []
+        try:
+            while True:
+                item = _get(text_queue, stop)
+                if item is _DONE:
+                    break
+                batch, texts = item
+                with timed("ingest.embed"):
+                    vectors = with_retries(
+                        lambda: embedding_model.embed_documents(texts),
+                        f"Embedding batch of {len(texts)}",
+                        settings.PIPELINE_MAX_RETRIES,
+                    )
+                for (point_id, payload), vector in zip(batch, vectors):
+                    pending.append((point_id, vector, payload))
+                while len(pending) >= settings.UPSERT_BATCH_SIZE:
+                    if not _put(point_queue, pending[:settings.UPSERT_BATCH_SIZE], stop):
+                        return
+                    pending = pending[settings.UPSERT_BATCH_SIZE:]
+            if pending and not stop.is_set():
+                _put(point_queue, pending, stop)
+        except BaseException as e:
+            errors.append(e)
+            stop.set()
+        finally:
+            _put(point_queue, _DONE, stop)
+
+    workers = [
+        threading.Thread(target=chunk_stage, name="ingest-chunk", daemon=True),
+        threading.Thread(target=embed_stage, name="ingest-embed", daemon=True),
+    ]
+    for worker in workers:
+        worker.start()
+
+    upserted = 0
+    try:
+        while True:
+            batch_points = _get(point_queue, stop)
+            if batch_points is _DONE:
+                break
+            with timed("ingest.upsert"):
+                with_retries(
+                    lambda: vector_store.upsert(batch_points),
+                    f"Upsert batch of {len(batch_points)}",
+                    settings.PIPELINE_MAX_RETRIES,
+                )
+            upserted += len(batch_points)
+            logger.info(f"Upserted {upserted}/{total} points into '{COLLECTION_NAME}'.")
+            if progress is not None:
+                progress(upserted, total)
+    except BaseException as e:
+        errors.append(e)
+        stop.set()
+    finally:
+        for worker in workers:
+            worker.join()
+
+    if errors:
+        raise errors[0]
+    return upserted
 
-def insert_chunks_to_qdrant(chunks: list[dict]):
+def insert_chunks_to_qdrant(
+    chunks: list[dict],
+    progress: Optional[Callable[[int, int], None]] = None,
+    source: Optional[str] = None,
+    mode: Optional[str] = None,
+    filename: Optional[str] = None,
+):
+    """Embed and upsert ``chunks`` through a bounded three-stage pipeline.
+
+    Chunk texts are prepared, embedded in EMBED_BATCH_SIZE batches and upserted
+    in UPSERT_BATCH_SIZE batches, each stage on its own thread with small
+    queues in between, so only a few batches are ever held in memory.
+    ``progress`` is called with (points_upserted, points_to_embed) after each upsert.
+
+    Point ids are derived from the chunk content and ``source``, the PDF's
+    content id (see ``pdf_fingerprint``), so re-uploading a book under any
+    file name overwrites its points instead of duplicating them, and a chunk
+    shared by two books is stored once per book. ``filename`` is kept in the
+    payload for display only; a revised PDF is a new source. In ``incremental`` mode
+    (the INGEST_MODE default) chunks already stored with the same content are
+    skipped, payload-only changes are written without re-embedding, and, when
+    ``source`` is given, that source's points that were not produced this time
+    are deleted. The local MCQ and BM25 indexes are skipped only when nothing
+    was embedded, updated or deleted and they are recorded (in INDEX_SYNC_PATH)
+    as holding exactly this source's points, so a run that failed or was
+    cancelled before updating them is repaired by the next upload.
+    """
 
     if not chunks:
         logger.warning("No chunks provided for insertion. Aborting.")
         return
 
+    mode = mode or settings.INGEST_MODE
+    collection_changed = False
+    indexes_stale = False
+
     try:
         create_collection_if_not_exists()
 
-        points_to_upsert = []
-        texts_to_embed = []
-
-        for chunk in chunks:
-            if chunk['content_type'] == 'mcq':
-                text_for_embedding = chunk.get('question_text', '')
-            elif chunk['content_type'] == 'creative_question':
-                text_for_embedding = chunk.get('full_text', '')
-            else: 
-                text_for_embedding = chunk.get('text', '')
-
-            texts_to_embed.append(text_for_embedding)
-
-        logger.info(f"Embedding {len(texts_to_embed)} text chunks...")
-        vectors = embedding_model.embed_documents(texts_to_embed)
-        logger.info("Embedding completed.")
-
-        for i, chunk in enumerate(chunks):
-            payload = chunk.copy()
-            points_to_upsert.append(
-                PointStruct(
-                    id=str(uuid.uuid4()),
-                    vector=vectors[i],
-                    payload=payload
-                )
+        with timed("ingest.prepare"):
+            points = prepare_points(chunks, source, filename)
+        to_embed = list(points.items())
+
+        if mode == "incremental":
+            with timed("ingest.diff"):
+                existing = fetch_existing_versions(list(points))
+            to_embed = [(pid, payload) for pid, payload in to_embed if pid not in existing]
+            changed = [
+                (pid, payload) for pid, payload in points.items()
+                if pid in existing and existing[pid] != payload_version(payload)
+            ]
+            logger.info(
+                f"Incremental ingest: {len(points) - len(to_embed) - len(changed)} unchanged, "
+                f"{len(changed)} payload updates, {len(to_embed)} new chunks to embed."
             )
-            
-        client.upsert(
-            collection_name=COLLECTION_NAME,
-            points=points_to_upsert,
-            wait=True
-        )
-        logger.info(f"Inserted {len(points_to_upsert)} points into collection '{COLLECTION_NAME}'.")
+            with timed("ingest.payload_updates"):
+                for pid, payload in changed:
+                    collection_changed = True
+                    with_retries(
+                        lambda: vector_store.set_payload(pid, payload),
+                        f"Payload update for {pid}",
+                        settings.PIPELINE_MAX_RETRIES,
+                    )
+
+        upserted = 0
+        if to_embed:
+            logger.info(f"Embedding and upserting {len(to_embed)} chunks...")
+            collection_changed = True
+            upserted = _run_pipeline(to_embed, progress)
+
+        stale: List[str] = []
+        if mode == "incremental" and source:
+            stale = [pid for pid in fetch_source_point_ids(source) if pid not in points]
+            if stale:
+                collection_changed = True
+                with timed("ingest.delete_stale"):
+                    with_retries(
+                        lambda: vector_store.delete(stale),
+                        f"Delete of {len(stale)} stale points",
+                        settings.PIPELINE_MAX_RETRIES,
+                    )
+                logger.info(f"Deleted {len(stale)} stale points for source '{source}'.")
+
+        logger.info(f"Inserted {upserted} points into collection '{COLLECTION_NAME}'.")
+        digest = points_digest(points)
+        if not collection_changed and source and read_index_sync().get(source) == digest:
+            logger.info("Nothing changed; local MCQ and BM25 indexes left as they are.")
+            return
+        indexes_stale = True
+        in_sync = True
+        try:
+            with timed("ingest.mcq_index"):
+                indexed = mcq_index.update(points, removed=stale)
+            logger.info(f"MCQ index updated with {indexed} answerable MCQs.")
+        except Exception as e:
+            in_sync = False
+            logger.warning(f"Could not update MCQ index: {e}")
+        try:
+            with timed("ingest.bm25_index"):
+                bm25_index.update(points, removed=stale)
+        except Exception as e:
+            in_sync = False
+            logger.warning(f"Could not update BM25 index: {e}")
+        if in_sync and source:
+            record_index_sync(source, digest)
 
     except Exception as e:
         logger.error(f"Error inserting data into Qdrant: {e}", exc_info=True)
         raise
-
+    finally:
+        if collection_changed or indexes_stale:
+            answer_cache.invalidate()
@@ -0,0 +1,179 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+from typing import Any, Callable, List, Optional
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+CHARS_PER_TOKEN = 2
+COMPLETION_TOKEN_ALLOWANCE = 1000
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+def estimate_tokens(messages: List[Any]) -> int:
+    # Bangla tokenizes at roughly one token per two characters, and page
+    # extraction echoes most of the page back, so budget for the completion too.
+    chars = sum(len(str(m.content)) for m in messages)
+    return chars // CHARS_PER_TOKEN + COMPLETION_TOKEN_ALLOWANCE
+
+
+def response_tokens(response: Any) -> Optional[int]:
+    """Total tokens the API reported for ``response``, if it reported any."""
+    usage = getattr(response, "usage_metadata", None) or {}
+    if usage.get("total_tokens") is not None:
+        return usage["total_tokens"]
+    # langchain_community's ChatOpenAI only passes usage through response_metadata.
+    token_usage = (getattr(response, "response_metadata", None) or {}).get("token_usage") or {}
+    return token_usage.get("total_tokens")
+
+
+def is_retryable(error: Exception) -> bool:
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    if status is not None:
+        return status in RETRYABLE_STATUS_CODES
+    return type(error).__name__ in {"APIConnectionError", "APITimeoutError", "TimeoutError"}
+
+
+class TokenBudget:
+    """Token bucket refilled continuously at ``tokens_per_minute``; ``<= 0`` means unlimited."""
+
+    def __init__(self, tokens_per_minute: int):
+        self.unlimited = tokens_per_minute <= 0
+        self.capacity = max(tokens_per_minute, 0)
+        self.tokens = float(self.capacity)
+        self.rate = self.capacity / 60.0
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, tokens: int) -> None:
+        if self.unlimited:
+            return
+        tokens = min(tokens, self.capacity)
+        async with self.lock:
+            while True:
+                self._refill()
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self.tokens) / self.rate)
+
+    def refund(self, tokens: int) -> None:
+        if self.unlimited:
+            return
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + tokens)
+
+
+class ExtractionScheduler:
+    """Runs page-extraction prompts concurrently against a chat model.
+
+    Results come back in the order the prompts were given, regardless of the
+    order in which the calls complete. A prompt that still fails after all
+    retries yields ``None`` so the caller can treat it like an empty page.
+
+    Every ``run`` executes on one background event loop owned by the
+    scheduler, so concurrent ingestion jobs share its token budget and
+    in-flight limit, and the model's async client stays on a single loop.
+    """
+
+    def __init__(
+        self,
+        llm: Any,
+        max_in_flight: int = 8,
+        tokens_per_minute: int = 200000,
+        max_retries: int = 5,
+        base_delay: float = 1.0,
+        max_delay: float = 30.0,
+    ):
+        self.llm = llm
+        self.max_in_flight = max_in_flight
+        self.tokens_per_minute = tokens_per_minute
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        # Created on the scheduler's loop by the first call and shared by every run after it.
+        self.budget: Optional[TokenBudget] = None
+        self.semaphore: Optional[asyncio.Semaphore] = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.loop_lock = threading.Lock()
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self.loop_lock:
+            if self.loop is None:
+                self.loop = asyncio.new_event_loop()
+                threading.Thread(target=self.loop.run_forever, name="llm-scheduler", daemon=True).start()
+            return self.loop
+
+    async def _invoke(self, messages: List[Any], index: int) -> Optional[str]:
+        if self.budget is None:
+            self.budget = TokenBudget(self.tokens_per_minute)
+            self.semaphore = asyncio.Semaphore(self.max_in_flight)
+        budget = self.budget
+        estimated = estimate_tokens(messages)
+        for attempt in range(self.max_retries + 1):
+            await budget.acquire(estimated)
+            try:
+                async with self.semaphore:
+                    response = await self.llm.ainvoke(messages)
+            except Exception as e:
+                # A rejected call (429, 5xx) consumed nothing; give its tokens back
+                # so a burst of retries does not drain the bucket.
+                budget.refund(estimated)
+                if attempt < self.max_retries and is_retryable(e):
+                    delay = min(self.max_delay, self.base_delay * 2 ** attempt) * (0.5 + random.random() / 2)
+                    logger.warning(f"LLM call {index} failed ({e}); retry {attempt + 1}/{self.max_retries} in {delay:.1f}s")
+                    await asyncio.sleep(delay)
+                    continue
+                logger.error(f"LLM call {index} failed: {e}", exc_info=True)
+                return None
+
+            actual = response_tokens(response)
+            if actual is not None and actual < estimated:
+                budget.refund(estimated - actual)
+            return response.content
+        return None
+
+    async def arun(
+        self,
+        message_lists: List[List[Any]],
+        on_result: Optional[Callable[[int], None]] = None,
+    ) -> List[Optional[str]]:
+        async def run_one(i: int, messages: List[Any]) -> Optional[str]:
+            content = await self._invoke(messages, i)
+            if on_result is not None:
+                on_result(i)
+            return content
+
+        tasks = [
+            asyncio.ensure_future(run_one(i, messages))
+            for i, messages in enumerate(message_lists)
+        ]
+        try:
+            return await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+
+    def run(
+        self,
+        message_lists: List[List[Any]],
+        on_result: Optional[Callable[[int], None]] = None,
+    ) -> List[Optional[str]]:
+        """Blocking ``arun`` on the scheduler's loop; callable from any thread."""
+        future = asyncio.run_coroutine_threadsafe(self.arun(message_lists, on_result), self._ensure_loop())
+        try:
+            return future.result()
+        except BaseException:
+            future.cancel()
+            raise
@@ -0,0 +1,214 @@
+"""Local exact/fuzzy index of ingested MCQs and their answers.
+
+    python -m app.qdrant.mcq_index --rebuild
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+from collections import Counter, defaultdict
+from typing import Any, Dict, Iterable, Optional, Set
+
+from app.config import settings
+from app.utils.bangla import normalize_bangla
+from app.utils.generation import bump_generation, read_generation
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# "১." / "12)" / "প্রশ্ন-৩:" style numbering in front of a pasted question.
+LEADING_NUMBER_RE = re.compile(r"^\s*(?:প্রশ্ন\s*[-–:]?\s*)?\d+\s*[.)।:-]\s*")
+# The first option marker ("ক)", "(ক)", "ক.") ends the question stem.
+OPTION_MARKER_RE = re.compile(r"(?:^|\s)[(\[]?\s*ক\s*[)\].:।]")
+PUNCTUATION_RE = re.compile(r"[^\w\sঀ-৿]")
+NGRAM_SIZE = 3
+# n-gram overlap is unreliable on very short text, so those only match exactly.
+FUZZY_MIN_CHARS = 15
+
+
+def normalize_mcq_text(text: str) -> str:
+    """Bangla-aware normalization used for both indexing and lookup."""
+    text = normalize_bangla(text)
+    marker = OPTION_MARKER_RE.search(text)
+    if marker and marker.start() > 0:
+        text = text[:marker.start()]
+    text = LEADING_NUMBER_RE.sub("", text)
+    text = PUNCTUATION_RE.sub(" ", text)
+    return re.sub(r"\s+", " ", text).strip().casefold()
+
+
+def text_hash(normalized: str) -> str:
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+def ngrams(normalized: str) -> Set[str]:
+    compact = normalized.replace(" ", "")
+    if len(compact) < NGRAM_SIZE:
+        return {compact} if compact else set()
+    return {compact[i:i + NGRAM_SIZE] for i in range(len(compact) - NGRAM_SIZE + 1)}
+
+
+def format_answer(entry: Dict[str, Any]) -> str:
+    key, text = entry.get("correct_answer_key"), entry.get("correct_answer_text")
+    if key and text:
+        return f"{key}) {text}"
+    return str(text or key)
+
+
+class MCQIndex:
+    """MCQ answers keyed by a normalized-question hash, with an n-gram fallback.
+
+    Entries are keyed by Qdrant point id and persisted as JSON at ``path``; every
+    save bumps a counter in ``path.generation`` and a worker reloads the file
+    when the counter moves. ``match``
+    only answers when every candidate at the best score agrees on the answer.
+    """
+
+    def __init__(self, path: Optional[str], fuzzy_threshold: float = 0.85):
+        self.path = path
+        self.fuzzy_threshold = fuzzy_threshold
+        self.lock = threading.Lock()
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self.by_hash: Dict[str, Set[str]] = defaultdict(set)
+        self.by_gram: Dict[str, Set[str]] = defaultdict(set)
+        self.grams: Dict[str, Set[str]] = {}
+        self.loaded_generation: Optional[int] = None
+        self._reload_if_changed()
+
+    def _generation(self) -> Optional[int]:
+        if not self.path:
+            return None
+        generation = read_generation(f"{self.path}.generation")
+        if generation is None and os.path.exists(self.path):
+            # Saved before generations were recorded.
+            return 0
+        return generation
+
+    def _reindex_locked(self) -> None:
+        self.by_hash = defaultdict(set)
+        self.by_gram = defaultdict(set)
+        self.grams = {}
+        for point_id, entry in self.entries.items():
+            normalized = normalize_mcq_text(entry["question_text"])
+            self.by_hash[text_hash(normalized)].add(point_id)
+            grams = ngrams(normalized)
+            self.grams[point_id] = grams
+            for gram in grams:
+                self.by_gram[gram].add(point_id)
+
+    def _reload_if_changed(self) -> None:
+        generation = self._generation()
+        if generation is None or generation == self.loaded_generation:
+            return
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                entries = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"Could not load MCQ index from {self.path}: {e}")
+            return
+        with self.lock:
+            self.entries = entries
+            self._reindex_locked()
+            self.loaded_generation = generation
+        logger.info(f"Loaded MCQ index with {len(entries)} questions.")
+
+    def _save_locked(self) -> None:
+        if not self.path:
+            return
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+        self.loaded_generation = bump_generation(f"{self.path}.generation")
+
+    def update(self, points: Dict[str, Dict[str, Any]], removed: Iterable[str] = ()) -> int:
+        """Add the answerable MCQs among ``points`` (id -> payload) and drop ``removed`` ids."""
+        self._reload_if_changed()
+        added = 0
+        with self.lock:
+            for point_id in removed:
+                self.entries.pop(str(point_id), None)
+            for point_id, payload in points.items():
+                if payload.get("content_type") != "mcq":
+                    continue
+                if not payload.get("question_text") or not (payload.get("correct_answer_key") or payload.get("correct_answer_text")):
+                    self.entries.pop(str(point_id), None)
+                    continue
+                self.entries[str(point_id)] = {
+                    "question_text": payload["question_text"],
+                    "correct_answer_key": payload.get("correct_answer_key"),
+                    "correct_answer_text": payload.get("correct_answer_text"),
+                    "page": payload.get("page"),
+                    "source": payload.get("source"),
+                }
+                added += 1
+            self._reindex_locked()
+            self._save_locked()
+        return added
+
+    def _agreed_answer(self, point_ids: Iterable[str]) -> Optional[str]:
+        answers = {format_answer(self.entries[point_id]) for point_id in point_ids}
+        return answers.pop() if len(answers) == 1 else None
+
+    def match(self, question: str) -> Optional[Dict[str, Any]]:
+        """Return ``{"answer", "score", "match"}`` for a confident match, else None."""
+        self._reload_if_changed()
+        normalized = normalize_mcq_text(question)
+        if not normalized:
+            return None
+        with self.lock:
+            exact = self.by_hash.get(text_hash(normalized))
+            if exact:
+                answer = self._agreed_answer(exact)
+                return {"answer": answer, "score": 1.0, "match": "exact"} if answer else None
+
+            query_grams = ngrams(normalized)
+            if len(normalized) < FUZZY_MIN_CHARS or not query_grams:
+                return None
+            shared = Counter()
+            for gram in query_grams:
+                for point_id in self.by_gram.get(gram, ()):
+                    shared[point_id] += 1
+            if not shared:
+                return None
+            scores = {
+                point_id: 2 * count / (len(query_grams) + len(self.grams[point_id]))
+                for point_id, count in shared.items()
+            }
+            best = max(scores.values())
+            if best < self.fuzzy_threshold:
+                return None
+            answer = self._agreed_answer(pid for pid, score in scores.items() if score == best)
+            return {"answer": answer, "score": best, "match": "fuzzy"} if answer else None
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+
+def rebuild_from_collection(index: "MCQIndex") -> int:
+    """Re-create the index from the MCQ points already in the vector store."""
+    from app.qdrant.vector_store import vector_store
+
+    points = vector_store.retrieve(vector_store.ids_where("content_type", "mcq"))
+    with index.lock:
+        index.entries = {}
+    return index.update(points)
+
+
+mcq_index = MCQIndex(settings.MCQ_INDEX_PATH or None, fuzzy_threshold=settings.MCQ_FUZZY_THRESHOLD)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rebuild", action="store_true", help="rebuild the index from the Qdrant collection")
+    args = parser.parse_args()
+    if args.rebuild:
+        print(f"Indexed {rebuild_from_collection(mcq_index)} MCQs.")
+    else:
+        print(f"{len(mcq_index)} MCQs in {mcq_index.path}")
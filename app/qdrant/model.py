@@ -1,14 +1,52 @@
 from langchain_community.embeddings import OpenAIEmbeddings
 from app.config import settings
+from app.cache.embedding_cache import EmbeddingCache
+from app.utils.metrics import count_cache_lookups
+from typing import List
+import asyncio
 import os
 import logging
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+EMBEDDING_DIMENSIONS = 1536
+
 os.environ["OPENAI_API_KEY"] = settings.OPENAI_API_KEY
 logger.info("Initializing OpenAI Embeddings model.")
 embedding_model = OpenAIEmbeddings(
     model = settings.EMBEDDING_MODEL,
-    dimensions = 1536
-)
\ No newline at end of file
+    dimensions = EMBEDDING_DIMENSIONS
+)
+
+query_embedding_cache = EmbeddingCache(
+    settings.EMBEDDING_MODEL,
+    EMBEDDING_DIMENSIONS,
+    max_entries=settings.EMBEDDING_CACHE_SIZE,
+    path=settings.EMBEDDING_CACHE_PATH or None,
+)
+
+def embed_query(query: str) -> List[float]:
+    vector = query_embedding_cache.get(query)
+    count_cache_lookups("query_embeddings", hits=int(vector is not None), misses=int(vector is None))
+    if vector is None:
+        vector = query_embedding_cache.set(query, embedding_model.embed_query(query))
+    return vector.tolist()
+
+async def aembed_query(query: str) -> List[float]:
+    # The persistent tier is SQLite; keep its reads and writes off the event loop.
+    vector = await asyncio.to_thread(query_embedding_cache.get, query)
+    count_cache_lookups("query_embeddings", hits=int(vector is not None), misses=int(vector is None))
+    if vector is None:
+        vector = await asyncio.to_thread(query_embedding_cache.set, query, await embedding_model.aembed_query(query))
+    return vector.tolist()
+
+def embed_queries(queries: List[str]) -> List[List[float]]:
+    """Embed many queries, sending all cache misses in one ``embed_documents`` call."""
+    cached = {query: query_embedding_cache.get(query) for query in dict.fromkeys(queries)}
+    missing = [query for query, vector in cached.items() if vector is None]
+    count_cache_lookups("query_embeddings", hits=len(cached) - len(missing), misses=len(missing))
+    if missing:
+        for query, vector in zip(missing, embedding_model.embed_documents(missing)):
+            cached[query] = query_embedding_cache.set(query, vector)
+    return [cached[query].tolist() for query in queries]
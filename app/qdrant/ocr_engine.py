@@ -0,0 +1,155 @@
+import hashlib
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable, Dict, List, Optional, Union
+
+import fitz
+import pytesseract
+from PIL import Image
+
+from app.cache.ocr_cache import OCRPageCache
+from app.utils.metrics import count_cache_lookups
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+OCR_LANG = "ben"
+TESSERACT_CONFIG = "--oem 3 --psm 6"
+
+PdfSource = Union[str, bytes]
+
+_worker_doc = None
+
+
+def open_pdf(source: PdfSource) -> fitz.Document:
+    """Open a PDF from a file path (read lazily by MuPDF) or from in-memory bytes."""
+    if isinstance(source, (bytes, bytearray)):
+        return fitz.open(stream=source, filetype="pdf")
+    return fitz.open(source, filetype="pdf")
+
+
+def pdf_fingerprint(source: PdfSource, chunk_size: int = 1024 * 1024) -> str:
+    """Content id of a PDF: the same bytes give the same id whatever the file is called."""
+    h = hashlib.sha256()
+    if isinstance(source, (bytes, bytearray)):
+        h.update(source)
+    else:
+        with open(source, "rb") as f:
+            while chunk := f.read(chunk_size):
+                h.update(chunk)
+    return f"pdf-{h.hexdigest()[:32]}"
+
+
+def resolve_worker_count(workers: int) -> int:
+    if workers and workers > 0:
+        return workers
+    return os.cpu_count() or 1
+
+
+def page_content_hash(doc: fitz.Document, page: fitz.Page) -> str:
+    # Hash what the page is drawn from (content stream, form XObjects, images,
+    # fonts) so an edit elsewhere in the book leaves the other pages' cache
+    # entries valid.
+    h = hashlib.sha256()
+    h.update(repr(tuple(page.rect)).encode("utf-8"))
+    h.update(page.read_contents())
+    for xobject in page.get_xobjects():
+        h.update(doc.xref_object(xobject[0], compressed=True).encode("utf-8"))
+        h.update(doc.xref_stream_raw(xobject[0]) or b"")
+    for img in page.get_images(full=True):
+        h.update(doc.xref_stream_raw(img[0]) or b"")
+    for font in page.get_fonts(full=True):
+        if font[0] > 0:
+            h.update(doc.xref_stream_raw(font[0]) or b"")
+    return h.hexdigest()
+
+
+def render_and_ocr(doc: fitz.Document, page_index: int, dpi: int) -> str:
+    page = doc.load_page(page_index)
+    pix = page.get_pixmap(dpi=dpi)
+    img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
+    # Drop the pixmap before OCR so only one copy of the page is held.
+    del pix, page
+    return pytesseract.image_to_string(img, lang=OCR_LANG, config=TESSERACT_CONFIG)
+
+
+def _init_worker(source: PdfSource) -> None:
+    global _worker_doc
+    _worker_doc = open_pdf(source)
+
+
+def _ocr_page_task(page_index: int, dpi: int) -> str:
+    return render_and_ocr(_worker_doc, page_index, dpi)
+
+
+def ocr_pages(
+    source: PdfSource,
+    doc: fitz.Document,
+    page_indexes: List[int],
+    dpi: int,
+    workers: int = 0,
+    cache: Optional[OCRPageCache] = None,
+    on_page_done: Optional[Callable[[int], None]] = None,
+) -> Dict[int, str]:
+    """OCR the given pages, returning raw Tesseract text keyed by page index.
+
+    Worker processes reopen ``source`` themselves, so pass a file path rather
+    than bytes to avoid copying the whole PDF into every worker.
+
+    Pages found in ``cache`` are not rendered at all; the rest are fanned out
+    over a process pool (or run inline when only one worker is available).
+    ``on_page_done`` is called with each page index as soon as its text is known.
+    """
+    results: Dict[int, str] = {}
+    cache_keys: Dict[int, str] = {}
+    pending: List[int] = []
+
+    for i in page_indexes:
+        if cache is not None:
+            content_hash = page_content_hash(doc, doc.load_page(i))
+            key = OCRPageCache.make_key(content_hash, i + 1, dpi, f"{OCR_LANG} {TESSERACT_CONFIG}")
+            cache_keys[i] = key
+            cached = cache.get(key)
+            if cached is not None:
+                results[i] = cached
+                if on_page_done is not None:
+                    on_page_done(i)
+                continue
+        pending.append(i)
+
+    if cache is not None:
+        count_cache_lookups("ocr", hits=len(results), misses=len(pending))
+    logger.info(f"OCR cache hits: {len(results)}, pages to OCR: {len(pending)}")
+
+    def finish(i: int, text: str) -> None:
+        results[i] = text
+        if cache is not None:
+            cache.set(cache_keys[i], text)
+        if on_page_done is not None:
+            on_page_done(i)
+
+    workers = min(resolve_worker_count(workers), len(pending))
+    if workers <= 1:
+        for i in pending:
+            finish(i, render_and_ocr(doc, i, dpi))
+        return results
+
+    logger.info(f"Running OCR on {len(pending)} pages with {workers} worker processes.")
+    pool = ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(source,),
+    )
+    try:
+        futures = {pool.submit(_ocr_page_task, i, dpi): i for i in pending}
+        for future in as_completed(futures):
+            finish(futures[future], future.result())
+    except BaseException:
+        pool.shutdown(wait=False, cancel_futures=True)
+        raise
+    pool.shutdown()
+
+    return results
@@ -4,37 +4,64 @@ import re
 import json
 import logging
 import unicodedata
-from typing import List, Dict, Any, Optional
-from PIL import Image
-import pytesseract
-import io 
+from typing import Callable, List, Dict, Any, Optional, Tuple
 
 from langchain_community.chat_models import ChatOpenAI
 from langchain_core.messages import SystemMessage, HumanMessage
 from app.config import settings
+from app.cache.ocr_cache import OCRPageCache
+from app.cache.extraction_cache import ExtractionCache
+from app.qdrant.ocr_engine import PdfSource, ocr_pages, open_pdf
+from app.qdrant.llm_scheduler import ExtractionScheduler
+from app.utils.metrics import TokenUsageCallback, count_cache_lookups, timed
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 os.environ["OPENAI_API_KEY"] = settings.OPENAI_API_KEY
-llm = ChatOpenAI(model_name=settings.MODEL_ID, temperature=0.2)
+llm = ChatOpenAI(model_name=settings.MODEL_ID, temperature=0.2, callbacks=[TokenUsageCallback("extraction")])
+ocr_cache = OCRPageCache(settings.OCR_CACHE_DIR)
+extraction_cache = ExtractionCache(settings.LLM_CACHE_PATH, max_entries=settings.LLM_CACHE_MAX_ENTRIES)
+extraction_scheduler = ExtractionScheduler(
+    llm,
+    max_in_flight=settings.LLM_MAX_IN_FLIGHT,
+    tokens_per_minute=settings.LLM_TOKENS_PER_MINUTE,
+    max_retries=settings.LLM_MAX_RETRIES,
+)
+
+EXTRACTION_SYSTEM_PROMPT = "You are a highly accurate data extraction assistant. Your task is to extract information from the provided Bangla text based on the user's specific instructions and desired JSON schema. Your response MUST be a valid JSON array or object as specified in the prompt, with no additional text or explanation. If no data can be extracted, return an empty JSON array []."
+
+TEXT_LAYER_MIN_CHARS = 50
+TEXT_LAYER_MIN_BANGLA_RATIO = 0.6
+TEXT_LAYER_MIN_CLEAN_RATIO = 0.9
+TEXT_LAYER_MAX_BAD_GLYPH_RATIO = 0.01
+TEXT_LAYER_MAX_BROKEN_SIGN_RATIO = 0.05
+
+BANGLA_LETTER_RE = re.compile(r"[\u0980-\u09FF]")
+LATIN_LETTER_RE = re.compile(r"[a-zA-Z]")
+BAD_GLYPH_RE = re.compile(r"[\uFFFD\uE000-\uF8FF\x00-\x08\x0B\x0C\x0E-\x1F]")
+BANGLA_WORD_RE = re.compile(r"[\u0980-\u09FF]+")
+BANGLA_DEPENDENT_SIGN_RE = re.compile(r"[\u0981-\u0983\u09BC\u09BE-\u09CD\u09D7]")
+
+def strip_llm_json(content: str) -> str:
+    content = content.strip()
+
+    if content.startswith('```json') and content.endswith('```'):
+        content = content[len('```json'):-len('```')].strip()
+
+    elif content.startswith('```') and content.endswith('```'):
+        content = content[len('```'):-len('```')].strip()
+
+    if not content.startswith('[') and not content.startswith('{'):
+        logger.warning(f"LLM response, even after stripping markdown, does not look like JSON. Returning empty array. Response: {content[:100]}...")
+        return "[]"
+
+    return content
 
 def call_llm(prompt_messages: List[Any]) -> str:
     try:
         response = llm.invoke(prompt_messages)
-        content = response.content.strip()
-
-        if content.startswith('```json') and content.endswith('```'):
-            content = content[len('```json'):-len('```')].strip()
-
-        elif content.startswith('```') and content.endswith('```'):
-            content = content[len('```'):-len('```')].strip()
-
-        if not content.startswith('[') and not content.startswith('{'):
-            logger.warning(f"LLM response, even after stripping markdown, does not look like JSON. Returning empty array. Response: {content[:100]}...")
-            return "[]"
-        
-        return content
+        return strip_llm_json(response.content)
     except Exception as e:
         logger.error(f"LLM call failed: {e}", exc_info=True)
         return "[]"
@@ -47,21 +74,99 @@ def clean_text(text: str) -> str:
     text = re.sub(r'[ \t]+', ' ', text)
     return text.strip()
 
-def extract_text_with_ocr(pdf_bytes: bytes) -> List[Dict[str, Any]]:
+def extract_text_with_ocr(pdf_source: PdfSource, on_page_done: Optional[Callable[[int], None]] = None) -> List[Dict[str, Any]]:
     pages = []
     try:
-        doc = fitz.open(stream=io.BytesIO(pdf_bytes), filetype="pdf")
-        for i in range(len(doc)):
-            page = doc.load_page(i)
-            pix = page.get_pixmap(dpi=300)
-            img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-            ocr_text = pytesseract.image_to_string(img, lang="ben", config="--oem 3 --psm 6")
-            pages.append({"page_number": i + 1, "text": clean_text(ocr_text)})
-        logger.info(f"Successfully extracted OCR text from {len(pages)} pages.")
+        with open_pdf(pdf_source) as doc:
+            page_indexes = list(range(len(doc)))
+            ocr_texts = ocr_pages(
+                pdf_source,
+                doc,
+                page_indexes,
+                dpi=settings.OCR_DPI,
+                workers=settings.OCR_WORKERS,
+                cache=ocr_cache,
+                on_page_done=on_page_done,
+            )
+            for i in page_indexes:
+                pages.append({"page_number": i + 1, "text": clean_text(ocr_texts[i])})
+            logger.info(f"Successfully extracted OCR text from {len(pages)} pages.")
     except Exception as e:
         logger.error(f"OCR extraction error: {e}", exc_info=True)
     return pages
 
+def assess_text_layer(text: str) -> Tuple[bool, str]:
+    """Decide whether a page's embedded text layer is good enough to skip OCR."""
+    stripped = re.sub(r"\s+", " ", unicodedata.normalize("NFKC", text or "")).strip()
+    if len(stripped) < TEXT_LAYER_MIN_CHARS:
+        return False, f"too little text ({len(stripped)} chars)"
+
+    bangla = len(BANGLA_LETTER_RE.findall(stripped))
+    latin = len(LATIN_LETTER_RE.findall(stripped))
+    bangla_ratio = bangla / max(bangla + latin, 1)
+    if bangla_ratio < TEXT_LAYER_MIN_BANGLA_RATIO:
+        return False, f"bangla ratio {bangla_ratio:.2f}"
+
+    clean_ratio = len(clean_text(stripped)) / len(stripped)
+    if clean_ratio < TEXT_LAYER_MIN_CLEAN_RATIO:
+        return False, f"clean_text ratio {clean_ratio:.2f}"
+
+    bad_glyph_ratio = len(BAD_GLYPH_RE.findall(text)) / len(stripped)
+    if bad_glyph_ratio > TEXT_LAYER_MAX_BAD_GLYPH_RATIO:
+        return False, f"bad glyph ratio {bad_glyph_ratio:.2f}"
+
+    # Legacy (non-Unicode) Bangla fonts leave vowel signs and hasanta detached
+    # at the start of words once the glyphs are mapped back to code points.
+    words = BANGLA_WORD_RE.findall(stripped)
+    broken = sum(1 for w in words if BANGLA_DEPENDENT_SIGN_RE.match(w))
+    broken_ratio = broken / max(len(words), 1)
+    if broken_ratio > TEXT_LAYER_MAX_BROKEN_SIGN_RATIO:
+        return False, f"broken sign ratio {broken_ratio:.2f}"
+
+    return True, f"bangla ratio {bangla_ratio:.2f}, clean_text ratio {clean_ratio:.2f}"
+
+def extract_text_hybrid(pdf_source: PdfSource, on_page_done: Optional[Callable[[int], None]] = None) -> List[Dict[str, Any]]:
+    pages = []
+    try:
+        with open_pdf(pdf_source) as doc:
+            native_texts = {}
+            ocr_indexes = []
+
+            for i in range(len(doc)):
+                native_text = doc.load_page(i).get_text()
+                usable, reason = assess_text_layer(native_text)
+                if usable:
+                    native_texts[i] = native_text
+                    logger.info(f"Page {i + 1}: using text layer ({reason})")
+                    if on_page_done is not None:
+                        on_page_done(i)
+                else:
+                    ocr_indexes.append(i)
+                    logger.info(f"Page {i + 1}: falling back to OCR ({reason})")
+
+            ocr_texts = ocr_pages(
+                pdf_source,
+                doc,
+                ocr_indexes,
+                dpi=settings.OCR_DPI,
+                workers=settings.OCR_WORKERS,
+                cache=ocr_cache,
+                on_page_done=on_page_done,
+            ) if ocr_indexes else {}
+
+            for i in range(len(doc)):
+                text = native_texts[i] if i in native_texts else ocr_texts[i]
+                pages.append({"page_number": i + 1, "text": clean_text(text)})
+            logger.info(f"Extracted text from {len(pages)} pages ({len(native_texts)} from text layer, {len(ocr_indexes)} via OCR).")
+    except Exception as e:
+        logger.error(f"Hybrid text extraction error: {e}", exc_info=True)
+    return pages
+
+def extract_pages(pdf_source: PdfSource, on_page_done: Optional[Callable[[int], None]] = None) -> List[Dict[str, Any]]:
+    if settings.PDF_TEXT_MODE == "ocr":
+        return extract_text_with_ocr(pdf_source, on_page_done)
+    return extract_text_hybrid(pdf_source, on_page_done)
+
 def group_semantic_blocks(pages: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
     blocks = {
         "mcq_questions_with_separate_answer_key": [],
@@ -93,18 +198,17 @@ def group_semantic_blocks(pages: List[Dict[str, Any]]) -> Dict[str, List[Dict[st
     logger.info(f"Grouped pages into {len([b for b in blocks.values() if b])} semantic blocks based on hardcoded ranges.")
     return blocks
 
-def prompt_and_parse(text_for_llm: str, prompt_template_str: str) -> Any:
-
+def build_extraction_messages(prompt_template_str: str) -> List[Any]:
     system_message = SystemMessage(
-        content="You are a highly accurate data extraction assistant. Your task is to extract information from the provided Bangla text based on the user's specific instructions and desired JSON schema. Your response MUST be a valid JSON array or object as specified in the prompt, with no additional text or explanation. If no data can be extracted, return an empty JSON array []."
+        content=EXTRACTION_SYSTEM_PROMPT
     )
     
     human_message = HumanMessage(
         content=prompt_template_str
     )
+    return [system_message, human_message]
 
-    response_content = call_llm([system_message, human_message])
-    
+def parse_llm_json(response_content: str) -> Any:
     logger.debug(f"Raw LLM response for current prompt (first 500 chars): {response_content[:500]}...")
 
     try:
@@ -115,6 +219,59 @@ def prompt_and_parse(text_for_llm: str, prompt_template_str: str) -> Any:
         logger.error(f"Failed to parse LLM response as JSON: {e}. Raw LLM output: {response_content[:500]}...")
         return []
 
+def extraction_cache_key(prompt_template_str: str) -> str:
+    return ExtractionCache.make_key(llm.model_name, llm.temperature, EXTRACTION_SYSTEM_PROMPT, prompt_template_str)
+
+def prompt_and_parse(text_for_llm: str, prompt_template_str: str, bypass_cache: bool = False) -> Any:
+    use_cache = not (bypass_cache or settings.LLM_CACHE_BYPASS)
+    key = extraction_cache_key(prompt_template_str)
+    if use_cache:
+        cached = extraction_cache.get(key)
+        count_cache_lookups("extraction", hits=int(cached is not None), misses=int(cached is None))
+        if cached is not None:
+            return cached
+
+    response_content = call_llm(build_extraction_messages(prompt_template_str))
+    parsed = parse_llm_json(response_content)
+    # Failed calls also come back as [], so only non-empty results are cached.
+    if use_cache and parsed:
+        extraction_cache.set(key, parsed)
+    return parsed
+
+def prompts_and_parse(
+    prompt_template_strs: List[str],
+    bypass_cache: bool = False,
+    on_result: Optional[Callable[[int], None]] = None,
+) -> List[Any]:
+    """Concurrent counterpart of prompt_and_parse; results keep the input order."""
+    use_cache = not (bypass_cache or settings.LLM_CACHE_BYPASS)
+    results: List[Any] = [None] * len(prompt_template_strs)
+    keys = [extraction_cache_key(p) for p in prompt_template_strs]
+
+    if use_cache:
+        for i, key in enumerate(keys):
+            results[i] = extraction_cache.get(key)
+            if results[i] is not None and on_result is not None:
+                on_result(i)
+
+    missing = [i for i, r in enumerate(results) if r is None]
+    if use_cache:
+        count_cache_lookups("extraction", hits=len(results) - len(missing), misses=len(missing))
+    logger.info(f"Extraction cache hits: {len(results) - len(missing)}, prompts to send: {len(missing)}")
+
+    message_lists = [build_extraction_messages(prompt_template_strs[i]) for i in missing]
+    contents = extraction_scheduler.run(
+        message_lists,
+        on_result=(lambda j: on_result(missing[j])) if on_result is not None else None,
+    )
+    for i, content in zip(missing, contents):
+        parsed = parse_llm_json(strip_llm_json(content)) if content is not None else []
+        if use_cache and parsed:
+            extraction_cache.set(keys[i], parsed)
+        results[i] = parsed
+
+    return results
+
 def get_mcq_prompt(with_answer_key: bool, text_to_process: str, current_q_page: int, answer_page: Optional[int] = None) -> str:
 
     json_structure = """
@@ -231,15 +388,33 @@ def get_prose_prompt(section: str, text_to_process: str, page_number: int) -> st
     ---
     """
 
-def process_pdf_semantically(pdf_bytes: bytes) -> List[Dict[str, Any]]:
+def process_pdf_semantically(pdf_source: PdfSource, progress: Optional[Callable[[str, int, int], None]] = None) -> List[Dict[str, Any]]:
+    """Extract structured chunks from a PDF.
+
+    ``progress`` is called as (stage, done, total) with stage ``"pages"`` while
+    page text is extracted and ``"llm"`` while extraction prompts complete.
+    """
     logger.info("Starting semantic PDF processing...")
-    pages = extract_text_with_ocr(pdf_bytes)
+    on_page_done = None
+    if progress is not None:
+        with open_pdf(pdf_source) as doc:
+            page_count = len(doc)
+        pages_done = []
+
+        def on_page_done(i: int) -> None:
+            pages_done.append(i)
+            progress("pages", len(pages_done), page_count)
+
+    with timed("pdf.extract_pages"):
+        pages = extract_pages(pdf_source, on_page_done)
     if not pages:
-        logger.error("OCR failed or empty PDF. Aborting.")
+        logger.error("Text extraction failed or empty PDF. Aborting.")
         return []
 
-    blocks = group_semantic_blocks(pages)
+    with timed("pdf.group_blocks"):
+        blocks = group_semantic_blocks(pages)
     all_chunks = []
+    prompt_strs = []
 
     if blocks["mcq_questions_with_separate_answer_key"]:
         sep_ans_pages = blocks["mcq_questions_with_separate_answer_key"]
@@ -257,23 +432,17 @@ def process_pdf_semantically(pdf_bytes: bytes) -> List[Dict[str, Any]]:
 
             logger.info(f"Processing MCQs with separate answer key from page {q_page['page_number']} (with answer key from page {answer_key_page_num})")
             
-            prompt_str = get_mcq_prompt(True, text_for_llm, q_page["page_number"], answer_key_page_num)
-            mcq_data = prompt_and_parse(text_for_llm, prompt_str) 
-            all_chunks.extend(mcq_data)
+            prompt_strs.append(get_mcq_prompt(True, text_for_llm, q_page["page_number"], answer_key_page_num))
     
     if blocks["mcq_questions_with_inline_answers"]:
         for p in blocks["mcq_questions_with_inline_answers"]:
             logger.info(f"Processing MCQs with inline answers from page {p['page_number']}")
-            prompt_str = get_mcq_prompt(False, p["text"], p["page_number"])
-            mcq_data = prompt_and_parse(p["text"], prompt_str)
-            all_chunks.extend(mcq_data)
+            prompt_strs.append(get_mcq_prompt(False, p["text"], p["page_number"]))
 
     if blocks["creative_questions"]:
         for p in blocks["creative_questions"]:
             logger.info(f"Processing Creative Questions from page {p['page_number']}")
-            prompt_str = get_creative_prompt(p["text"], p["page_number"])
-            creative_data = prompt_and_parse(p["text"], prompt_str)
-            all_chunks.extend(creative_data)
+            prompt_strs.append(get_creative_prompt(p["text"], p["page_number"]))
 
     prose_labels = {
         "vocabulary_and_notes": "শব্দার্থ ও টীকা",
@@ -286,9 +455,21 @@ def process_pdf_semantically(pdf_bytes: bytes) -> List[Dict[str, Any]]:
         if blocks[key]:
             for p in blocks[key]:
                 logger.info(f"Processing prose section '{label}' from page {p['page_number']}")
-                prompt_str = get_prose_prompt(label, p["text"], p["page_number"])
-                prose_data = prompt_and_parse(p["text"], prompt_str)
-                all_chunks.extend(prose_data)
+                prompt_strs.append(get_prose_prompt(label, p["text"], p["page_number"]))
+
+    logger.info(f"Sending {len(prompt_strs)} extraction prompts to the LLM...")
+    on_result = None
+    if progress is not None:
+        prompts_done = []
+
+        def on_result(i: int) -> None:
+            prompts_done.append(i)
+            progress("llm", len(prompts_done), len(prompt_strs))
+
+    with timed("pdf.llm_extraction"):
+        extracted = prompts_and_parse(prompt_strs, on_result=on_result)
+    for page_data in extracted:
+        all_chunks.extend(page_data)
 
     logger.info(f"Total structured chunks: {len(all_chunks)}")
     return all_chunks
\ No newline at end of file
@@ -1,34 +1,180 @@
 import logging
-from app.qdrant.model import embedding_model
-from app.qdrant.qdrant_connect import client
-
-COLLECTION_NAME = "hsc_book"
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from app.config import settings
+from app.qdrant.bm25_index import bm25_index
+from app.qdrant.model import embed_query, aembed_query, embed_queries
+from app.qdrant.vector_store import Hit, QueryFilter, vector_store
+from app.utils.metrics import timed
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def search_documents(query: str, limit: int = 5):
+def _format_results(query: str, search_result: List[Hit]) -> dict:
+    results = []
+    for _, score, payload in search_result:
+        result_item = payload
+        result_item['score'] = score
+        results.append(result_item)
+    return {"query": query, "results": results}
+
+def resolve_weights(weights: Optional[Dict[str, float]]) -> Tuple[float, float]:
+    """(dense, lexical) weights for this request; lexical is 0 when hybrid search is off or unbuilt."""
+    weights = weights or {}
+    dense = float(weights.get("dense", settings.HYBRID_DENSE_WEIGHT))
+    lexical = float(weights.get("lexical", settings.HYBRID_LEXICAL_WEIGHT))
+    if not settings.HYBRID_SEARCH_ENABLED or len(bm25_index) == 0:
+        lexical = 0.0
+    if dense <= 0 and lexical <= 0:
+        dense = 1.0
+    return dense, lexical
+
+def reciprocal_rank_fusion(rankings: List[Tuple[List[str], float]], k: int = 60) -> List[Tuple[str, float]]:
+    """Fuse ranked id lists given as (ids, weight): score = sum(weight / (k + rank))."""
+    scores: Dict[str, float] = {}
+    for ids, weight in rankings:
+        for rank, point_id in enumerate(ids, start=1):
+            scores[point_id] = scores.get(point_id, 0.0) + weight / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+def _fuse(dense_hits: List[Hit], lexical: List[Tuple[str, float]], dense_weight: float, lexical_weight: float, limit: int) -> Tuple[List[Tuple[str, float]], Dict[str, Dict[str, Any]]]:
+    payloads = {point_id: {**payload, 'score': score} for point_id, score, payload in dense_hits}
+    fused = reciprocal_rank_fusion(
+        [([point_id for point_id, _, _ in dense_hits], dense_weight), ([pid for pid, _ in lexical], lexical_weight)],
+        k=settings.RRF_K,
+    )[:limit]
+    return fused, payloads
+
+def _fused_results(query: str, fused: List[Tuple[str, float]], payloads: Dict[str, Dict[str, Any]], lexical: List[Tuple[str, float]]) -> dict:
+    lexical_scores = dict(lexical)
+    results = []
+    for point_id, score in fused:
+        if point_id not in payloads:
+            continue
+        result_item = payloads[point_id]
+        if point_id in lexical_scores:
+            result_item['lexical_score'] = lexical_scores[point_id]
+        # ``score`` stays the dense cosine score (None for BM25-only hits).
+        result_item.setdefault('score', None)
+        result_item['rrf_score'] = score
+        results.append(result_item)
+    return {"query": query, "results": results}
+
+def _missing_payload_ids(fused: List[Tuple[str, float]], payloads: Dict[str, Dict[str, Any]]) -> List[str]:
+    return [point_id for point_id, _ in fused if point_id not in payloads]
+
+def search_documents(query: str, limit: int = 5, weights: Optional[Dict[str, float]] = None, fields: Optional[List[str]] = None, query_filter: Optional[QueryFilter] = None):
+    """Dense search, fused with BM25 by reciprocal rank when lexical weight > 0.
+
+    ``weights`` may set ``dense`` and ``lexical`` for this request; a weight of
+    0 skips that retriever. ``score`` is always the dense cosine score;
+    hybrid results are ordered by the fused ``rrf_score`` and also carry the
+    BM25 ``lexical_score``.
+    ``fields`` limits the payload keys returned for each hit (all by default)
+    and ``query_filter`` restricts both retrievers to matching chunks, e.g.
+    ``{"content_type": "mcq"}``.
+    """
 
-    logger.info(f"Searching for query: '{query}'")
+    logger.info(f"Searching for a {len(query)}-char query (filter: {query_filter})")
     try:
-        query_vector = embedding_model.embed_query(query)
-        
-        search_result = client.search(
-            collection_name=COLLECTION_NAME,
-            query_vector=query_vector,
-            limit=limit,
-            with_payload=True 
-        )
+        dense_weight, lexical_weight = resolve_weights(weights)
+        candidates = max(limit, settings.HYBRID_CANDIDATES) if lexical_weight > 0 else limit
 
-        results = []
-        for hit in search_result:
-            result_item = hit.payload
-            result_item['score'] = hit.score
-            results.append(result_item)
-            
-        logger.info(f"Found {len(results)} results.")
-        return {"query": query, "results": results}
+        dense_hits = []
+        if dense_weight > 0:
+            with timed("search.embed"):
+                query_vector = embed_query(query)
+            with timed("search.dense"):
+                dense_hits = vector_store.search(query_vector, candidates, fields, query_filter)
+        if lexical_weight <= 0:
+            logger.info(f"Found {len(dense_hits)} results.")
+            return _format_results(query, dense_hits)
+
+        with timed("search.lexical"):
+            lexical = bm25_index.search(query, candidates, query_filter)
+        fused, payloads = _fuse(dense_hits, lexical, dense_weight, lexical_weight, limit)
+        missing = _missing_payload_ids(fused, payloads)
+        if missing:
+            with timed("search.fetch"):
+                payloads.update(vector_store.retrieve(missing, fields))
+        result = _fused_results(query, fused, payloads, lexical)
+        logger.info(f"Found {len(result['results'])} results (hybrid).")
+        return result
 
     except Exception as e:
         logger.error(f"Error during document search: {e}", exc_info=True)
         return {"query": query, "results": [], "error": str(e)}
+
+async def asearch_documents(query: str, limit: int = 5, weights: Optional[Dict[str, float]] = None, fields: Optional[List[str]] = None, query_filter: Optional[QueryFilter] = None):
+
+    logger.info(f"Searching for a {len(query)}-char query (filter: {query_filter})")
+    try:
+        dense_weight, lexical_weight = resolve_weights(weights)
+        candidates = max(limit, settings.HYBRID_CANDIDATES) if lexical_weight > 0 else limit
+
+        dense_hits = []
+        if dense_weight > 0:
+            with timed("search.embed"):
+                query_vector = await aembed_query(query)
+            with timed("search.dense"):
+                dense_hits = await vector_store.asearch(query_vector, candidates, fields, query_filter)
+        if lexical_weight <= 0:
+            logger.info(f"Found {len(dense_hits)} results.")
+            return _format_results(query, dense_hits)
+
+        with timed("search.lexical"):
+            lexical = bm25_index.search(query, candidates, query_filter)
+        fused, payloads = _fuse(dense_hits, lexical, dense_weight, lexical_weight, limit)
+        missing = _missing_payload_ids(fused, payloads)
+        if missing:
+            with timed("search.fetch"):
+                payloads.update(await vector_store.aretrieve(missing, fields))
+        result = _fused_results(query, fused, payloads, lexical)
+        logger.info(f"Found {len(result['results'])} results (hybrid).")
+        return result
+
+    except Exception as e:
+        logger.error(f"Error during document search: {e}", exc_info=True)
+        return {"query": query, "results": [], "error": str(e)}
+
+def search_documents_batch(queries: List[str], limit: int = 5, weights: Optional[Dict[str, float]] = None, fields: Optional[List[str]] = None, query_filter: Optional[QueryFilter] = None) -> List[dict]:
+    """``search_documents`` for many queries, results in the same order.
+
+    All queries are embedded with one ``embed_documents`` call and searched
+    in one vector-store round trip; lexical-only hits of the whole batch
+    share one payload fetch.
+    """
+
+    logger.info(f"Searching for {len(queries)} queries (filter: {query_filter})")
+    try:
+        dense_weight, lexical_weight = resolve_weights(weights)
+        candidates = max(limit, settings.HYBRID_CANDIDATES) if lexical_weight > 0 else limit
+
+        dense_batches: List[List[Hit]] = [[] for _ in queries]
+        if dense_weight > 0:
+            dense_batches = vector_store.search_batch(embed_queries(queries), candidates, fields, query_filter)
+        if lexical_weight <= 0:
+            return [_format_results(query, hits) for query, hits in zip(queries, dense_batches)]
+
+        lexical_batches = [bm25_index.search(query, candidates, query_filter) for query in queries]
+        fused_batches = [
+            _fuse(hits, lexical, dense_weight, lexical_weight, limit)
+            for hits, lexical in zip(dense_batches, lexical_batches)
+        ]
+        missing = {point_id for fused, payloads in fused_batches for point_id in _missing_payload_ids(fused, payloads)}
+        fetched = vector_store.retrieve(list(missing), fields) if missing else {}
+        results = []
+        for query, (fused, payloads), lexical in zip(queries, fused_batches, lexical_batches):
+            for point_id in _missing_payload_ids(fused, payloads):
+                if point_id in fetched:
+                    payloads[point_id] = dict(fetched[point_id])
+            results.append(_fused_results(query, fused, payloads, lexical))
+        return results
+
+    except Exception as e:
+        logger.error(f"Error during batch document search: {e}", exc_info=True)
+        return [{"query": query, "results": [], "error": str(e)} for query in queries]
+
+def iter_search_documents_batch(queries: List[str], batch_size: int, **kwargs) -> Iterator[dict]:
+    """Yield ``search_documents_batch`` results one query at a time, ``batch_size`` queries per round trip."""
+    for start in range(0, len(queries), batch_size):
+        yield from search_documents_batch(queries[start:start + batch_size], **kwargs)
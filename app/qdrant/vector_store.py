@@ -0,0 +1,580 @@
+"""Vector store backends behind search and ingestion.
+
+``VECTOR_STORE_BACKEND`` selects the remote Qdrant collection ("qdrant") or
+an embedded store on local disk ("local"); ``COLLECTION_PROFILE`` picks the
+collection and its layout (see ``collection_profiles``). Copy the cloud
+collection into the local store with:
+
+    python -m app.qdrant.vector_store --snapshot
+"""
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from app.config import settings
+from app.qdrant.collection_profiles import collection_name, create_collection_kwargs, get_profile, reduce_dimensions, search_params
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+COLLECTION_NAME = collection_name(settings.COLLECTION_PROFILE)
+MANIFEST = "manifest.json"
+VECTORS = "vectors.npy"
+INITIAL_CAPACITY = 1024
+# Stay below SQLite's bound-parameter limit on older builds.
+SQL_BATCH = 500
+
+# Payload fields indexed at ingestion so searches can be filtered on them.
+PAYLOAD_INDEXES = {"content_type": "keyword", "section": "keyword", "page": "integer", "source": "keyword"}
+
+# (point_id, vector, payload) to write; (point_id, score, payload) found.
+Point = Tuple[str, List[float], Dict[str, Any]]
+Hit = Tuple[str, float, Dict[str, Any]]
+# Payload conditions, all of which must hold: {"content_type": "mcq"},
+# {"content_type": ["mcq", "creative_question"]}, {"page": {"gte": 10, "lte": 20}}.
+QueryFilter = Dict[str, Any]
+
+
+def _project(payload: Dict[str, Any], fields: Optional[List[str]]) -> Dict[str, Any]:
+    if fields is None:
+        return payload
+    return {key: payload[key] for key in fields if key in payload}
+
+
+def matches_filter(payload: Dict[str, Any], query_filter: Optional[QueryFilter]) -> bool:
+    """Whether ``payload`` satisfies every condition of ``query_filter``."""
+    for key, condition in (query_filter or {}).items():
+        value = payload.get(key)
+        if isinstance(condition, dict):
+            if not isinstance(value, (int, float)):
+                return False
+            if "gte" in condition and value < condition["gte"]:
+                return False
+            if "lte" in condition and value > condition["lte"]:
+                return False
+        elif isinstance(condition, (list, tuple, set)):
+            if value not in condition:
+                return False
+        elif value != condition:
+            return False
+    return True
+
+
+def qdrant_filter(query_filter: Optional[QueryFilter]):
+    """``query_filter`` as a Qdrant ``Filter``, or None when there is nothing to filter."""
+    from qdrant_client.models import FieldCondition, Filter, MatchAny, MatchValue, Range
+
+    if not query_filter:
+        return None
+    conditions = []
+    for key, condition in query_filter.items():
+        if isinstance(condition, dict):
+            conditions.append(FieldCondition(key=key, range=Range(gte=condition.get("gte"), lte=condition.get("lte"))))
+        elif isinstance(condition, (list, tuple, set)):
+            conditions.append(FieldCondition(key=key, match=MatchAny(any=list(condition))))
+        else:
+            conditions.append(FieldCondition(key=key, match=MatchValue(value=condition)))
+    return Filter(must=conditions)
+
+
+class VectorStore:
+    """Operations search and ingestion need from a vector store.
+
+    Scores are cosine similarities; payloads are plain dicts keyed by the
+    string point id.
+    """
+
+    def ensure_collection(self, dimensions: int) -> None:
+        raise NotImplementedError
+
+    def upsert(self, points: List[Point]) -> None:
+        raise NotImplementedError
+
+    def set_payload(self, point_id: str, payload: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    def delete(self, point_ids: List[str]) -> None:
+        raise NotImplementedError
+
+    def retrieve(self, point_ids: List[str], fields: Optional[List[str]] = None) -> Dict[str, Dict[str, Any]]:
+        raise NotImplementedError
+
+    def ids_where(self, key: str, value: Any) -> List[str]:
+        raise NotImplementedError
+
+    def iter_points(self, with_vectors: bool = False) -> Iterator[Tuple[str, Dict[str, Any], Optional[List[float]]]]:
+        raise NotImplementedError
+
+    def search(self, vector: List[float], limit: int, fields: Optional[List[str]] = None, query_filter: Optional[QueryFilter] = None) -> List[Hit]:
+        raise NotImplementedError
+
+    async def asearch(self, vector: List[float], limit: int, fields: Optional[List[str]] = None, query_filter: Optional[QueryFilter] = None) -> List[Hit]:
+        return self.search(vector, limit, fields, query_filter)
+
+    def search_batch(self, vectors: List[List[float]], limit: int, fields: Optional[List[str]] = None, query_filter: Optional[QueryFilter] = None) -> List[List[Hit]]:
+        """``search`` for each of ``vectors``, hits returned in the same order."""
+        return [self.search(vector, limit, fields, query_filter) for vector in vectors]
+
+    async def aretrieve(self, point_ids: List[str], fields: Optional[List[str]] = None) -> Dict[str, Dict[str, Any]]:
+        return self.retrieve(point_ids, fields)
+
+
+class QdrantVectorStore(VectorStore):
+    """A collection on a Qdrant server, through the shared sync and async clients.
+
+    ``profile`` sets the collection layout, the per-query search parameters
+    and the vector size; longer vectors are truncated to it.
+    """
+
+    def __init__(self, client, async_client, collection_name: str = COLLECTION_NAME, profile: Optional[Dict[str, Any]] = None):
+        self.client = client
+        self.async_client = async_client
+        self.collection_name = collection_name
+        self.profile = profile or get_profile("default")
+        self.dimensions = self.profile["dimensions"]
+        self.search_params = search_params(self.profile)
+
+    def ensure_collection(self, dimensions: int) -> None:
+        try:
+            self.client.get_collection(self.collection_name)
+        except Exception:
+            logger.info(f"Collection {self.collection_name} does not exist. Creating new collection.")
+            self.client.create_collection(
+                collection_name=self.collection_name,
+                **create_collection_kwargs(self.profile)
+            )
+            logger.info(f"Collection {self.collection_name} created.")
+        self.ensure_payload_indexes()
+
+    def ensure_payload_indexes(self) -> None:
+        """Create the PAYLOAD_INDEXES that the collection does not have yet."""
+        existing = self.client.get_collection(self.collection_name).payload_schema or {}
+        for field, schema in PAYLOAD_INDEXES.items():
+            if field in existing:
+                continue
+            self.client.create_payload_index(
+                collection_name=self.collection_name, field_name=field, field_schema=schema, wait=True
+            )
+            logger.info(f"Created {schema} payload index on '{field}' in {self.collection_name}.")
+
+    def upsert(self, points: List[Point]) -> None:
+        from qdrant_client.models import PointStruct
+
+        self.client.upsert(
+            collection_name=self.collection_name,
+            points=[
+                PointStruct(id=point_id, vector=reduce_dimensions(vector, self.dimensions), payload=payload)
+                for point_id, vector, payload in points
+            ],
+            wait=True,
+        )
+
+    def set_payload(self, point_id: str, payload: Dict[str, Any]) -> None:
+        self.client.overwrite_payload(collection_name=self.collection_name, payload=payload, points=[point_id], wait=True)
+
+    def delete(self, point_ids: List[str]) -> None:
+        from qdrant_client.models import PointIdsList
+
+        self.client.delete(collection_name=self.collection_name, points_selector=PointIdsList(points=point_ids), wait=True)
+
+    def retrieve(self, point_ids: List[str], fields: Optional[List[str]] = None) -> Dict[str, Dict[str, Any]]:
+        records = self.client.retrieve(
+            collection_name=self.collection_name,
+            ids=point_ids,
+            with_payload=fields if fields is not None else True,
+            with_vectors=False,
+        )
+        return {str(record.id): record.payload or {} for record in records}
+
+    async def aretrieve(self, point_ids: List[str], fields: Optional[List[str]] = None) -> Dict[str, Dict[str, Any]]:
+        records = await self.async_client.retrieve(
+            collection_name=self.collection_name,
+            ids=point_ids,
+            with_payload=fields if fields is not None else True,
+            with_vectors=False,
+        )
+        return {str(record.id): record.payload or {} for record in records}
+
+    def _scroll(self, scroll_filter=None, with_payload: bool = True, with_vectors: bool = False):
+        offset = None
+        while True:
+            records, offset = self.client.scroll(
+                collection_name=self.collection_name,
+                scroll_filter=scroll_filter,
+                limit=256,
+                offset=offset,
+                with_payload=with_payload,
+                with_vectors=with_vectors,
+            )
+            yield from records
+            if offset is None:
+                return
+
+    def ids_where(self, key: str, value: Any) -> List[str]:
+        from qdrant_client.models import FieldCondition, Filter, MatchValue
+
+        scroll_filter = Filter(must=[FieldCondition(key=key, match=MatchValue(value=value))])
+        return [str(record.id) for record in self._scroll(scroll_filter, with_payload=False)]
+
+    def iter_points(self, with_vectors: bool = False) -> Iterator[Tuple[str, Dict[str, Any], Optional[List[float]]]]:
+        for record in self._scroll(with_vectors=with_vectors):
+            yield str(record.id), record.payload or {}, record.vector if with_vectors else None
+
+    def search(self, vector: List[float], limit: int, fields: Optional[List[str]] = None, query_filter: Optional[QueryFilter] = None) -> List[Hit]:
+        hits = self.client.search(
+            collection_name=self.collection_name,
+            query_vector=reduce_dimensions(vector, self.dimensions),
+            query_filter=qdrant_filter(query_filter),
+            limit=limit,
+            search_params=self.search_params,
+            with_payload=fields if fields is not None else True
+        )
+        return [(str(hit.id), hit.score, hit.payload or {}) for hit in hits]
+
+    async def asearch(self, vector: List[float], limit: int, fields: Optional[List[str]] = None, query_filter: Optional[QueryFilter] = None) -> List[Hit]:
+        hits = await self.async_client.search(
+            collection_name=self.collection_name,
+            query_vector=reduce_dimensions(vector, self.dimensions),
+            query_filter=qdrant_filter(query_filter),
+            limit=limit,
+            search_params=self.search_params,
+            with_payload=fields if fields is not None else True
+        )
+        return [(str(hit.id), hit.score, hit.payload or {}) for hit in hits]
+
+    def search_batch(self, vectors: List[List[float]], limit: int, fields: Optional[List[str]] = None, query_filter: Optional[QueryFilter] = None) -> List[List[Hit]]:
+        from qdrant_client.models import SearchRequest
+
+        requests = [
+            SearchRequest(
+                vector=reduce_dimensions(vector, self.dimensions),
+                filter=qdrant_filter(query_filter),
+                limit=limit,
+                params=self.search_params,
+                with_payload=fields if fields is not None else True,
+            )
+            for vector in vectors
+        ]
+        batches = self.client.search_batch(collection_name=self.collection_name, requests=requests)
+        return [[(str(hit.id), hit.score, hit.payload or {}) for hit in hits] for hits in batches]
+
+
+class LocalVectorStore(VectorStore):
+    """Normalized vectors in a memory-mapped ``.npy`` matrix, payloads in SQLite.
+
+    Each point owns one matrix row; deleted rows are reused by later inserts.
+    Search is a matrix-vector product over the live rows followed by a
+    partial sort; filtered searches only score the rows whose payload
+    matches, using row masks cached until the next change. Writers bump the generation in ``manifest.json``
+    after every change and other processes remap the matrix and reload the row map when it moves.
+    Only one process should write at a time (the ingestion worker).
+    Vectors longer than ``dimensions`` are truncated to it.
+    """
+
+    def __init__(self, directory: str, dtype: str = "float32", dimensions: Optional[int] = None):
+        self.directory = directory
+        self.dtype = np.dtype(dtype)
+        self.dimensions = dimensions
+        self.lock = threading.RLock()
+        self.generation: Optional[int] = None
+        self.matrix: Optional[np.ndarray] = None
+        self.widened: Optional[np.ndarray] = None
+        self.filter_masks: Dict[str, np.ndarray] = {}
+        self.row_ids: List[Optional[str]] = []
+        self.live = np.zeros(0, dtype=bool)
+        self.rows_used = 0
+        os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(os.path.join(directory, "points.sqlite"), check_same_thread=False, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS points ("
+            "point_id TEXT PRIMARY KEY, row INTEGER NOT NULL UNIQUE, source TEXT, payload TEXT NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS points_source ON points (source)")
+        self.conn.commit()
+        self._reload_if_changed()
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _read_manifest(self) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._path(MANIFEST), encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _reload_if_changed(self) -> None:
+        # The manifest is tiny and replaced atomically; its mtime alone can miss
+        # two writes within one timestamp tick, so compare the generation instead.
+        manifest = self._read_manifest()
+        if manifest is None or manifest.get("generation", 0) == self.generation:
+            return
+        with self.lock:
+            if manifest["dtype"] != self.dtype.name:
+                raise ValueError(f"Local vector store at {self.directory} holds {manifest['dtype']}, not {self.dtype.name}")
+            self.matrix = np.load(self._path(VECTORS), mmap_mode="r+")
+            self.widened = None
+            self.filter_masks = {}
+            capacity = self.matrix.shape[0]
+            self.row_ids = [None] * capacity
+            self.live = np.zeros(capacity, dtype=bool)
+            for point_id, row in self.conn.execute("SELECT point_id, row FROM points"):
+                self.row_ids[row] = point_id
+                self.live[row] = True
+            self.rows_used = int(np.flatnonzero(self.live).max()) + 1 if self.live.any() else 0
+            self.generation = manifest.get("generation", 0)
+
+    def _write_manifest(self) -> None:
+        current = self._read_manifest() or {}
+        generation = max(self.generation or 0, current.get("generation", 0)) + 1
+        tmp = self._path(MANIFEST + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({
+                "dimensions": self.matrix.shape[1],
+                "capacity": self.matrix.shape[0],
+                "dtype": self.dtype.name,
+                "generation": generation,
+            }, f)
+        os.replace(tmp, self._path(MANIFEST))
+        self.generation = generation
+
+    def _grow(self, capacity: int) -> None:
+        tmp = self._path(VECTORS + ".tmp")
+        grown = np.lib.format.open_memmap(tmp, mode="w+", dtype=self.dtype, shape=(capacity, self.matrix.shape[1]))
+        grown[:self.matrix.shape[0]] = self.matrix
+        grown.flush()
+        del grown
+        os.replace(tmp, self._path(VECTORS))
+        self.matrix = np.load(self._path(VECTORS), mmap_mode="r+")
+        self.row_ids.extend([None] * (capacity - len(self.row_ids)))
+        self.live = np.concatenate([self.live, np.zeros(capacity - len(self.live), dtype=bool)])
+
+    def ensure_collection(self, dimensions: int) -> None:
+        dimensions = self.dimensions or dimensions
+        with self.lock:
+            self._reload_if_changed()
+            if self.matrix is not None:
+                if self.matrix.shape[1] != dimensions:
+                    raise ValueError(f"Local vector store has {self.matrix.shape[1]} dimensions, not {dimensions}")
+                return
+            np.lib.format.open_memmap(self._path(VECTORS), mode="w+", dtype=self.dtype, shape=(INITIAL_CAPACITY, dimensions))
+            self.matrix = np.load(self._path(VECTORS), mmap_mode="r+")
+            self.row_ids = [None] * INITIAL_CAPACITY
+            self.live = np.zeros(INITIAL_CAPACITY, dtype=bool)
+            self._write_manifest()
+            logger.info(f"Created local vector store at {self.directory} ({dimensions}d {self.dtype.name}).")
+
+    def upsert(self, points: List[Point]) -> None:
+        if not points:
+            return
+        with self.lock:
+            self._reload_if_changed()
+            if self.matrix is None:
+                self.ensure_collection(len(points[0][1]))
+            points = [(str(point_id), vector, payload) for point_id, vector, payload in points]
+            rows = dict(self._rows_for([point_id for point_id, _, _ in points]))
+            new_ids = list(dict.fromkeys(point_id for point_id, _, _ in points if point_id not in rows))
+            free = [int(row) for row in np.flatnonzero(~self.live[:self.rows_used])]
+            free.extend(range(self.rows_used, self.rows_used + max(len(new_ids) - len(free), 0)))
+            for point_id, row in zip(new_ids, free):
+                rows[point_id] = row
+            needed = max(rows.values()) + 1
+            if needed > self.matrix.shape[0]:
+                self._grow(max(needed, 2 * self.matrix.shape[0]))
+
+            vectors = np.asarray([vector[:self.matrix.shape[1]] for _, vector, _ in points], dtype=np.float32)
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            vectors /= np.where(norms == 0, 1, norms)
+            target_rows = [rows[point_id] for point_id, _, _ in points]
+            self.matrix[target_rows] = vectors.astype(self.dtype)
+            self.matrix.flush()
+            self.widened = None
+            self.filter_masks = {}
+
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO points (point_id, row, source, payload) VALUES (?, ?, ?, ?)",
+                [(point_id, rows[point_id], payload.get("source"), json.dumps(payload, ensure_ascii=False))
+                 for point_id, _, payload in points],
+            )
+            self.conn.commit()
+            for (point_id, _, _), row in zip(points, target_rows):
+                self.row_ids[row] = point_id
+                self.live[row] = True
+            self.rows_used = max(self.rows_used, needed)
+            self._write_manifest()
+
+    def _rows_for(self, point_ids: List[str]) -> List[Tuple[str, int]]:
+        rows: List[Tuple[str, int]] = []
+        for start in range(0, len(point_ids), SQL_BATCH):
+            batch = point_ids[start:start + SQL_BATCH]
+            rows.extend(self.conn.execute(
+                f"SELECT point_id, row FROM points WHERE point_id IN ({','.join('?' * len(batch))})", batch
+            ).fetchall())
+        return rows
+
+    def set_payload(self, point_id: str, payload: Dict[str, Any]) -> None:
+        with self.lock:
+            self._reload_if_changed()
+            self.conn.execute(
+                "UPDATE points SET source = ?, payload = ? WHERE point_id = ?",
+                (payload.get("source"), json.dumps(payload, ensure_ascii=False), point_id),
+            )
+            self.conn.commit()
+            self.filter_masks = {}
+            self._write_manifest()
+
+    def delete(self, point_ids: List[str]) -> None:
+        with self.lock:
+            self._reload_if_changed()
+            rows = [row for _, row in self._rows_for(list(point_ids))]
+            if not rows:
+                return
+            self.conn.executemany("DELETE FROM points WHERE point_id = ?", [(point_id,) for point_id in point_ids])
+            self.conn.commit()
+            self.matrix[rows] = 0
+            self.matrix.flush()
+            self.widened = None
+            self.filter_masks = {}
+            for row in rows:
+                self.row_ids[row] = None
+                self.live[row] = False
+            self._write_manifest()
+
+    def retrieve(self, point_ids: List[str], fields: Optional[List[str]] = None) -> Dict[str, Dict[str, Any]]:
+        point_ids = [str(point_id) for point_id in point_ids]
+        found: Dict[str, Dict[str, Any]] = {}
+        with self.lock:
+            for start in range(0, len(point_ids), SQL_BATCH):
+                batch = point_ids[start:start + SQL_BATCH]
+                for point_id, payload in self.conn.execute(
+                    f"SELECT point_id, payload FROM points WHERE point_id IN ({','.join('?' * len(batch))})", batch
+                ):
+                    found[point_id] = _project(json.loads(payload), fields)
+        return found
+
+    def ids_where(self, key: str, value: Any) -> List[str]:
+        with self.lock:
+            if key == "source":
+                rows = self.conn.execute("SELECT point_id FROM points WHERE source = ?", (value,))
+            else:
+                rows = self.conn.execute("SELECT point_id FROM points WHERE json_extract(payload, ?) = ?", (f"$.{key}", value))
+            return [row[0] for row in rows]
+
+    def iter_points(self, with_vectors: bool = False) -> Iterator[Tuple[str, Dict[str, Any], Optional[List[float]]]]:
+        self._reload_if_changed()
+        with self.lock:
+            rows = self.conn.execute("SELECT point_id, row, payload FROM points ORDER BY row").fetchall()
+        for point_id, row, payload in rows:
+            vector = np.asarray(self.matrix[row], dtype=np.float32).tolist() if with_vectors else None
+            yield point_id, json.loads(payload), vector
+
+    def _filter_mask(self, query_filter: QueryFilter, used: int) -> np.ndarray:
+        key = json.dumps(query_filter, sort_keys=True, ensure_ascii=False, default=list)
+        mask = self.filter_masks.get(key)
+        if mask is None or len(mask) < used:
+            keys = sorted(query_filter)
+            columns = ", ".join("json_extract(payload, ?)" for _ in keys)
+            mask = np.zeros(len(self.live), dtype=bool)
+            for row, *values in self.conn.execute(f"SELECT row, {columns} FROM points", [f"$.{k}" for k in keys]):
+                mask[row] = matches_filter(dict(zip(keys, values)), query_filter)
+            self.filter_masks[key] = mask
+        return mask[:used]
+
+    def search(self, vector: List[float], limit: int, fields: Optional[List[str]] = None, query_filter: Optional[QueryFilter] = None) -> List[Hit]:
+        return self.search_batch([vector], limit, fields, query_filter)[0]
+
+    def search_batch(self, vectors: List[List[float]], limit: int, fields: Optional[List[str]] = None, query_filter: Optional[QueryFilter] = None) -> List[List[Hit]]:
+        self._reload_if_changed()
+        with self.lock:
+            if self.matrix is None or self.rows_used == 0 or limit <= 0 or not vectors:
+                return [[] for _ in vectors]
+            queries = np.asarray([vector[:self.matrix.shape[1]] for vector in vectors], dtype=np.float32)
+            norms = np.linalg.norm(queries, axis=1, keepdims=True)
+            queries /= np.where(norms == 0, 1, norms)
+            used = self.rows_used
+            if self.dtype == np.float32:
+                rows = self.matrix[:used]
+            else:
+                # float16 halves the file and the page cache but has no BLAS matmul,
+                # so score against a float32 copy rebuilt after each change.
+                if self.widened is None or len(self.widened) != used:
+                    self.widened = np.asarray(self.matrix[:used], dtype=np.float32)
+                rows = self.widened
+            if query_filter:
+                candidates = np.flatnonzero(self.live[:used] & self._filter_mask(query_filter, used))
+                scores = np.asarray(rows[candidates] @ queries.T)
+            else:
+                candidates = np.flatnonzero(self.live[:used])
+                scores = np.asarray(rows @ queries.T)[candidates]
+            ranked = []
+            for column in scores.T:
+                order = np.arange(len(candidates))
+                if len(order) > limit:
+                    order = np.argpartition(-column, limit - 1)[:limit]
+                order = order[np.argsort(-column[order])]
+                ranked.append([(self.row_ids[candidates[i]], float(column[i])) for i in order])
+        payloads = self.retrieve(list({point_id for hits in ranked for point_id, _ in hits}), fields)
+        return [[(point_id, score, dict(payloads.get(point_id, {}))) for point_id, score in hits] for hits in ranked]
+
+    def __len__(self) -> int:
+        self._reload_if_changed()
+        return int(self.live.sum())
+
+
+def build_vector_store() -> VectorStore:
+    """Vector store selected by ``VECTOR_STORE_BACKEND`` ("qdrant" or "local")."""
+    backend = settings.VECTOR_STORE_BACKEND.lower()
+    profile = get_profile(settings.COLLECTION_PROFILE)
+    if backend == "local":
+        logger.info(f"Using the local vector store at {settings.LOCAL_VECTOR_DIR}.")
+        return LocalVectorStore(settings.LOCAL_VECTOR_DIR, dtype=settings.LOCAL_VECTOR_DTYPE, dimensions=profile["dimensions"])
+    if backend != "qdrant":
+        raise ValueError(f"Unknown VECTOR_STORE_BACKEND: {settings.VECTOR_STORE_BACKEND}")
+    from app.qdrant.qdrant_connect import async_client, client
+    return QdrantVectorStore(client, async_client, COLLECTION_NAME, profile)
+
+
+def snapshot(source: VectorStore, target: VectorStore, batch_size: int = 256) -> int:
+    """Copy every point of ``source`` into ``target`` and drop points it no longer has."""
+    seen = set()
+    batch: List[Point] = []
+    for point_id, payload, vector in source.iter_points(with_vectors=True):
+        if not seen:
+            target.ensure_collection(len(vector))
+        seen.add(point_id)
+        batch.append((point_id, vector, payload))
+        if len(batch) >= batch_size:
+            target.upsert(batch)
+            batch = []
+    target.upsert(batch)
+    stale = [point_id for point_id, _, _ in target.iter_points() if point_id not in seen]
+    if stale:
+        target.delete(stale)
+    logger.info(f"Snapshot copied {len(seen)} points, removed {len(stale)} stale points.")
+    return len(seen)
+
+
+vector_store = build_vector_store()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--snapshot", action="store_true", help="copy the Qdrant collection into the local store")
+    parser.add_argument("--dir", default=settings.LOCAL_VECTOR_DIR)
+    parser.add_argument("--dtype", default=settings.LOCAL_VECTOR_DTYPE, choices=["float32", "float16"])
+    args = parser.parse_args()
+    if args.snapshot:
+        from app.qdrant.qdrant_connect import async_client, client
+        profile = get_profile(settings.COLLECTION_PROFILE)
+        source = QdrantVectorStore(client, async_client, COLLECTION_NAME, profile)
+        copied = snapshot(source, LocalVectorStore(args.dir, dtype=args.dtype, dimensions=profile["dimensions"]))
+        print(f"Copied {copied} points to {args.dir}.")
+    else:
+        print(f"{len(LocalVectorStore(args.dir, dtype=args.dtype))} points in {args.dir}")
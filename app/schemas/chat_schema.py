@@ -1,5 +1,8 @@
-from pydantic import BaseModel
-
-class AskRequest(BaseModel):
-    query: str
-    thread_id: str
+from pydantic import BaseModel, Field
+from typing import Optional
+
+class AskRequest(BaseModel):
+    query: str
+    thread_id: str
+    dense_weight: Optional[float] = Field(None, ge=0)
+    lexical_weight: Optional[float] = Field(None, ge=0)
@@ -1,4 +1,9 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+from typing import List
 
 class CosineRequest(BaseModel):
-    query: str
\ No newline at end of file
+    query: str
+
+class BatchCosineRequest(BaseModel):
+    queries: List[str] = Field(..., min_length=1, max_length=10000)
+    stream: bool = False
\ No newline at end of file
@@ -0,0 +1,18 @@
+from pydantic import BaseModel
+from typing import List, Optional
+
+class IngestionJobStatus(BaseModel):
+    job_id: str
+    filename: Optional[str] = None
+    status: str
+    stage: str
+    pages_done: int
+    pages_total: int
+    prompts_done: int
+    prompts_total: int
+    chunks_total: int
+    chunks_embedded: int
+    errors: List[str]
+    message: Optional[str] = None
+    created_at: float
+    updated_at: float
@@ -1,4 +1,14 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+from typing import List
 
 class ResetMemoryRequest(BaseModel):
     thread_id: str
+
+class BulkResetMemoryRequest(BaseModel):
+    thread_ids: List[str] = Field(..., min_length=1, max_length=10000)
+
+class ThreadStats(BaseModel):
+    thread_id: str
+    message_count: int
+    size_bytes: int
+    updated_at: float
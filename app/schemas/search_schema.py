@@ -0,0 +1,12 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional
+
+class BatchSearchRequest(BaseModel):
+    queries: List[str] = Field(..., min_length=1, max_length=10000)
+    limit: int = Field(5, ge=1, le=100)
+    dense_weight: Optional[float] = Field(None, ge=0)
+    lexical_weight: Optional[float] = Field(None, ge=0)
+    content_type: Optional[str] = None
+    section: Optional[str] = None
+    page: Optional[int] = None
+    stream: bool = False
@@ -0,0 +1,77 @@
+import re
+import unicodedata
+
+BANGLA_CHAR_RE = re.compile(r"[ঀ-৿]")
+LATIN_CHAR_RE = re.compile(r"[a-zA-Z]")
+# ``\w`` alone splits Bangla words at vowel signs, so the block is listed explicitly.
+WORD_RE = re.compile(r"[ঀ-৿\w]+")
+
+BANGLA_DIGITS = str.maketrans("০১২৩৪৫৬৭৮৯", "0123456789")
+ZERO_WIDTH_RE = re.compile("[\u200b-\u200d\ufeff]")
+
+# Case and plural endings stripped by ``stem``, longest first.
+BANGLA_SUFFIXES = sorted([
+    "গুলোর", "গুলোকে", "গুলো", "গুলি", "দেরকে", "দের", "েরা", "েদের", "কে", "তে", "েতে", "টির", "টার", "টি",
+    "টা", "খানা", "রা", "ের", "র", "য়", "ে",
+], key=len, reverse=True)
+STEM_MIN_CHARS = 3
+BANGLA_STOPWORDS = {
+    "ও", "এবং", "কি", "কী", "না", "যে", "এ", "হয়", "হয়েছে", "করে", "ছিল", "থেকে", "জন্য", "আর", "কোন", "কোনটি",
+    "the", "a", "an", "of", "is", "was", "in", "to", "and", "what", "who", "which",
+}
+
+# Pronouns, demonstratives and discourse words that point back at earlier turns.
+BANGLA_REFERRING_WORDS = {
+    "সে", "তিনি", "উনি", "ইনি", "ও", "তার", "তাঁর", "তাকে", "তাঁকে", "তারা", "তাঁরা", "তাদের", "তাঁদের",
+    "ওর", "ওনার", "এনার", "এর", "এদের", "ওদের", "এটি", "এটা", "ওটি", "ওটা", "সেটি", "সেটা", "এগুলো",
+    "সেগুলো", "এই", "ওই", "ঐ", "সেই", "উক্ত", "এখানে", "সেখানে", "তখন", "তাহলে", "আর", "আরও", "আগের",
+    "পূর্বের", "একই", "এরপর", "তারপর",
+}
+ENGLISH_REFERRING_WORDS = {
+    "he", "she", "it", "they", "him", "her", "his", "hers", "its", "them", "their", "theirs", "this", "that",
+    "these", "those", "there", "then", "former", "latter", "above", "previous", "same", "also", "else",
+    "another", "other", "more", "again",
+}
+# Questions this short ("কেন?", "and why?") are usually elliptical follow-ups.
+ELLIPTICAL_MAX_WORDS = 2
+
+
+def bangla_ratio(text: str) -> float:
+    bangla = len(BANGLA_CHAR_RE.findall(text or ""))
+    latin = len(LATIN_CHAR_RE.findall(text or ""))
+    return bangla / max(bangla + latin, 1)
+
+
+def question_language(text: str) -> str:
+    return "bn" if bangla_ratio(text) >= 0.5 else "en"
+
+
+def normalize_bangla(text: str) -> str:
+    """NFC form (so nukta letters compare equal), no zero-width joiners, ASCII digits."""
+    text = unicodedata.normalize("NFC", text or "")
+    return ZERO_WIDTH_RE.sub("", text).translate(BANGLA_DIGITS)
+
+
+def stem(word: str) -> str:
+    for suffix in BANGLA_SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= STEM_MIN_CHARS:
+            return word[:-len(suffix)]
+    return word
+
+
+def tokenize(text: str) -> list:
+    """Lexical-search tokens: normalized, lowercased, light Bangla stemming, no stopwords."""
+    tokens = WORD_RE.findall(normalize_bangla(text).casefold())
+    return [stem(token) for token in tokens if token not in BANGLA_STOPWORDS]
+
+
+def words(text: str) -> list:
+    return [word.casefold() for word in WORD_RE.findall(text or "")]
+
+
+def needs_context(question: str) -> bool:
+    """Cheap check for anaphora or ellipsis that only earlier turns can resolve."""
+    tokens = words(question)
+    if len(tokens) <= ELLIPTICAL_MAX_WORDS:
+        return True
+    return any(token in BANGLA_REFERRING_WORDS or token in ENGLISH_REFERRING_WORDS for token in tokens)
@@ -0,0 +1,101 @@
+from typing import Any, Dict, List, Set
+
+from app.cache.embedding_cache import normalize_query
+from app.utils.bangla import WORD_RE
+from app.utils.tokens import TokenCounter
+
+OPTION_KEYS = ["ক", "খ", "গ", "ঘ"]
+# Payload keys read by render_hit; search fetches only these for the prompt.
+CONTEXT_FIELDS = [
+    "content_type", "question_number", "page", "section", "text",
+    "question_text", "options", "correct_answer_key", "correct_answer_text",
+    "stem_text", "sub_questions",
+]
+NO_CONTEXT = "No matching passages were found in the book."
+SHINGLE_SIZE = 3
+# Chunks sharing at least this fraction of their word 3-grams with an
+# already kept chunk add nothing new and are dropped.
+OVERLAP_THRESHOLD = 0.8
+
+
+def _location(label: str, hit: Dict[str, Any]) -> str:
+    parts = [label]
+    if hit.get("question_number") is not None:
+        parts.append(str(hit["question_number"]))
+    if hit.get("page") is not None:
+        parts.append(f"p.{hit['page']}")
+    return f"[{' '.join(parts)}]"
+
+
+def _lettered(items: Any) -> List[str]:
+    if not isinstance(items, dict):
+        return []
+    keys = [k for k in OPTION_KEYS if items.get(k)] + [k for k in items if k not in OPTION_KEYS and items.get(k)]
+    return [f"{key}) {items[key]}" for key in keys]
+
+
+def render_hit(hit: Dict[str, Any]) -> str:
+    """Render one search hit as a short plain-text block, keeping only what answers need."""
+    content_type = hit.get("content_type")
+    if content_type == "mcq":
+        lines = [f"{_location('MCQ', hit)} {hit.get('question_text', '')}".strip()]
+        lines += _lettered(hit.get("options"))
+        if hit.get("correct_answer_key") or hit.get("correct_answer_text"):
+            answer = " ".join(str(v) for v in (hit.get("correct_answer_key"), hit.get("correct_answer_text")) if v)
+            lines.append(f"উত্তর: {answer}")
+        return "\n".join(lines)
+    if content_type == "creative_question":
+        lines = [f"{_location('সৃজনশীল প্রশ্ন', hit)} {hit.get('stem_text', '')}".strip()]
+        lines += _lettered(hit.get("sub_questions"))
+        return "\n".join(lines)
+    if content_type == "prose":
+        return f"{_location(hit.get('section') or 'Text', hit)} {hit.get('text', '')}".strip()
+    text = hit.get("text") or hit.get("question_text") or hit.get("stem_text") or ""
+    return f"{_location('Text', hit)} {text}".strip()
+
+
+def _shingles(text: str) -> Set[str]:
+    words = WORD_RE.findall(normalize_query(text))
+    if len(words) < SHINGLE_SIZE:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def _is_redundant(shingles: Set[str], kept: List[Set[str]]) -> bool:
+    if not shingles:
+        return True
+    return any(len(shingles & other) / len(shingles) >= OVERLAP_THRESHOLD for other in kept)
+
+
+def build_context(vector_result: Any, counter: TokenCounter, token_budget: int) -> str:
+    """Compact prompt context from a ``search_documents`` result.
+
+    Hits are rendered in score order with ``render_hit``; near-duplicate
+    chunks are skipped and rendering stops at ``token_budget`` tokens.
+    """
+    results = vector_result.get("results", []) if isinstance(vector_result, dict) else []
+    blocks: List[str] = []
+    kept: List[Set[str]] = []
+    used = 0
+    for hit in results:
+        if not isinstance(hit, dict):
+            continue
+        block = render_hit(hit)
+        shingles = _shingles(block.split("] ", 1)[-1])
+        if _is_redundant(shingles, kept):
+            continue
+        cost = counter.count(block) + 1
+        if used + cost > token_budget:
+            if not blocks:
+                blocks.append(counter.truncate(block, token_budget, keep_end=False))
+            break
+        blocks.append(block)
+        kept.append(shingles)
+        used += cost
+    return "\n\n".join(blocks) if blocks else NO_CONTEXT
+
+
+def raw_context(vector_result: Any) -> str:
+    """What the prompt used to receive: ``str()`` of the search result."""
+    return str(vector_result)
+
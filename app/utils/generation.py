@@ -0,0 +1,34 @@
+"""Generation counters kept in small files, so workers notice each other's rewrites.
+
+A file's mtime can stay the same across two writes within one timestamp tick
+(or on filesystems with coarse timestamps); a counter every writer bumps cannot.
+"""
+import os
+import tempfile
+from typing import Optional
+
+
+def read_generation(path: str) -> Optional[int]:
+    """The counter stored at ``path``, or None when there is none yet."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            text = f.read().strip()
+    except FileNotFoundError:
+        return None
+    try:
+        return int(text or 0)
+    except ValueError:
+        # Not a counter (e.g. a timestamp written by an older version).
+        return 0
+
+
+def bump_generation(path: str) -> int:
+    """Atomically replace the counter at ``path`` with the next value and return it."""
+    generation = (read_generation(path) or 0) + 1
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(str(generation))
+    os.replace(tmp_path, path)
+    return generation
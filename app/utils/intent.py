@@ -0,0 +1,46 @@
+import re
+from typing import Any, Dict, Optional
+
+from app.utils.bangla import normalize_bangla, words
+
+# Option markers of a pasted MCQ: "ক)", "(খ)", "গ.", "ঘ।".
+OPTION_MARKER_RE = re.compile(r"(?:^|\s)[(\[]?\s*([কখগঘ])\s*[)\].:।]")
+MCQ_MIN_OPTIONS = 2
+PAGE_RE = re.compile(r"(?:পৃষ্ঠা|পৃঃ|\bpage|\bp\.)\s*-?\s*(\d+)", re.IGNORECASE)
+
+MCQ_WORDS = {"বহুনির্বাচনী", "mcq", "mcqs"}
+CREATIVE_PREFIXES = ("সৃজনশীল", "উদ্দীপক")
+AUTHOR_PREFIXES = ("লেখক", "রচয়িতা", "author", "writer")
+AUTHOR_WORDS = {"কবি", "কবির", "কবিকে"}
+AUTHOR_SECTION = "লেখক পরিচিতি"
+
+INTENT_FILTERS: Dict[str, Dict[str, Any]] = {
+    "mcq": {"content_type": "mcq"},
+    "creative_question": {"content_type": "creative_question"},
+    "author": {"content_type": "prose", "section": AUTHOR_SECTION},
+}
+
+
+def classify_intent(question: str) -> Optional[str]:
+    """Rule-based guess of which kind of chunk answers ``question``, or None."""
+    text = normalize_bangla(question)
+    if len(set(OPTION_MARKER_RE.findall(text))) >= MCQ_MIN_OPTIONS:
+        return "mcq"
+    tokens = words(text)
+    if any(token in MCQ_WORDS for token in tokens):
+        return "mcq"
+    if any(token.startswith(CREATIVE_PREFIXES) for token in tokens):
+        return "creative_question"
+    if any(token.startswith(AUTHOR_PREFIXES) or token in AUTHOR_WORDS for token in tokens):
+        return "author"
+    return None
+
+
+def route_filter(question: str) -> Optional[Dict[str, Any]]:
+    """Search filter for ``question``: its intent's subset, narrowed to a page it names."""
+    intent = classify_intent(question)
+    query_filter = dict(INTENT_FILTERS[intent]) if intent else {}
+    page = PAGE_RE.search(normalize_bangla(question))
+    if page:
+        query_filter["page"] = int(page.group(1))
+    return query_filter or None
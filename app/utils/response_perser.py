@@ -1,26 +1,36 @@
-import json
-import logging
-from typing import Any, Dict
-from langchain_core.messages import BaseMessage, AIMessage
-
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
-
-def parse_ai_message(message: BaseMessage) -> Dict[str, Any]:
-    if isinstance(message, AIMessage):
-        content = message.content
-        logger.info(f"Raw content from AIMessage: {content}")
-
-        if content.startswith("```json"):
-            content = content.strip("```json").strip("```").strip()
-
-        try:
-            parsed = json.loads(content)
-            logger.info(f"process response: {parsed}")
-            return parsed
-
-        except json.JSONDecoderError as e:
-            logger.error(f"Failed to parse content as JSON: {e}")
-            return {"error": "Invalid JSON returned by model", "raw": content}
-
+import json
+import logging
+from typing import Any, Dict
+from langchain_core.messages import BaseMessage, AIMessage
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def strip_json_fence(content: str) -> str:
+    content = content.strip()
+    if content.startswith("```json"):
+        content = content[len("```json"):]
+    elif content.startswith("```"):
+        content = content[len("```"):]
+    if content.endswith("```"):
+        content = content[:-len("```")]
+    return content.strip()
+
+def parse_ai_message(message: BaseMessage) -> Dict[str, Any]:
+    if isinstance(message, AIMessage):
+        content = message.content
+        logger.debug(f"Raw content from AIMessage: {content}")
+
+        if content.startswith("```json"):
+            content = strip_json_fence(content)
+
+        try:
+            parsed = json.loads(content)
+            logger.debug(f"process response: {parsed}")
+            return parsed
+
+        except json.JSONDecodeError as e:
+            logger.error(f"Failed to parse content as JSON: {e}")
+            return {"error": "Invalid JSON returned by model", "raw": content}
+
     return {"error": "Unexpectd response format", "raw": str(message)}
\ No newline at end of file
@@ -0,0 +1,87 @@
+import json
+import re
+from typing import List, Optional, Tuple
+
+ACTION_RE = re.compile(r'"action"\s*:\s*"((?:[^"\\]|\\.)*)"')
+CONTENT_START_RE = re.compile(r'"content"\s*:\s*"')
+SIMPLE_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+
+class IncrementalAnswerParser:
+    """Pulls ``action`` and a growing ``content`` out of a streamed JSON answer.
+
+    Tokens are fed in as they arrive; ``feed`` returns the events they unlock:
+    ``("action", value)`` once the action string is complete and
+    ``("content", delta)`` for each newly decoded piece of the content string.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.action: Optional[str] = None
+        self.content_start: Optional[int] = None
+        self.position = 0
+        self.content_done = False
+        self.content_parts: List[str] = []
+
+    @property
+    def content(self) -> str:
+        return "".join(self.content_parts)
+
+    def feed(self, chunk: str) -> List[Tuple[str, str]]:
+        self.buffer += chunk
+        events: List[Tuple[str, str]] = []
+
+        if self.action is None:
+            match = ACTION_RE.search(self.buffer)
+            if match:
+                self.action = json.loads(f'"{match.group(1)}"')
+                events.append(("action", self.action))
+
+        if self.content_start is None:
+            match = CONTENT_START_RE.search(self.buffer)
+            if match:
+                self.content_start = self.position = match.end()
+
+        if self.content_start is not None and not self.content_done:
+            delta = self._decode_available()
+            if delta:
+                self.content_parts.append(delta)
+                events.append(("content", delta))
+
+        return events
+
+    def _decode_available(self) -> str:
+        out = []
+        i = self.position
+        buf = self.buffer
+        while i < len(buf):
+            ch = buf[i]
+            if ch == '"':
+                self.content_done = True
+                i += 1
+                break
+            if ch != "\\":
+                out.append(ch)
+                i += 1
+                continue
+            if i + 1 >= len(buf):
+                break
+            esc = buf[i + 1]
+            if esc == "u":
+                if i + 6 > len(buf):
+                    break
+                code = int(buf[i + 2:i + 6], 16)
+                if 0xD800 <= code < 0xDC00:
+                    if i + 12 > len(buf):
+                        break
+                    low = int(buf[i + 8:i + 12], 16)
+                    out.append(chr(0x10000 + ((code - 0xD800) << 10) + (low - 0xDC00)))
+                    i += 12
+                else:
+                    out.append(chr(code))
+                    i += 6
+                continue
+            out.append(SIMPLE_ESCAPES.get(esc, esc))
+            i += 2
+        self.position = i
+        return "".join(out)
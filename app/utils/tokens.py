@@ -0,0 +1,46 @@
+import logging
+from functools import lru_cache
+
+import tiktoken
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Used only when the tiktoken vocabulary cannot be loaded (e.g. offline).
+FALLBACK_CHARS_PER_TOKEN = 2
+
+
+class TokenCounter:
+    """Counts and truncates text with the model's tiktoken encoding."""
+
+    def __init__(self, model: str):
+        try:
+            try:
+                self.encoding = tiktoken.encoding_for_model(model)
+            except KeyError:
+                self.encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception as e:
+            logger.warning(f"Could not load tiktoken encoding, estimating tokens from length: {e}")
+            self.encoding = None
+
+    def count(self, text: str) -> int:
+        if self.encoding is None:
+            return -(-len(text or "") // FALLBACK_CHARS_PER_TOKEN)
+        return len(self.encoding.encode(text or "", disallowed_special=()))
+
+    def truncate(self, text: str, max_tokens: int, keep_end: bool = True) -> str:
+        """Keep the last (or, with ``keep_end=False``, the first) ``max_tokens`` tokens."""
+        if max_tokens <= 0:
+            return ""
+        if self.encoding is None:
+            limit = max_tokens * FALLBACK_CHARS_PER_TOKEN
+            return (text or "")[-limit:] if keep_end else (text or "")[:limit]
+        tokens = self.encoding.encode(text or "", disallowed_special=())
+        if len(tokens) <= max_tokens:
+            return text
+        return self.encoding.decode(tokens[-max_tokens:] if keep_end else tokens[:max_tokens])
+
+
+@lru_cache(maxsize=None)
+def get_token_counter(model: str) -> TokenCounter:
+    return TokenCounter(model)